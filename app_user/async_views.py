@@ -0,0 +1,29 @@
+"""
+Async versions of the user read endpoints, for serving under ASGI.
+"""
+from django.contrib.auth import get_user_model
+from django.http import JsonResponse
+
+from app_user.serializers import AppUserSerializer
+from app_user.views import UserSerializer
+from vetplatform.async_api import async_api_view
+
+User = get_user_model()
+
+
+@async_api_view(authenticated=False)
+async def all(request):
+    users = [user async for user in User.objects.all()]
+    serializer = UserSerializer(users, many=True)
+    return JsonResponse(serializer.data, safe=False)
+
+
+@async_api_view(authenticated=False)
+async def get_user_detail(request, user_id):
+    try:
+        user = await User.objects.prefetch_related('cases__laboratory_reports').aget(pk=user_id)
+    except User.DoesNotExist:
+        return JsonResponse({'error': 'User not found'}, status=404)
+
+    serializer = AppUserSerializer(user)
+    return JsonResponse(serializer.data)
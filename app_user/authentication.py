@@ -0,0 +1,114 @@
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+from rest_framework.authtoken.models import Token
+
+from vetplatform.db_routing import use_primary
+
+
+def _cache():
+    return caches[settings.TOKEN_AUTH_CACHE]
+
+
+def _cache_key(key):
+    # Keep raw token keys out of the (possibly shared) cache.
+    return 'auth-token:' + hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def token_expires_at(token):
+    return token.created + timedelta(seconds=settings.TOKEN_TTL)
+
+
+def is_expired(token):
+    return token_expires_at(token) <= timezone.now()
+
+
+def get_valid_token(user):
+    """
+    Return the user's token, replacing it first if it has expired.
+    """
+    token, created = Token.objects.get_or_create(user=user)
+    if not created and is_expired(token):
+        token.delete()
+        token = Token.objects.create(user=user)
+    return token
+
+
+def invalidate_token(key):
+    _cache().delete(_cache_key(key))
+
+
+def invalidate_user_tokens(user_id):
+    keys = Token.objects.filter(user_id=user_id).values_list('key', flat=True)
+    _cache().delete_many([_cache_key(key) for key in keys])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that caches the token -> user lookup and expires tokens
+    TOKEN_TTL seconds after they were issued.
+
+    Cache entries live for at most TOKEN_AUTH_CACHE_TIMEOUT seconds and are
+    dropped as soon as the token is deleted or its user is saved or deleted
+    (see app_user/signals.py). `aauthenticate` is the same check for the
+    async views.
+
+    Misses read the token from the primary: a token issued by sign_in moments
+    ago may not have reached the replicas yet.
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = _cache_key(key)
+        token = _cache().get(cache_key)
+        if token is None:
+            try:
+                with use_primary():
+                    token = Token.objects.select_related('user').get(key=key)
+            except Token.DoesNotExist:
+                raise exceptions.AuthenticationFailed('Invalid token.')
+            self._cache_token(cache_key, token)
+        return self._check(key, token)
+
+    async def aauthenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed('Invalid token header. Token string should not contain invalid characters.')
+        return await self.aauthenticate_credentials(key)
+
+    async def aauthenticate_credentials(self, key):
+        cache_key = _cache_key(key)
+        token = await _cache().aget(cache_key)
+        if token is None:
+            try:
+                with use_primary():
+                    token = await Token.objects.select_related('user').aget(key=key)
+            except Token.DoesNotExist:
+                raise exceptions.AuthenticationFailed('Invalid token.')
+            self._cache_token(cache_key, token)
+        return self._check(key, token)
+
+    def _cache_token(self, cache_key, token):
+        remaining = (token_expires_at(token) - timezone.now()).total_seconds()
+        if remaining > 0:
+            _cache().set(cache_key, token, min(settings.TOKEN_AUTH_CACHE_TIMEOUT, remaining))
+
+    def _check(self, key, token):
+        if is_expired(token):
+            invalidate_token(key)
+            raise exceptions.AuthenticationFailed('Token has expired.')
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+
+        return (token.user, token)
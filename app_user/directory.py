@@ -0,0 +1,74 @@
+"""
+Veterinarian directory: filtered, cursor-paginated listing with facet counts.
+
+Every filter is an exact match on an indexed column (see AppUser.Meta.indexes)
+and may be repeated to match any of several values. Pages are ordered by
+username, so each filtered page is one ordered index range read.
+
+Facet counts are computed over the other active filters (the state facet
+ignores the state filter, so every state stays selectable) and cached per
+filter combination for DIRECTORY_FACETS_CACHE_TIMEOUT seconds; they may lag
+sign-ups and profile edits by that long.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Count
+
+from vetplatform.caching import get_or_build
+
+User = get_user_model()
+
+FILTER_FIELDS = ('specialization_category', 'state', 'university', 'qualification')
+
+FACET_FIELDS = ('state', 'specialization_category')
+
+DIRECTORY_ORDERING = ('username',)
+
+
+def parse_filters(params):
+    """
+    {field: [values]} for the filter parameters present in a QueryDict.
+    """
+    filters = {}
+    for field in FILTER_FIELDS:
+        values = sorted({value for value in params.getlist(field) if value})
+        if values:
+            filters[field] = values
+    return filters
+
+
+def _apply(queryset, filters):
+    for field, values in filters.items():
+        queryset = queryset.filter(**({field: values[0]} if len(values) == 1 else {field + '__in': values}))
+    return queryset
+
+
+def directory_queryset(filters, fields):
+    return _apply(User.objects.filter(is_active=True), filters).only(*fields)
+
+
+def _facet_key(filters):
+    digest = hashlib.sha256(json.dumps(filters, sort_keys=True).encode('utf-8')).hexdigest()[:32]
+    return f'directory-facets:{digest}'
+
+
+def facet_counts(filters):
+    """
+    {facet: [{'value': ..., 'count': ...}, ...]} most common first, for users matching `filters`.
+    """
+    def build():
+        facets = {}
+        for field in FACET_FIELDS:
+            others = {name: values for name, values in filters.items() if name != field}
+            rows = (
+                _apply(User.objects.filter(is_active=True), others)
+                .exclude(**{field + '__isnull': True}).exclude(**{field: ''})
+                .values(field).annotate(count=Count('id')).order_by('-count', field)
+            )
+            facets[field] = [{'value': row[field], 'count': row['count']} for row in rows]
+        return facets
+
+    return get_or_build(_facet_key(filters), build, settings.DIRECTORY_FACETS_CACHE_TIMEOUT)
@@ -0,0 +1,84 @@
+"""
+Password hashing on a small dedicated thread pool.
+
+A PBKDF2 hash takes a few hundred milliseconds of CPU. Hashes run on a pool of
+PASSWORD_HASH_CONCURRENCY threads in this process, with at most
+PASSWORD_HASH_QUEUE more queued for it. Past that, HashingBusy is raised
+straight away, before any work starts, so a burst of sign-ins is turned away
+rather than parking worker threads. A request waits only for its own hash,
+and gives up with HashingBusy after PASSWORD_HASH_TIMEOUT seconds.
+
+Only the hashing runs on the pool. The views read and save users on the
+request's own connection and transaction and hand the pool plain strings.
+"""
+import concurrent.futures
+import threading
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class HashingBusy(Exception):
+    pass
+
+
+class _Pool:
+    def __init__(self, concurrency, queue):
+        self.config = (concurrency, queue)
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='password-hash')
+        self.slots = threading.BoundedSemaphore(concurrency + queue)  # Running plus queued
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    config = (settings.PASSWORD_HASH_CONCURRENCY, settings.PASSWORD_HASH_QUEUE)
+    with _pool_lock:
+        if _pool is None or _pool.config != config:
+            if _pool is not None:
+                _pool.executor.shutdown(wait=False)
+            _pool = _Pool(*config)
+        return _pool
+
+
+def run(function, *args, **kwargs):
+    """
+    function(*args, **kwargs) run on the hashing pool; raises HashingBusy when the pool is full.
+    """
+    pool = _get_pool()
+    if not pool.slots.acquire(blocking=False):
+        raise HashingBusy()
+    try:
+        future = pool.executor.submit(function, *args, **kwargs)
+    except RuntimeError:  # Shut down by a settings change
+        pool.slots.release()
+        raise HashingBusy()
+    future.add_done_callback(lambda _: pool.slots.release())
+    try:
+        return future.result(timeout=settings.PASSWORD_HASH_TIMEOUT)
+    except concurrent.futures.TimeoutError:
+        future.cancel()  # Only stops it if it has not started
+        raise HashingBusy()
+
+
+def make_password(password):
+    return run(hashers.make_password, password)
+
+
+def check_password(user, password):
+    """
+    Whether `password` is `user`'s. `user` may be None, which hashes anyway so that unknown
+    usernames take as long to reject. A hash made with outdated settings is replaced.
+    """
+    if user is None:
+        make_password(password)
+        return False
+    outdated = []
+    valid = run(hashers.check_password, password, user.password, outdated.append)
+    if outdated:
+        user.password = make_password(password)
+        user.save(update_fields=['password'])
+    return valid
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_user', '0007_appuser_specialization_category_appuser_state_and_more'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appuser',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['state', 'username'], name='user_state_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appuser',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['specialization_category', 'username'], name='user_specialization_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appuser',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['state', 'specialization_category', 'username'], name='user_state_spec_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appuser',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['university', 'username'], name='user_university_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appuser',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['qualification', 'username'], name='user_qualification_idx'),
+        ),
+    ]
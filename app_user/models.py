@@ -15,5 +15,19 @@ class AppUser(AbstractUser):
     university = models.CharField(max_length=100, blank=True, null=True)  # New field
     state = models.CharField(max_length=100, blank=True, null=True)  # New field
 
+    class Meta(AbstractUser.Meta):
+        # Directory filters (app_user/directory.py). Each ends in username so a filtered page is
+        # read in order, and covers only active users, which is all the directory lists.
+        indexes = [
+            models.Index(fields=fields + ['username'], name=name, condition=models.Q(is_active=True))
+            for fields, name in [
+                (['state'], 'user_state_idx'),
+                (['specialization_category'], 'user_specialization_idx'),
+                (['state', 'specialization_category'], 'user_state_spec_idx'),
+                (['university'], 'user_university_idx'),
+                (['qualification'], 'user_qualification_idx'),
+            ]
+        ]
+
     def __str__(self):
         return self.name if self.name else self.username
\ No newline at end of file
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from vetplatform.instrumentation import TimedSerializerMixin
 from app_user.models import *
 from cases.models import Case  # Import Case model
 from cases.serializers import CaseSerializer 
@@ -26,7 +27,7 @@ class SignUpSerializer(serializers.Serializer):
     university = serializers.CharField(required=False)  # New field
     state = serializers.CharField(required=False)  # New field
 
-class AppUserSerializer(serializers.ModelSerializer):
+class AppUserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     cases = serializers.SerializerMethodField()  # Add a field to list all cases
 
     class Meta:
@@ -36,6 +37,13 @@ class AppUserSerializer(serializers.ModelSerializer):
     def get_cases(self, obj):
         """
         This method retrieves all cases associated with the user.
+        Prefetch 'cases__laboratory_reports' on the user queryset to keep this constant in queries.
         """
-        user_cases = Case.objects.filter(app_user=obj)  # Get cases for the user
+        user_cases = obj.cases.all()  # Get cases for the user
         return CaseSerializer(user_cases, many=True).data  # Serialize the cases
+
+
+class DirectoryEntrySerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = AppUser
+        fields = ['id', 'username', 'name', 'specialization_category', 'state', 'university', 'qualification']
@@ -0,0 +1,21 @@
+from django.db.models.signals import post_delete, post_save
+from rest_framework.authtoken.models import Token
+
+from app_user.authentication import invalidate_token, invalidate_user_tokens
+
+
+def token_deleted(sender, instance, **kwargs):
+    invalidate_token(instance.key)
+
+
+def user_changed(sender, instance, **kwargs):
+    # Cached tokens carry a copy of the user; drop them so the change is seen immediately.
+    invalidate_user_tokens(instance.pk)
+
+
+def connect():
+    from app_user.models import AppUser
+
+    post_delete.connect(token_deleted, sender=Token, dispatch_uid='app_user.token_deleted')
+    post_save.connect(user_changed, sender=AppUser, dispatch_uid='app_user.user_saved')
+    post_delete.connect(user_changed, sender=AppUser, dispatch_uid='app_user.user_deleted')
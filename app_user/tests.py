@@ -1,3 +1,276 @@
-from django.test import TestCase
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import hashers
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from cases.models import Case, LaboratoryReport
+from vetplatform.testing import explain, full_scans, query_budget
+
+from . import hashing
+from .authentication import CachedTokenAuthentication
+from .models import AppUser
+from .serializers import AppUserSerializer
+
+
+class AppUserQueryBudgetTests(TestCase):
+    def setUp(self):
+        self.user = AppUser.objects.create_user(username='vet', password='secret')
+        for i in range(4):
+            case = Case.objects.create(app_user=self.user, category='Surgery', case_title=f'Case {i}')
+            for j in range(2):
+                LaboratoryReport.objects.create(case=case, report_title=f'Report {j}', report_details='PCV')
+
+    @query_budget(3)
+    def test_user_with_nested_cases(self):
+        user = AppUser.objects.prefetch_related('cases__laboratory_reports').get(pk=self.user.pk)
+        data = AppUserSerializer(user).data
+        self.assertEqual(len(data['cases']), 4)
+        self.assertEqual(len(data['cases'][0]['laboratory_reports']), 2)
+
+    @query_budget(3)  # User, cases, reports
+    def test_get_user_detail(self):
+        response = self.client.get(f'/app_user/get-user-detail/{self.user.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['cases']), 4)
+        self.assertEqual(len(response.data['cases'][0]['laboratory_reports']), 2)
+
+    @query_budget(1)
+    def test_all(self):
+        response = self.client.get('/app_user/all/')
+        self.assertEqual(len(response.data), 1)
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = AppUser.objects.create_user(username='vet', password='secret')
+        self.token = Token.objects.create(user=self.user)
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {self.token.key}'}
+
+    def test_lookup_is_cached(self):
+        self.assertEqual(self.client.get('/cases/my-cases/', **self.auth).status_code, 200)
+        with query_budget(1):  # Only the cases query
+            self.assertEqual(self.client.get('/cases/my-cases/', **self.auth).status_code, 200)
+
+    def test_deleted_token_is_rejected_immediately(self):
+        self.client.get('/cases/my-cases/', **self.auth)
+        self.token.delete()
+        self.assertEqual(self.client.get('/cases/my-cases/', **self.auth).status_code, 401)
+
+    def test_delete_user_invalidates(self):
+        self.client.get('/cases/my-cases/', **self.auth)
+        self.client.delete(f'/app_user/delete/{self.user.pk}/')
+        self.assertEqual(self.client.get('/cases/my-cases/', **self.auth).status_code, 401)
+
+    def test_expired_token(self):
+        Token.objects.filter(pk=self.token.pk).update(created=timezone.now() - timedelta(days=365))
+        self.assertEqual(self.client.get('/cases/my-cases/', **self.auth).status_code, 401)
+
+    @override_settings(DATABASE_REPLICAS={'lagging-replica': 1})
+    def test_uncached_token_is_read_from_the_primary(self):
+        # The replica alias does not exist, so any read sent there would fail. The test's own
+        # transaction would send reads to the primary anyway, so hide it from the router.
+        with mock.patch.object(connection, 'in_atomic_block', False):
+            user, token = CachedTokenAuthentication().authenticate_credentials(self.token.key)
+        self.assertEqual((user, token), (self.user, self.token))
+
+    def test_clear_expired_tokens(self):
+        fresh = Token.objects.create(user=AppUser.objects.create_user(username='other', password='secret'))
+        for name in ('old1', 'old2'):
+            Token.objects.create(user=AppUser.objects.create_user(username=name, password='secret'))
+        Token.objects.exclude(pk=fresh.pk).update(created=timezone.now() - timedelta(days=365))
+        stdout = StringIO()
+        call_command('clear_expired_tokens', batch_size=2, stdout=stdout)
+        self.assertEqual(list(Token.objects.values_list('key', flat=True)), [fresh.key])
+        self.assertIn('Deleted 3 expired token(s).', stdout.getvalue())
+
+
+class AsyncUserViewTests(TestCase):
+    def test_matches_sync_endpoints(self):
+        user = AppUser.objects.create_user(username='vet', password='secret', email='vet@example.com')
+        case = Case.objects.create(app_user=user, category='Surgery', case_title='Bloat')
+        LaboratoryReport.objects.create(case=case, report_title='PCV', report_details='35%')
+        for sync_url, async_url in (
+            ('/app_user/all/', '/app_user/async/all/'),
+            (f'/app_user/get-user-detail/{user.pk}/', f'/app_user/async/get-user-detail/{user.pk}/'),
+        ):
+            self.assertEqual(self.client.get(async_url).json(), self.client.get(sync_url).json())
+        self.assertEqual(self.client.get('/app_user/async/get-user-detail/0/').status_code, 404)
+
+
+@override_settings(
+    AUTH_THROTTLE_RATES={
+        'ip': {'capacity': 3, 'refill_per_minute': 1},
+        'username': {'capacity': 2, 'refill_per_minute': 1},
+    },
+    SLOW_REQUEST_THRESHOLD_MS=60 * 1000,
+)
+class SignInThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def sign_in(self, username='vet', ip='10.0.0.1'):
+        return self.client.post(
+            '/app_user/sign-in/', {'username': username, 'password': 'wrong', 'department': 'basic'}, REMOTE_ADDR=ip,
+        )
+
+    def test_username_bucket_spans_ips(self):
+        self.assertEqual(self.sign_in(ip='10.0.0.1').status_code, 404)
+        self.assertEqual(self.sign_in(ip='10.0.0.2').status_code, 404)
+        with mock.patch('app_user.hashing.run') as run:
+            response = self.sign_in(ip='10.0.0.3')
+        self.assertEqual(response.status_code, 429)
+        self.assertAlmostEqual(int(response['Retry-After']), 60, delta=2)  # One token per minute
+        run.assert_not_called()  # Rejected before any hashing
+
+    def test_ip_bucket_spans_usernames(self):
+        for username in ('a', 'b', 'c'):
+            self.assertEqual(self.sign_in(username=username).status_code, 404)
+        self.assertEqual(self.sign_in(username='d').status_code, 429)
+        self.assertEqual(self.sign_in(username='d', ip='10.0.0.9').status_code, 404)
+
+    def test_sign_up_is_throttled(self):
+        for _ in range(3):
+            self.client.post('/app_user/sign-up/', {'username': 'new', 'password': 'x'}, REMOTE_ADDR='10.0.0.5')
+        response = self.client.post('/app_user/sign-up/', {'username': 'other', 'password': 'x'}, REMOTE_ADDR='10.0.0.5')
+        self.assertEqual(response.status_code, 429)
+
+    def test_passwords_are_hashed_on_the_pool(self):
+        response = self.client.post('/app_user/sign-up/', {'username': 'vet', 'password': 'secret', 'email': 'Vet@EXAMPLE.com'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(AppUser.objects.get().email, 'Vet@example.com')  # Normalized as create_user does
+        threads = []
+        check_password = hashers.check_password
+
+        def check(*args):
+            threads.append(threading.current_thread().name)
+            return check_password(*args)
+
+        with mock.patch('django.contrib.auth.hashers.check_password', check):
+            response = self.client.post('/app_user/sign-in/', {'username': 'vet', 'password': 'secret', 'department': 'basic'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(threads), 1)
+        self.assertTrue(threads[0].startswith('password-hash'))
+
+    @override_settings(PASSWORD_HASH_CONCURRENCY=1, PASSWORD_HASH_QUEUE=0)
+    def test_busy_hasher_returns_503(self):
+        release = threading.Event()
+        holding = threading.Event()
+
+        def hold():
+            holding.set()
+            release.wait(5)
+
+        worker = threading.Thread(target=hashing.run, args=(hold,))
+        worker.start()
+        holding.wait(5)
+        try:
+            response = self.sign_in()
+        finally:
+            release.set()
+            worker.join()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.sign_in(username='other').status_code, 404)
+
+    def test_basic_auth_is_not_accepted(self):
+        AppUser.objects.create_user(username='vet', password='secret')
+        with mock.patch('django.contrib.auth.backends.ModelBackend.authenticate') as authenticate:
+            response = self.client.get('/cases/my-cases/', HTTP_AUTHORIZATION='Basic dmV0OnNlY3JldA==')  # vet:secret
+        self.assertIn(response.status_code, (401, 403))
+        authenticate.assert_not_called()
+
+
+class DirectoryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        people = [
+            ('ade', 'Lagos', 'Surgery', 'UNILAG'),
+            ('bisi', 'Lagos', 'Medicine', 'UI'),
+            ('chidi', 'Enugu', 'Surgery', 'UNN'),
+            ('dayo', 'Lagos', 'Surgery', 'UI'),
+            ('emeka', 'Enugu', 'Medicine', 'UNN'),
+        ]
+        for username, state, specialization, university in people:
+            AppUser.objects.create(
+                username=username, state=state, specialization_category=specialization, university=university,
+            )
+        self.client.force_login(AppUser.objects.get(username='ade'))
+
+    def test_filters_combine(self):
+        response = self.client.get('/app_user/directory/', {'state': 'Lagos', 'specialization_category': 'Surgery'})
+        self.assertEqual([user['username'] for user in response.data['results']], ['ade', 'dayo'])
+
+        response = self.client.get('/app_user/directory/?university=UI&university=UNN')
+        self.assertEqual([user['username'] for user in response.data['results']], ['bisi', 'chidi', 'dayo', 'emeka'])
+
+    def test_cursor_pagination(self):
+        response = self.client.get('/app_user/directory/', {'page_size': 2})
+        self.assertEqual([user['username'] for user in response.data['results']], ['ade', 'bisi'])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([user['username'] for user in response.data['results']], ['chidi', 'dayo'])
+
+    def test_facets_ignore_their_own_filter_and_are_cached(self):
+        response = self.client.get('/app_user/directory/', {'state': 'Lagos'})
+        self.assertEqual(response.data['facets']['state'], [{'value': 'Lagos', 'count': 3}, {'value': 'Enugu', 'count': 2}])
+        self.assertEqual(
+            response.data['facets']['specialization_category'],
+            [{'value': 'Surgery', 'count': 2}, {'value': 'Medicine', 'count': 1}],
+        )
+        with query_budget(3):  # Session, user and the page; facets come from the cache
+            self.client.get('/app_user/directory/', {'state': 'Lagos'})
+
+    def test_filtered_page_reads_an_index_in_order(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/app_user/directory/', {'state': 'Lagos', 'page_size': 2})
+        page = next(query['sql'] for query in queries if 'LIMIT 3' in query['sql'])
+        plan = explain(page)
+        self.assertEqual(full_scans(plan, connection.vendor), [], plan)
+
+
+class UserProfileTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.vet = AppUser.objects.create_user(username='vet', password='secret', state='Lagos')
+        self.other = AppUser.objects.create_user(username='other', password='secret')
+        for i, category in enumerate(['Surgery', 'Surgery', 'Medicine']):
+            Case.objects.create(app_user=self.vet, category=category, case_title=f'Case {i}')
+        self.client.force_login(self.other)
+
+    def profile(self):
+        return self.client.get(f'/app_user/profile/{self.vet.pk}/').data
+
+    def test_statistics(self):
+        case = Case.objects.filter(app_user=self.vet).latest('id')
+        self.client.post(f'/cases/cases/{case.pk}/comments/add/', {'case': case.pk, 'app_user': self.other.pk, 'comment_text': 'hi'})
+
+        data = self.profile()
+        self.assertEqual(data['user']['username'], 'vet')
+        self.assertEqual(data['cases']['total'], 3)
+        self.assertEqual(data['cases']['by_category'], {'Medicine': 1, 'Surgery': 2})
+        self.assertEqual(data['cases']['by_month'], [{'month': timezone.now().strftime('%Y-%m'), 'count': 3}])
+        self.assertEqual([case['case_title'] for case in data['cases']['latest']], ['Case 2', 'Case 1', 'Case 0'])
+        self.assertEqual(data['comments']['received'], 1)
+        self.assertEqual(data['comments']['written'], 0)
+
+    def test_cached_until_the_users_cases_change(self):
+        self.profile()
+        with query_budget(3):  # Session, user and profile user; statistics come from the cache
+            self.profile()
+
+        self.client.force_login(self.vet)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/cases/create-case/', {'category': 'Medicine', 'case_title': 'New'})
+        self.assertEqual(self.profile()['cases']['total'], 4)
+
+    def test_does_not_embed_cases(self):
+        data = self.profile()
+        self.assertNotIn('signalment_and_history', data['cases']['latest'][0])
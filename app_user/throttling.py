@@ -0,0 +1,74 @@
+"""
+Token bucket throttles for the unauthenticated sign-in and sign-up endpoints.
+
+Each client IP and each username gets a bucket of `capacity` tokens that
+refills at `refill_per_minute`; a request takes one token and is rejected
+with 429 and Retry-After once the bucket is empty. DRF checks throttles
+before the view runs, so rejected requests never reach the password hasher.
+
+Buckets live in the AUTH_THROTTLE_CACHE cache alias: a local-memory cache
+limits each process on its own, a shared one (e.g. Redis) limits the whole
+deployment. Updates are serialised per key within a process; across
+processes two concurrent requests may occasionally both take the last token.
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+_locks = [threading.Lock() for _ in range(64)]
+
+
+class TokenBucketThrottle(BaseThrottle):
+    scope = None
+
+    def get_ident_key(self, request):
+        """
+        The value requests are bucketed by, or None to leave the request unthrottled.
+        """
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        ident = self.get_ident_key(request)
+        if not ident:
+            return True
+        rate = settings.AUTH_THROTTLE_RATES[self.scope]
+        capacity, refill = rate['capacity'], rate['refill_per_minute'] / 60
+        key = f'throttle:{self.scope}:' + hashlib.sha256(ident.encode('utf-8')).hexdigest()
+        cache = caches[settings.AUTH_THROTTLE_CACHE]
+
+        with _locks[hash(key) % len(_locks)]:
+            now = time.time()
+            tokens, updated_at = cache.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * refill)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            # Keep the bucket only until it would have refilled completely.
+            cache.set(key, (tokens, now), timeout=int((capacity - tokens) / refill) + 1)
+
+        self._wait = None if allowed else (1 - tokens) / refill
+        return allowed
+
+    def wait(self):
+        return self._wait
+
+
+class IPThrottle(TokenBucketThrottle):
+    scope = 'ip'
+
+    def get_ident_key(self, request):
+        return self.get_ident(request)  # Honours NUM_PROXIES for X-Forwarded-For
+
+
+class UsernameThrottle(TokenBucketThrottle):
+    scope = 'username'
+
+    def get_ident_key(self, request):
+        username = request.data.get('username') if hasattr(request.data, 'get') else None
+        if not isinstance(username, str):
+            return None
+        return username.strip().lower()
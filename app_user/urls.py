@@ -1,4 +1,5 @@
 from django.urls import path
+from app_user import async_views
 from app_user.views import *
 
 app_name = "app_user"
@@ -7,9 +8,15 @@ urlpatterns = [
     path('sign-up/', sign_up, name='sign_up'),
     path('sign-in/', sign_in, name='sign_in'),
     path('all/', all, name='all'),
+    path('directory/', directory, name='directory'),
     path('update/<int:user_id>/', update_user, name='update_user'),
     path('delete/<int:user_id>/', delete_user, name='delete_user'),
 
     path('get-user-detail/<int:user_id>/', get_user_detail, name='get_user_detail'),
+    path('profile/<int:user_id>/', user_profile, name='user_profile'),
+
+    # Async read endpoints (serve under ASGI)
+    path('async/all/', async_views.all, name='async_all'),
+    path('async/get-user-detail/<int:user_id>/', async_views.get_user_detail, name='async_get_user_detail'),
 
 ]
@@ -1,24 +1,43 @@
-from django.contrib.auth import get_user_model, authenticate
-from rest_framework.decorators import api_view, permission_classes
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.authtoken.models import Token
 from rest_framework import serializers
+from vetplatform.instrumentation import TimedSerializerMixin
+from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 
+from app_user import directory as vet_directory, hashing
+from app_user.authentication import get_valid_token
 from app_user.models import AppUser
-from app_user.serializers import SignUpSerializer
+from app_user.serializers import SignUpSerializer, AppUserSerializer, DirectoryEntrySerializer
+from cases import detail_cache, images, rollups, sync, user_stats
+from cases.models import Case
+from cases.pagination import KeysetPagination
+from app_user.throttling import IPThrottle, UsernameThrottle
 from rest_framework.parsers import JSONParser
 from django.http import HttpResponse, JsonResponse 
 
 
 User = get_user_model()
 
+
+def _hashing_busy_response():
+    return Response(
+        {'error': 'Too many sign-in requests are being processed, please try again shortly.'},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={'Retry-After': '1'},
+    )
+
+
 @swagger_auto_schema(method='post', request_body=SignUpSerializer)
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([IPThrottle, UsernameThrottle])
 def sign_up(request):
     serializer = SignUpSerializer(data=request.data)
     if serializer.is_valid():
@@ -40,10 +59,15 @@ def sign_up(request):
         if User.objects.filter(username=username).exists():
             return Response({'error': 'Username is already taken.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        user = User.objects.create_user(
-            username=username,
-            password=password,
-            email=email,
+        try:
+            password_hash = hashing.make_password(password)
+        except hashing.HashingBusy:
+            return _hashing_busy_response()
+        # What create_user does, with the password hashed on the hashing pool.
+        user = User(
+            username=User.normalize_username(username),
+            password=password_hash,
+            email=User.objects.normalize_email(email),
             phone_number=phone_number,
             address=address,
             account_type=account_type,
@@ -56,6 +80,7 @@ def sign_up(request):
             university=university,  # New field
             state=state  # New field
         )
+        user.save()
         token, created = Token.objects.get_or_create(user=user)
         return Response({'token': token.key}, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -66,7 +91,7 @@ class SignInSerializer(serializers.Serializer):
     password = serializers.CharField(write_only=True)
     department = serializers.CharField(write_only=True)
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'phone_number', 'address', 'account_type']
@@ -76,6 +101,7 @@ class UserSerializer(serializers.ModelSerializer):
 @swagger_auto_schema(method='post', request_body=SignUpSerializer)
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([IPThrottle, UsernameThrottle])
 def sign_up(request):
     serializer = SignUpSerializer(data=request.data)
     if serializer.is_valid():
@@ -94,10 +120,15 @@ def sign_up(request):
         if User.objects.filter(username=username).exists():
             return Response({'error': 'Username is already taken.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        user = User.objects.create_user(
-            username=username,
-            password=password,
-            email=email,
+        try:
+            password_hash = hashing.make_password(password)
+        except hashing.HashingBusy:
+            return _hashing_busy_response()
+        # What create_user does, with the password hashed on the hashing pool.
+        user = User(
+            username=User.normalize_username(username),
+            password=password_hash,
+            email=User.objects.normalize_email(email),
             phone_number=phone_number,
             address=address,
             account_type=account_type,
@@ -106,6 +137,7 @@ def sign_up(request):
             dob=dob,
             qualification=qualification
         )
+        user.save()
         token, created = Token.objects.get_or_create(user=user)
         return Response({'token': token.key}, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -113,36 +145,33 @@ def sign_up(request):
 @swagger_auto_schema(method='post', request_body=SignInSerializer)
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([IPThrottle, UsernameThrottle])
 def sign_in(request):
     username = request.data.get('username')
     password = request.data.get('password')
     department = request.data.get('department')
     if not username or not password:
         return Response({'error': 'Username and password are required.'}, status=status.HTTP_400_BAD_REQUEST)
-    user = authenticate(username=username, password=password, account_type=department)
+    # ModelBackend.authenticate, with the password checked on the hashing pool.
+    try:
+        user = User._default_manager.get_by_natural_key(username)
+    except User.DoesNotExist:
+        user = None
+    try:
+        valid = hashing.check_password(user, password)
+    except hashing.HashingBusy:
+        return _hashing_busy_response()
     
     
-    if not user:
+    if not valid or not user.is_active:
         return Response({'error': 'Invalid Credentials'}, status=status.HTTP_404_NOT_FOUND)
     
     if user.account_type == department:
-        token, created = Token.objects.get_or_create(user=user)
+        token = get_valid_token(user)  # Replaces the token if it has expired
         return Response({'token': token.key, "id": user.id}, status=status.HTTP_200_OK)
     else:
         return Response({'error': 'Unauthorised Department'}, status=status.HTTP_404_NOT_FOUND)
 
-@api_view(['GET'])
-@permission_classes([AllowAny])
-def get_user_detail(request, user_id):
-    try:
-        user = AppUser.objects.get(pk=user_id)
-    except AppUser.DoesNotExist:
-        return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
-
-    serializer = AppUserSerializer(user)
-    return Response(serializer.data, status=status.HTTP_200_OK)
-
-
 @swagger_auto_schema(method='get', responses={200: UserSerializer(many=True)})
 @api_view(['GET'])
 @permission_classes([AllowAny])
@@ -154,6 +183,51 @@ def all(request):
 
 
 
+@swagger_auto_schema(
+    method='get',
+    manual_parameters=[
+        openapi.Parameter(field, openapi.IN_QUERY, type=openapi.TYPE_ARRAY, items=openapi.Items(type=openapi.TYPE_STRING))
+        for field in vet_directory.FILTER_FIELDS
+    ] + [
+        openapi.Parameter('page_size', openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+        openapi.Parameter('cursor', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+    ],
+    responses={200: DirectoryEntrySerializer(many=True)},
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def directory(request):
+    """
+    Find veterinarians by specialization_category, state, university and qualification
+    (each repeatable), ordered by username and paged with `cursor` / `page_size`.
+    `facets` counts the matches per state and specialization.
+    """
+    filters = vet_directory.parse_filters(request.query_params)
+    users = vet_directory.directory_queryset(filters, DirectoryEntrySerializer.Meta.fields)
+    paginator = KeysetPagination(ordering=vet_directory.DIRECTORY_ORDERING)
+    page = paginator.paginate_queryset(users, request)
+    data = paginator.get_paginated_data(DirectoryEntrySerializer(page, many=True).data)
+    data['facets'] = vet_directory.facet_counts(filters)
+    return Response(data, status=status.HTTP_200_OK)
+
+
+@swagger_auto_schema(method='get', responses={200: 'Profile with case and comment statistics'})
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def user_profile(request, user_id):
+    """
+    A veterinarian's profile with summary statistics: case counts per category and
+    per month, the latest case titles, laboratory report and comment activity.
+    """
+    try:
+        user = User.objects.only(*DirectoryEntrySerializer.Meta.fields).get(pk=user_id)
+    except User.DoesNotExist:
+        return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    data = {'user': DirectoryEntrySerializer(user).data, **user_stats.get_user_stats(user.pk)}
+    return Response(data, status=status.HTTP_200_OK)
+
+
 @swagger_auto_schema(method='put', request_body=UserSerializer, responses={200: UserSerializer()})
 @api_view(['PUT'])
 @permission_classes([AllowAny])
@@ -180,21 +254,32 @@ def delete_user(request, user_id):
     except User.DoesNotExist:
         return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
 
-    user.delete()
+    with transaction.atomic():
+        cases = list(Case.objects.filter(app_user=user).values_list('id', 'image_variants'))
+        rollups.author_deleted(user)  # The delete cascades to the user's cases
+        tombstones = sync.author_tombstones(user)
+        user.delete()
+        for case_id, variants in cases:
+            detail_cache.invalidate(case_id)
+            images.discard_variants(variants)
+        sync.bury(tombstones)
     return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 
-@swagger_auto_schema(method='get', responses={200: UserSerializer()})
+@swagger_auto_schema(method='get', responses={200: AppUserSerializer()})
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_user_detail(request, user_id):
+    """
+    A user with their cases and each case's laboratory reports.
+    """
     try:
-        user = User.objects.get(pk=user_id)
+        user = User.objects.prefetch_related('cases__laboratory_reports').get(pk=user_id)
     except User.DoesNotExist:
         return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
 
-    serializer = UserSerializer(user)
+    serializer = AppUserSerializer(user)
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 
@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def install_search(using, **kwargs):
+    from django.db import connections
+    from . import search
+    search.install(connections[using])
 
 
 class CasesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'cases'
+
+    def ready(self):
+        # Table rebuilds during migrate drop the SQLite search triggers; put them back.
+        post_migrate.connect(install_search, sender=self)
@@ -0,0 +1,128 @@
+"""
+Async versions of the read endpoints, for serving under ASGI (vetplatform/asgi.py).
+
+They return the same payloads as their counterparts in views.py but run on
+the event loop, so slow clients hold a coroutine rather than a worker thread.
+"""
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+
+from vetplatform.async_api import async_api_view
+from vetplatform.pubsub import TooManySubscribers, get_broker
+
+from . import detail_cache, live, threads
+from .fieldsets import apply_fieldset, parse_fieldset
+from .models import Case, Comment
+from .pagination import KeysetPagination
+from .serializers import CaseSerializer, CommentSerializer
+
+
+async def _case_list(request, cases):
+    try:
+        selected = parse_fieldset(request.GET)
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+
+    cases = apply_fieldset(cases, selected)
+    paginator = KeysetPagination()
+    if paginator.is_requested(request):
+        page = await paginator.apaginate_queryset(cases, request)
+        return JsonResponse(paginator.get_paginated_data(CaseSerializer(page, many=True, fields=selected).data))
+    cases = [case async for case in cases]
+    return JsonResponse(CaseSerializer(cases, many=True, fields=selected).data, safe=False)
+
+
+@async_api_view()
+async def list_all_cases(request):
+    """
+    Retrieve all cases in the system.
+    """
+    return await _case_list(request, Case.objects.all())
+
+
+@async_api_view()
+async def list_user_cases(request):
+    """
+    Retrieve all cases associated with the authenticated user.
+    """
+    return await _case_list(request, Case.objects.filter(app_user=request.user))
+
+
+@async_api_view()
+async def get_case_detail(request, case_id):
+    """
+    Retrieve details of a specific case by its ID, with ETag / 304 support.
+    """
+    try:
+        selected = parse_fieldset(request.GET)
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+
+    # The cache rebuild may block on another builder, so keep it off the event loop.
+    cached = await sync_to_async(detail_cache.get_case_detail)(case_id)
+    if cached is None:
+        return JsonResponse({'error': 'Case not found'}, status=404)
+
+    data, etag = detail_cache.project(*cached, selected)
+    if detail_cache.etag_matches(request, etag):
+        return HttpResponse(status=304, headers={'ETag': etag})
+    return JsonResponse(data, headers={'ETag': etag})
+
+
+@async_api_view()
+async def list_comments(request, case_id):
+    """
+    Retrieve all comments associated with a specific case.
+    """
+    if not await Case.objects.filter(pk=case_id).aexists():
+        return JsonResponse({'error': 'Case not found'}, status=404)
+
+    comments, children = await threads.aload_case_thread(case_id)
+    serializer = CommentSerializer(comments, many=True, context={'children': children})
+    return JsonResponse(serializer.data, safe=False)
+
+
+@async_api_view()
+async def list_replies(request, comment_id):
+    """
+    Retrieve all replies associated with a specific comment.
+    """
+    try:
+        comment = await Comment.objects.aget(pk=comment_id)
+    except Comment.DoesNotExist:
+        return JsonResponse({'error': 'Comment not found'}, status=404)
+
+    replies, children = await threads.aload_replies(comment)
+    serializer = CommentSerializer(replies, many=True, context={'children': children})
+    return JsonResponse(serializer.data, safe=False)
+
+
+@async_api_view()
+async def comment_stream(request, case_id):
+    """
+    Server-Sent Events stream of the new comments and replies on a case (see cases/live.py).
+
+    Resumes after the `Last-Event-ID` header (or `last_event_id` parameter). With `once=1`
+    the missed comments are returned and the response ends, which also works under WSGI.
+    """
+    if not await Case.objects.filter(pk=case_id).aexists():
+        return JsonResponse({'error': 'Case not found'}, status=404)
+    last_event_id = live.parse_last_event_id(request.headers.get('Last-Event-ID') or request.GET.get('last_event_id'))
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}  # Stop proxies buffering events
+
+    if request.GET.get('once') == '1':
+        text = ''
+        if last_event_id is not None:
+            text, _, _ = await live.missed_events(case_id, last_event_id)
+        return HttpResponse(text, content_type='text/event-stream', headers=headers)
+
+    if not isinstance(request, ASGIRequest):
+        # A WSGI server would buffer the whole stream before sending any of it.
+        return JsonResponse({'error': 'Streaming requires the ASGI server; pass once=1 to catch up'}, status=400)
+    try:
+        subscription = get_broker().subscribe(live.channel(case_id))
+    except TooManySubscribers:
+        return JsonResponse({'error': 'Too many open streams'}, status=503, headers={'Retry-After': '5'})
+    events = live.EventStream(subscription, case_id, last_event_id)
+    return StreamingHttpResponse(events, content_type='text/event-stream', headers=headers)
@@ -0,0 +1,432 @@
+"""
+Helpers for the benchmark management commands.
+
+Benchmarks always run against throwaway test databases, seeded with
+synthetic data, so they can be pointed at any settings module safely.
+"""
+import itertools
+import json
+import math
+import time
+import tracemalloc
+from contextlib import contextmanager
+from importlib.util import find_spec
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+
+from vetplatform import compression, renderers
+
+from . import counters, feed, rollups, sync
+from .models import Case, Comment, Follow, LaboratoryReport
+
+User = get_user_model()
+
+NARRATIVE = (
+    'Three year old intact male Boerboel presented with a two day history of anorexia, '
+    'vomiting and lethargy. Mucous membranes pale, capillary refill time prolonged. '
+)
+
+
+@contextmanager
+def scratch_database(verbosity=0):
+    from django.test.utils import setup_databases, teardown_databases
+
+    old_config = setup_databases(verbosity=verbosity, interactive=False)
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity=verbosity)
+
+
+def _numbered(objects):
+    sync.stamp(objects)  # As the write paths do, so the dataset shows up in delta syncs
+    return objects
+
+
+def seed(users=10, cases_per_user=10, reports_per_case=2, comments_per_case=5, comment_depth=1, follows_per_user=5,
+         batch_size=1000):
+    """
+    Create a synthetic dataset and return the created users' tokens.
+
+    Each case gets `comments_per_case` top-level comments, each the root of a
+    chain of replies `comment_depth` comments deep. Each vet follows the next
+    `follows_per_user` vets and one category.
+    """
+    password = make_password('benchmark')  # Hash once; PBKDF2 per user would dominate seeding
+    User.objects.bulk_create(
+        [User(username=f'bench-vet-{i}', password=password, name=f'Vet {i}', state='Lagos') for i in range(users)],
+        batch_size=batch_size,
+    )
+    vets = list(User.objects.filter(username__startswith='bench-vet-'))
+    tokens = Token.objects.bulk_create([Token(key=Token.generate_key(), user=vet) for vet in vets])
+
+    categories = [choice for choice, _ in Case.CATEGORY_CHOICES]
+    Case.objects.bulk_create(
+        _numbered([
+            Case(
+                app_user=vet,
+                category=categories[(i + j) % len(categories)],
+                case_title=f'Case {j} of {vet.username}',
+                signalment_and_history=NARRATIVE * 4,
+                clinical_findings=NARRATIVE * 2,
+                tentative_diagnoses='Canine parvovirus enteritis',
+                management=NARRATIVE,
+            )
+            for i, vet in enumerate(vets)
+            for j in range(cases_per_user)
+        ]),
+        batch_size=batch_size,
+    )
+    cases = list(Case.objects.filter(app_user__in=vets).only('id', 'app_user_id'))
+    LaboratoryReport.objects.bulk_create(
+        _numbered([
+            LaboratoryReport(case=case, report_title=f'Report {k}', report_details=NARRATIVE)
+            for case in cases
+            for k in range(reports_per_case)
+        ]),
+        batch_size=batch_size,
+    )
+    level = Comment.objects.bulk_create(
+        _numbered([
+            Comment(case=case, app_user_id=case.app_user_id, comment_text=NARRATIVE)
+            for case in cases
+            for _ in range(comments_per_case)
+        ]),
+        batch_size=batch_size,
+    )
+    for _ in range(comment_depth - 1):
+        level = Comment.objects.bulk_create(
+            _numbered([
+                Comment(case_id=parent.case_id, app_user_id=parent.app_user_id, parent=parent, comment_text=NARRATIVE)
+                for parent in level
+            ]),
+            batch_size=batch_size,
+        )
+    counters.recount(batch_size=batch_size)
+    rollups.rebuild(batch_size=batch_size)
+
+    follows = Follow.objects.bulk_create(
+        [
+            Follow(follower=vet, followed_user=vets[(i + k) % len(vets)])
+            for i, vet in enumerate(vets)
+            for k in range(1, min(follows_per_user, len(vets) - 1) + 1)
+        ]
+        + [Follow(follower=vet, category=categories[i % len(categories)]) for i, vet in enumerate(vets)],
+        batch_size=batch_size,
+    )
+    for follow in follows:
+        feed.followed(follow)
+    return [token.key for token in tokens]
+
+
+def percentile(samples, pct):
+    """
+    Nearest-rank percentile of a list of numbers.
+    """
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class Dataset:
+    """
+    The seeded objects the endpoint requests point at: the first benchmark vet's token, case and thread.
+    """
+
+    def __init__(self, token_key):
+        token = Token.objects.select_related('user').get(key=token_key)
+        self.user = token.user
+        self.token = token.key
+        self.case = Case.objects.filter(app_user=self.user).order_by('id').first()
+        self.comment = Comment.objects.filter(case=self.case, parent=None).order_by('id').first()
+
+
+def _case_body(i):
+    return {'category': 'Medicine', 'case_title': f'Benchmark case {i}', 'signalment_and_history': NARRATIVE}
+
+
+def _report_body(i):
+    return {'report_title': f'Benchmark report {i}', 'report_details': NARRATIVE}
+
+
+def _new_report(data, i):
+    report = LaboratoryReport.objects.create(case=data.case, **_report_body(i))
+    counters.laboratory_report_created(report)
+    return {'case_id': data.case.pk, 'report_id': report.pk}, None
+
+
+def _new_comment(data, i):
+    comment = Comment.objects.create(case=data.case, app_user=data.user, comment_text=NARRATIVE)
+    counters.comment_created(comment)
+    return {'comment_id': comment.pk}, None
+
+
+def _comment_body(data):
+    return {'case': data.case.pk, 'app_user': data.user.pk, 'comment_text': NARRATIVE}
+
+
+# URL name -> (method, prepare). prepare(dataset, i) returns the URL kwargs and the
+# query parameters (GET) or JSON body, creating whatever the request consumes.
+ENDPOINTS = {
+    'list-all-cases': ('get', lambda data, i: ({}, {'page_size': 50})),
+    'export-cases': ('get', lambda data, i: ({}, {'author': data.user.pk})),
+    'search-cases': ('get', lambda data, i: ({}, {'q': 'parvovirus vomiting'})),
+    'case-volume': ('get', lambda data, i: ({}, {'group_by': 'category,state', 'period': 'month'})),
+    'feed': ('get', lambda data, i: ({}, {'page_size': 50})),
+    'list_follows': ('get', lambda data, i: ({}, {'page_size': 50})),
+    'follow': ('post', lambda data, i: ({}, {'followed_user': User.objects.create(username=f'bench-followed-{i}').pk})),
+    'unfollow': ('delete', lambda data, i: (
+        {'follow_id': Follow.objects.create(follower=data.user, followed_user=User.objects.create(username=f'bench-unfollowed-{i}')).pk},
+        None,
+    )),
+    'create-case': ('post', lambda data, i: ({}, _case_body(i))),
+    'bulk-create-cases': ('post', lambda data, i: (
+        {}, [dict(_case_body(i), laboratory_reports=[_report_body(i)]) for _ in range(20)],
+    )),
+    'bulk_create_laboratory_reports': ('post', lambda data, i: (
+        {}, [dict(_report_body(i), case=data.case.pk) for _ in range(20)],
+    )),
+    'my-cases': ('get', lambda data, i: ({}, {'page_size': 50})),
+    'sync': ('get', lambda data, i: ({}, {'scope': 'all', 'since': 0, 'page_size': 50})),
+    'create_laboratory_report': ('post', lambda data, i: ({'case_id': data.case.pk}, _report_body(i))),
+    'delete_laboratory_report': ('delete', _new_report),
+    'delete-case': ('delete', lambda data, i: (
+        {'case_id': Case.objects.create(app_user=data.user, **_case_body(i)).pk}, None,
+    )),
+    'get-case-detail': ('get', lambda data, i: ({'case_id': data.case.pk}, None)),
+    'list_comments': ('get', lambda data, i: ({'case_id': data.case.pk}, None)),
+    'add_comment': ('post', lambda data, i: ({'case_id': data.case.pk}, _comment_body(data))),
+    'reply_to_comment': ('post', lambda data, i: (
+        {'case_id': data.case.pk, 'parent_comment_id': data.comment.pk}, _comment_body(data),
+    )),
+    'list_replies': ('get', lambda data, i: ({'comment_id': data.comment.pk}, None)),
+    'delete_comment': ('delete', _new_comment),
+    'async-list-all-cases': ('get', lambda data, i: ({}, {'page_size': 50})),
+    'async-my-cases': ('get', lambda data, i: ({}, {'page_size': 50})),
+    'async-get-case-detail': ('get', lambda data, i: ({'case_id': data.case.pk}, None)),
+    'async-list-comments': ('get', lambda data, i: ({'case_id': data.case.pk}, None)),
+    'comment_stream': ('get', lambda data, i: ({'case_id': data.case.pk}, {'once': '1', 'last_event_id': 0})),
+    'async-list-replies': ('get', lambda data, i: ({'comment_id': data.comment.pk}, None)),
+    'app_user:sign_up': ('post', lambda data, i: ({}, {'username': f'bench-signup-{i}', 'password': 'benchmark'})),
+    'app_user:sign_in': ('post', lambda data, i: (
+        {}, {'username': data.user.username, 'password': 'benchmark', 'department': data.user.account_type},
+    )),
+    'app_user:all': ('get', lambda data, i: ({}, None)),
+    'app_user:directory': ('get', lambda data, i: ({}, {'state': 'Lagos', 'page_size': 50})),
+    'app_user:update_user': ('put', lambda data, i: (
+        {'user_id': data.user.pk}, {'username': data.user.username, 'email': f'vet{i}@example.com'},
+    )),
+    'app_user:delete_user': ('delete', lambda data, i: (
+        {'user_id': User.objects.create(username=f'bench-delete-{i}').pk}, None,
+    )),
+    'app_user:get_user_detail': ('get', lambda data, i: ({'user_id': data.user.pk}, None)),
+    'app_user:user_profile': ('get', lambda data, i: ({'user_id': data.user.pk}, None)),
+    'app_user:async_all': ('get', lambda data, i: ({}, None)),
+    'app_user:async_get_user_detail': ('get', lambda data, i: ({'user_id': data.user.pk}, None)),
+}
+
+
+def url_names():
+    """
+    Names of every route in cases.urls and app_user.urls, as passed to reverse().
+    """
+    from app_user import urls as app_user_urls
+    from cases import urls as cases_urls
+
+    names = []
+    for module in (cases_urls, app_user_urls):
+        prefix = f'{module.app_name}:' if getattr(module, 'app_name', None) else ''
+        names += [prefix + pattern.name for pattern in module.urlpatterns if isinstance(pattern, URLPattern)]
+    return names
+
+
+class _CountingCursor:
+    """
+    DB-API cursor proxy that counts the rows fetched through it.
+    """
+
+    def __init__(self, cursor, counter):
+        self._cursor = cursor
+        self._counter = counter
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        for row in self._cursor:
+            self._counter.rows += 1
+            yield row
+
+    def execute(self, *args):
+        self._cursor.execute(*args)
+        return self
+
+    def executemany(self, *args):
+        self._cursor.executemany(*args)
+        return self
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        self._counter.rows += row is not None
+        return row
+
+    def fetchmany(self, *args):
+        rows = self._cursor.fetchmany(*args)
+        self._counter.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._counter.rows += len(rows)
+        return rows
+
+
+class RowCounter:
+    """
+    connection.execute_wrapper() hook counting the rows the database hands back to Django.
+    """
+
+    def __init__(self):
+        self.rows = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        cursor = context['cursor']
+        if not isinstance(cursor.cursor, _CountingCursor):
+            cursor.cursor = _CountingCursor(cursor.cursor, self)
+        return execute(sql, params, many, context)
+
+
+def _send(client, method, path, payload):
+    if method == 'get':
+        response = client.get(path, payload)
+    else:
+        body = json.dumps(payload) if payload is not None else ''
+        response = getattr(client, method)(path, body, content_type='application/json')
+    if response.streaming:
+        b''.join(response.streaming_content)  # Exports do their work while streaming
+    return response
+
+
+def run_endpoints(token_key, requests=50, warmup=3, names=None):
+    """
+    Drive every endpoint through the test client and return one result dict per URL name.
+
+    Latency percentiles come from `requests` timed requests. Queries, rows read
+    and peak Python memory come from one extra request run with query capture
+    and tracemalloc on, so the instrumentation does not skew the timings.
+    Sign-in throttling is lifted so repeated sign-ins are measured, not rejected.
+    """
+    missing = sorted(set(url_names()) - set(ENDPOINTS))
+    if missing:
+        raise ValueError(f'No benchmark request defined for: {", ".join(missing)}')
+
+    unlimited = {'capacity': 10 ** 9, 'refill_per_minute': 10 ** 9}
+    with override_settings(AUTH_THROTTLE_RATES={'ip': unlimited, 'username': unlimited}):
+        return _run_endpoints(token_key, requests, warmup, names)
+
+
+def _run_endpoints(token_key, requests, warmup, names):
+    data = Dataset(token_key)
+    client = Client(headers={'Authorization': f'Token {data.token}'})
+    sequence = itertools.count()
+    results = {}
+    for name in names or url_names():
+        method, prepare = ENDPOINTS[name]
+
+        def prepared():
+            # Setup (e.g. creating the row a DELETE removes) stays outside the measurements.
+            kwargs, payload = prepare(data, next(sequence))
+            return reverse(name, kwargs=kwargs), payload
+
+        for _ in range(warmup):
+            _send(client, method, *prepared())
+
+        latencies, failures, statuses = [], 0, set()
+        for _ in range(requests):
+            path, payload = prepared()
+            started = time.perf_counter()
+            response = _send(client, method, path, payload)
+            latencies.append(time.perf_counter() - started)
+            statuses.add(response.status_code)
+            failures += response.status_code >= 400
+
+        path, payload = prepared()
+        counter = RowCounter()
+        tracemalloc.start()
+        try:
+            baseline = tracemalloc.get_traced_memory()[0]
+            with connection.execute_wrapper(counter), CaptureQueriesContext(connection) as queries:
+                _send(client, method, path, payload)
+            peak = tracemalloc.get_traced_memory()[1] - baseline
+        finally:
+            tracemalloc.stop()
+
+        results[name] = {
+            'method': method.upper(),
+            'requests': requests,
+            'statuses': sorted(statuses),
+            'failures': failures,
+            'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+            'queries': len(queries),
+            'rows_read': counter.rows,
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
+    return results
+
+
+# Endpoints whose payloads measure_payloads renders in every format.
+PAYLOAD_ENDPOINTS = ('list-all-cases', 'list_comments')
+
+
+def payload_formats():
+    """
+    (label, renderer) pairs compared by measure_payloads; MessagePack only when msgpack is installed.
+    """
+    formats = [('drf-json', JSONRenderer()), ('orjson', renderers.ORJSONRenderer())]
+    if find_spec('msgpack'):
+        formats.append(('msgpack', renderers.MessagePackRenderer()))
+    return formats
+
+
+def _timed(func, repeats):
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = func()
+        samples.append(time.perf_counter() - started)
+    return result, round(percentile(samples, 50) * 1000, 3)
+
+
+def measure_payloads(token_key, repeats=20):
+    """
+    Median render time and size of the case list and comment thread in each format, and
+    their size and compression time in each content coding. One result list per URL name.
+    """
+    data = Dataset(token_key)
+    client = Client(headers={'Authorization': f'Token {data.token}'})
+    results = {}
+    for name in PAYLOAD_ENDPOINTS:
+        kwargs, params = ENDPOINTS[name][1](data, 0)
+        payload = client.get(reverse(name, kwargs=kwargs), params).data
+        rows = []
+        for label, renderer in payload_formats():
+            body, render_ms = _timed(lambda: renderer.render(payload), repeats)
+            row = {'format': label, 'render_ms': render_ms, 'bytes': len(body)}
+            for coding in compression.encodings():
+                compressed, compress_ms = _timed(lambda: compression.compress(body, coding), repeats)
+                row[f'{coding}_bytes'] = len(compressed)
+                row[f'{coding}_ms'] = compress_ms
+            rows.append(row)
+        results[name] = rows
+    return results
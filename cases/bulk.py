@@ -0,0 +1,91 @@
+"""
+Bulk inserts for clinics syncing a day's caseload in one request.
+
+Items are validated one by one so that a bad item only costs its own slot;
+everything valid is then inserted with bulk_create in a single transaction.
+"""
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+
+from . import counters, detail_cache, feed, rollups, sync, user_stats
+from .models import Case, LaboratoryReport
+from .serializers import BulkCaseSerializer, BulkLaboratoryReportSerializer
+
+
+def _validate(items, serializer_class):
+    valid, errors = [], []
+    for index, item in enumerate(items):
+        serializer = serializer_class(data=item)
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+        else:
+            errors.append({'index': index, 'errors': serializer.errors})
+    return valid, errors
+
+
+def create_cases(user, items):
+    """
+    Validate and insert cases with their nested reports.
+    Returns (created [{'index', 'id'}], errors [{'index', 'errors'}]).
+    """
+    valid, errors = _validate(items, BulkCaseSerializer)
+    batch_size = settings.BULK_CREATE_BATCH_SIZE
+
+    cases, reports = [], []
+    for _, data in valid:
+        data = dict(data)
+        case_reports = data.pop('laboratory_reports', [])
+        case = Case(app_user=user, laboratory_report_count=len(case_reports), **data)
+        cases.append(case)
+        reports.extend((case, report) for report in case_reports)
+
+    reports = [LaboratoryReport(case=case, **report) for case, report in reports]
+    with transaction.atomic():
+        Case.objects.bulk_create(cases, batch_size=batch_size)
+        rollups.cases_created(cases, user)
+        feed.publish(user, cases=cases)
+        user_stats.invalidate(user.pk)
+        # Sequence numbers last: the sequence row stays locked until commit.
+        sync.stamp(cases + reports)
+        Case.objects.bulk_update(cases, ['sync_seq'], batch_size=batch_size)
+        LaboratoryReport.objects.bulk_create(reports, batch_size=batch_size)
+
+    created = [{'index': index, 'id': case.pk} for (index, _), case in zip(valid, cases)]
+    return created, errors
+
+
+def create_laboratory_reports(user, items):
+    """
+    Validate and insert reports for existing cases owned by `user`.
+    Returns (created [{'index', 'case'}], errors [{'index', 'errors'}]).
+    """
+    valid, errors = _validate(items, BulkLaboratoryReportSerializer)
+    owned = set(
+        Case.objects.filter(app_user=user, pk__in={data['case'] for _, data in valid}).values_list('pk', flat=True)
+    )
+
+    accepted = []
+    for index, data in valid:
+        if data['case'] in owned:
+            accepted.append((index, data))
+        else:
+            errors.append({'index': index, 'errors': {'case': ['Case not found']}})
+    errors.sort(key=lambda error: error['index'])
+
+    reports = [
+        LaboratoryReport(case_id=data['case'], report_title=data['report_title'], report_details=data['report_details'])
+        for _, data in accepted
+    ]
+    per_case = Counter(report.case_id for report in reports)
+    with transaction.atomic():
+        counters.laboratory_reports_created(per_case)
+        for case_id in per_case:
+            detail_cache.invalidate(case_id)
+        user_stats.invalidate(user.pk)
+        sync.stamp(reports)  # Last: the sequence row stays locked until commit
+        LaboratoryReport.objects.bulk_create(reports, batch_size=settings.BULK_CREATE_BATCH_SIZE)
+
+    created = [{'index': index, 'case': data['case']} for index, data in accepted]
+    return created, errors
@@ -0,0 +1,91 @@
+"""
+Denormalized counters on Case and Comment.
+
+The views call these inside the same transaction as the write they account
+for. Updates use F() expressions, so concurrent requests never lose an
+increment. `recount` rebuilds the counters from the related rows and is used
+by the `recount_case_counters` management command to fix any drift.
+"""
+from collections import defaultdict
+
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Case, Comment, LaboratoryReport
+
+
+def comment_created(comment):
+    Case.objects.filter(pk=comment.case_id).update(comment_count=F('comment_count') + 1)
+    if comment.parent_id is not None:
+        Comment.objects.filter(pk=comment.parent_id).update(reply_count=F('reply_count') + 1)
+
+
+def comments_deleted(comment, removed):
+    """
+    `comment` was deleted together with its replies; `removed` is the total number of comment rows gone.
+    """
+    if not removed:
+        return  # A concurrent request deleted it first and has accounted for it
+    Case.objects.filter(pk=comment.case_id).update(comment_count=F('comment_count') - removed)
+    if comment.parent_id is not None:
+        Comment.objects.filter(pk=comment.parent_id).update(reply_count=F('reply_count') - 1)
+
+
+def laboratory_report_created(report):
+    Case.objects.filter(pk=report.case_id).update(laboratory_report_count=F('laboratory_report_count') + 1)
+
+
+def laboratory_reports_created(per_case):
+    """
+    Bulk version of laboratory_report_created; `per_case` maps case id -> reports added.
+    Cases are grouped by increment, so this is one UPDATE per distinct count.
+    """
+    by_increment = defaultdict(list)
+    for case_id, added in per_case.items():
+        by_increment[added].append(case_id)
+    for added, case_ids in by_increment.items():
+        Case.objects.filter(pk__in=case_ids).update(laboratory_report_count=F('laboratory_report_count') + added)
+
+
+def laboratory_report_deleted(report):
+    Case.objects.filter(pk=report.case_id).update(laboratory_report_count=F('laboratory_report_count') - 1)
+
+
+def _count(queryset, field):
+    counted = queryset.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
+
+def recount(batch_size=1000):
+    """
+    Recompute every counter in primary key batches. Returns the number of rows that had drifted.
+    """
+    fixed = 0
+    batches = (
+        (Case, {
+            'comment_count': _count(Comment.objects, 'case'),
+            'laboratory_report_count': _count(LaboratoryReport.objects, 'case'),
+        }),
+        (Comment, {
+            'reply_count': _count(Comment.objects, 'parent'),
+        }),
+    )
+    for model, counters in batches:
+        last_pk = 0
+        while True:
+            pks = list(model.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                break
+            last_pk = pks[-1]
+            drifted = Q()
+            for name in counters:
+                drifted |= ~Q(**{name: F('actual_' + name)})
+            stale = list(
+                model.objects.filter(pk__in=pks)
+                .annotate(**{'actual_' + name: expression for name, expression in counters.items()})
+                .filter(drifted)
+                .values_list('pk', flat=True)
+            )
+            if stale:
+                fixed += model.objects.filter(pk__in=stale).update(**counters)
+    return fixed
@@ -0,0 +1,73 @@
+"""
+Response cache for get_case_detail.
+
+Entries are keyed by case id and a version token; every write that changes
+what the detail shows calls `invalidate` once its transaction commits.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from vetplatform.caching import bump_version, get_or_build, get_version
+from vetplatform.db_routing import use_primary
+
+from .models import Case
+from .serializers import CaseSerializer
+
+
+def _version_key(case_id):
+    return f'case-detail:{case_id}:version'
+
+
+def get_case_detail(case_id):
+    """
+    Return (data, etag) for the case, or None if it does not exist.
+    """
+    version = get_version(_version_key(case_id))
+
+    def build():
+        # Read from the primary: an entry built from a lagging replica would stay stale until the next write.
+        with use_primary():
+            try:
+                case = Case.objects.prefetch_related('laboratory_reports').get(pk=case_id)
+            except Case.DoesNotExist:
+                return None
+            data = CaseSerializer(case).data
+        body = json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder).encode('utf-8')
+        return data, '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+
+    return get_or_build(f'case-detail:{case_id}:{version}', build, settings.CASE_DETAIL_CACHE_TIMEOUT)
+
+
+def project(data, etag, selected):
+    """
+    Narrow a cached detail to a sparse fieldset, with an ETag of its own.
+    """
+    if selected is None:
+        return data, etag
+    data = {name: data[name] for name in selected}
+    digest = hashlib.sha256((etag + ','.join(selected)).encode('utf-8')).hexdigest()[:32]
+    return data, '"%s"' % digest
+
+
+def bump(case_id):
+    bump_version(_version_key(case_id))
+
+
+def invalidate(case_id):
+    """
+    Drop the cached detail of a case after the current transaction commits.
+    """
+    transaction.on_commit(lambda: bump(case_id))
+
+
+def etag_matches(request, etag):
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored.
+    candidates = [candidate.strip().removeprefix('W/') for candidate in header.split(',')]
+    return '*' in candidates or etag in candidates
@@ -0,0 +1,257 @@
+"""
+Home feed: new cases and comments by followed vets, and new cases in followed categories.
+
+Writes fan out: a new case or comment is copied as a small FeedItem row into
+the feed of each of its author's followers, so most of a feed page is one
+index range read. Two kinds of sources are read when the feed is requested
+instead (fan-out on read):
+
+- categories, which are few and followed by most users, so copying every new
+  case into every follower's feed would multiply each write many times over;
+- authors with more than FEED_FANOUT_MAX_FOLLOWERS followers, or who post more
+  than FEED_FANOUT_MAX_DAILY_POSTS cases and comments a day. They get a
+  FeedPullAuthor row the first time this is noticed (the posting rate is
+  checked on a random 1 in FEED_PULL_CHECK_EVERY posts), and everything they
+  post from then on is read through the (author, created_at, id) indexes.
+
+The sources are merged newest first on (created_at, kind, id) and paged with
+an opaque cursor. Stored feeds are trimmed back to their newest FEED_MAX_ITEMS
+rows after a random 1 in FEED_TRIM_EVERY inserts, which bounds their size per
+user. The draws are random rather than taken from row ids, whose spacing
+depends on everyone else's traffic.
+"""
+import base64
+import datetime
+import heapq
+import itertools
+import json
+import random
+
+from django.conf import settings
+from django.db.models import Exists, Q
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+
+from .models import Case, Comment, FeedItem, FeedPullAuthor, Follow
+
+
+def _fanout_followers(author, items):
+    """
+    The followers to copy `author`'s new items to: none when the author's items are read at
+    request time, including when they have just become too widely followed or too prolific.
+    """
+    limit = settings.FEED_FANOUT_MAX_FOLLOWERS
+    # One query: a pulled author has no followers to fan out to.
+    followers = list(
+        Follow.objects.filter(~Exists(FeedPullAuthor.objects.filter(author=author)), followed_user=author)
+        .values_list('follower_id', flat=True)[:limit + 1]
+    )
+    if not followers:
+        return []
+
+    too_prolific = False
+    # The posting rate costs two counts, so each item has a 1 in FEED_PULL_CHECK_EVERY chance of checking it.
+    if any(random.randrange(settings.FEED_PULL_CHECK_EVERY) == 0 for _ in items):
+        day_ago = timezone.now() - datetime.timedelta(days=1)
+        posts_limit = settings.FEED_FANOUT_MAX_DAILY_POSTS
+        posts = (
+            Case.objects.filter(app_user=author, created_at__gte=day_ago)[:posts_limit + 1].count()
+            + Comment.objects.filter(app_user=author, created_at__gte=day_ago)[:posts_limit + 1].count()
+        )
+        too_prolific = posts > posts_limit
+    if len(followers) > limit or too_prolific:
+        since = min(created_at for _, _, _, _, created_at in items)
+        FeedPullAuthor.objects.get_or_create(author=author, defaults={'since': since})
+        return []
+    return followers
+
+
+def _trim(user_ids):
+    for user_id in user_ids:
+        stale = (
+            FeedItem.objects.filter(user_id=user_id)
+            .order_by('-created_at', '-kind', '-object_id').values('id')[settings.FEED_MAX_ITEMS:]
+        )
+        FeedItem.objects.filter(pk__in=stale).delete()
+
+
+def publish(author, cases=(), comments=()):
+    """
+    Copy new cases and comments by `author` into their followers' feeds, unless the author's
+    items are read at request time. Call inside the transaction that created them.
+    """
+    # (kind, object id, case id, comment id, created_at)
+    items = [(FeedItem.CASE, case.pk, case.pk, None, case.created_at) for case in cases]
+    items += [(FeedItem.COMMENT, comment.pk, comment.case_id, comment.pk, comment.created_at) for comment in comments]
+    if not items:
+        return
+    followers = _fanout_followers(author, items)
+    if not followers:
+        return
+
+    created = FeedItem.objects.bulk_create(
+        [
+            FeedItem(
+                user_id=follower, author=author, kind=kind, object_id=object_id,
+                case_id=case_id, comment_id=comment_id, created_at=created_at,
+            )
+            for follower in followers
+            for kind, object_id, case_id, comment_id, created_at in items
+        ],
+        batch_size=settings.BULK_CREATE_BATCH_SIZE,
+    )
+    # Each insert has a 1 in FEED_TRIM_EVERY chance of trimming its feed, so no feed
+    # grows much past FEED_MAX_ITEMS without every write paying for a trim.
+    _trim({item.user_id for item in created if random.randrange(settings.FEED_TRIM_EVERY) == 0})
+
+
+def followed(follow):
+    """
+    Copy the most recent fanned-out items of a newly followed author into the follower's feed.
+    """
+    if follow.followed_user_id is None:
+        return  # Category feeds are read at request time
+    author_id = follow.followed_user_id
+    cases = Case.objects.filter(app_user_id=author_id)
+    comments = Comment.objects.filter(app_user_id=author_id)
+    pulled = FeedPullAuthor.objects.filter(author_id=author_id).first()
+    if pulled is not None:
+        cases, comments = cases.filter(created_at__lt=pulled.since), comments.filter(created_at__lt=pulled.since)
+
+    limit = settings.FEED_BACKFILL_ITEMS
+    recent = heapq.nlargest(
+        limit,
+        itertools.chain(
+            ((created_at, FeedItem.CASE, pk, pk, None) for pk, created_at in
+             cases.order_by('-created_at', '-id').values_list('id', 'created_at')[:limit]),
+            ((created_at, FeedItem.COMMENT, pk, case_id, pk) for pk, case_id, created_at in
+             comments.order_by('-created_at', '-id').values_list('id', 'case_id', 'created_at')[:limit]),
+        ),
+    )
+    FeedItem.objects.bulk_create(
+        [
+            FeedItem(
+                user_id=follow.follower_id, author_id=author_id, kind=kind, object_id=object_id,
+                case_id=case_id, comment_id=comment_id, created_at=created_at,
+            )
+            for created_at, kind, object_id, case_id, comment_id in recent
+        ],
+        ignore_conflicts=True,  # Already there from an earlier follow
+    )
+
+
+def unfollowed(follow):
+    if follow.followed_user_id is not None:
+        FeedItem.objects.filter(user_id=follow.follower_id, author_id=follow.followed_user_id).delete()
+
+
+def encode_cursor(key):
+    created_at, kind, object_id = key
+    return base64.urlsafe_b64encode(json.dumps([created_at.isoformat(), kind, object_id]).encode('ascii')).decode('ascii')
+
+
+def decode_cursor(encoded):
+    """
+    The (created_at, kind, id) key a page starts after. Raises NotFound for a malformed cursor.
+    """
+    try:
+        created_at, kind, object_id = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+        created_at = datetime.datetime.fromisoformat(created_at)
+        if (settings.USE_TZ and timezone.is_naive(created_at)) or not isinstance(kind, int) or not isinstance(object_id, int):
+            raise ValueError
+    except (TypeError, ValueError, UnicodeError):
+        raise NotFound('Invalid cursor')
+    return created_at, kind, object_id
+
+
+def _before(cursor, kind=None):
+    """
+    Rows ordered after `cursor` in a newest-first feed. `kind` is the single kind of a
+    case or comment queryset; without it the rows are FeedItems, which carry their kind.
+    """
+    if cursor is None:
+        return Q()
+    created_at, cursor_kind, object_id = cursor
+    earlier = Q(created_at__lt=created_at)
+    if kind is None:
+        return (
+            earlier | Q(created_at=created_at, kind__lt=cursor_kind)
+            | Q(created_at=created_at, kind=cursor_kind, object_id__lt=object_id)
+        )
+    if kind < cursor_kind:
+        return Q(created_at__lte=created_at)
+    if kind > cursor_kind:
+        return earlier
+    return earlier | Q(created_at=created_at, id__lt=object_id)
+
+
+def _sources(user, cursor, limit):
+    """
+    Newest-first lists of (created_at, kind, id) keys, one per source of the user's feed.
+    """
+    follows = list(Follow.objects.filter(follower=user).values_list('followed_user_id', 'category'))
+    authors = [author_id for author_id, _ in follows if author_id is not None]
+    categories = sorted(category for author_id, category in follows if author_id is None)
+
+    def keys(queryset, kind):
+        rows = queryset.filter(_before(cursor, kind)).order_by('-created_at', '-id').values_list('created_at', 'id')
+        return [(created_at, kind, pk) for created_at, pk in rows[:limit]]
+
+    sources = [
+        list(
+            FeedItem.objects.filter(_before(cursor), user=user)
+            .order_by('-created_at', '-kind', '-object_id').values_list('created_at', 'kind', 'object_id')[:limit]
+        ),
+    ]
+    sources += [keys(Case.objects.filter(category=category), FeedItem.CASE) for category in categories]
+    if authors:
+        for author_id, since in FeedPullAuthor.objects.filter(author_id__in=authors).values_list('author_id', 'since'):
+            sources.append(keys(Case.objects.filter(app_user_id=author_id, created_at__gte=since), FeedItem.CASE))
+            sources.append(keys(Comment.objects.filter(app_user_id=author_id, created_at__gte=since), FeedItem.COMMENT))
+    return sources
+
+
+def _author(user):
+    return {'id': user.pk, 'username': user.username, 'name': user.name}
+
+
+def _entries(keys):
+    case_ids = [object_id for _, kind, object_id in keys if kind == FeedItem.CASE]
+    comment_ids = [object_id for _, kind, object_id in keys if kind == FeedItem.COMMENT]
+    author_fields = ('app_user__id', 'app_user__username', 'app_user__name')
+    cases = Case.objects.select_related('app_user').only(
+        'id', 'category', 'case_title', 'created_at', *author_fields,
+    ).in_bulk(case_ids) if case_ids else {}
+    comments = Comment.objects.select_related('app_user', 'case').only(
+        'id', 'comment_text', 'parent_id', 'created_at', 'case__id', 'case__category', 'case__case_title', *author_fields,
+    ).in_bulk(comment_ids) if comment_ids else {}
+
+    entries = []
+    for created_at, kind, object_id in keys:
+        if kind == FeedItem.CASE and object_id in cases:
+            case = cases[object_id]
+            entry = {'kind': 'case', 'author': _author(case.app_user)}
+        elif kind == FeedItem.COMMENT and object_id in comments:
+            comment = comments[object_id]
+            case = comment.case
+            entry = {
+                'kind': 'comment', 'author': _author(comment.app_user),
+                'comment': {'id': comment.pk, 'comment_text': comment.comment_text, 'parent': comment.parent_id},
+            }
+        else:
+            continue  # Deleted since the page was assembled
+        entry['created_at'] = created_at
+        entry['case'] = {'id': case.pk, 'category': case.category, 'case_title': case.case_title}
+        entries.append(entry)
+    return entries
+
+
+def feed_page(user, cursor, page_size):
+    """
+    One page of the user's feed, newest first, and the key to continue after (None on the last page).
+    """
+    merged = heapq.merge(*_sources(user, cursor, page_size + 1), reverse=True)
+    keys = [key for key, _ in itertools.groupby(merged)][:page_size + 1]  # A case can come from several sources
+    has_more = len(keys) > page_size
+    keys = keys[:page_size]
+    return _entries(keys), keys[-1] if has_more else None
@@ -0,0 +1,48 @@
+"""
+Sparse fieldsets for the case endpoints: ?fields=a,b and ?exclude=c,d.
+
+The selection is applied both to the serializer and to the queryset, so the
+unselected TextFields are never read from the database and laboratory
+reports are only prefetched when they are asked for.
+"""
+from .serializers import CaseSerializer
+
+# Columns always loaded: the primary key and the keyset pagination key.
+REQUIRED_COLUMNS = ('id', 'created_at')
+
+# Serializer fields that are not plain model columns.
+RELATED_FIELDS = ('laboratory_reports',)
+
+
+def _split(value):
+    return [name.strip() for name in (value or '').split(',') if name.strip()]
+
+
+def parse_fieldset(params, serializer_class=CaseSerializer):
+    """
+    Return the list of selected serializer field names, or None when every field is wanted.
+    Raises ValueError for unknown field names.
+    """
+    fields, exclude = _split(params.get('fields')), _split(params.get('exclude'))
+    if not fields and not exclude:
+        return None
+
+    available = serializer_class.Meta.fields
+    unknown = sorted(set(fields + exclude) - set(available))
+    if unknown:
+        raise ValueError(f'Unknown field(s): {", ".join(unknown)}')
+    return [name for name in available if (not fields or name in fields) and name not in exclude]
+
+
+def apply_fieldset(queryset, selected):
+    """
+    Load only the columns the selected fields need; prefetch reports only if selected.
+    """
+    if selected is None:
+        return queryset.prefetch_related('laboratory_reports')
+
+    columns = set(REQUIRED_COLUMNS) | {name for name in selected if name not in RELATED_FIELDS}
+    queryset = queryset.only(*columns)
+    if 'laboratory_reports' in selected:
+        queryset = queryset.prefetch_related('laboratory_reports')
+    return queryset
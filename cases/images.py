@@ -0,0 +1,118 @@
+"""
+Background generation of resized variants of Case.image.
+
+create_case / update_case only persist the original upload; once the
+transaction commits, the resizing runs on a small thread pool and the
+resulting file names are stored in Case.image_variants. Replacing the image
+or deleting the case removes the old variant files after the commit.
+"""
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+
+from . import detail_cache, sync
+from .models import Case
+
+logger = logging.getLogger(__name__)
+
+# name -> longest edge in pixels
+VARIANT_SIZES = {
+    'thumbnail': 200,
+    'medium': 800,
+}
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.IMAGE_VARIANT_WORKERS, thread_name_prefix='case-images')
+    return _executor
+
+
+def schedule_variants(case):
+    """
+    Queue variant generation for the case's current image once the transaction commits.
+    """
+    if not case.image:
+        return
+    case_id, name = case.pk, case.image.name
+    transaction.on_commit(lambda: _get_executor().submit(_run, case_id, name))
+
+
+def discard_variants(variants):
+    """
+    Delete the files of a case's previous variants once the transaction that replaced or deleted them commits.
+    """
+    paths = list((variants or {}).values())
+    if paths:
+        transaction.on_commit(lambda: _delete_files(paths))
+
+
+def _delete_files(paths):
+    for path in paths:
+        try:
+            default_storage.delete(path)
+        except OSError:
+            logger.exception('Could not delete image variant %s', path)
+
+
+def _run(case_id, name):
+    close_old_connections()
+    try:
+        generate_variants(case_id, name)
+    except Exception:
+        logger.exception('Could not generate image variants for case %s', case_id)
+    finally:
+        close_old_connections()
+
+
+def _encode(image, fmt):
+    buffer = io.BytesIO()
+    if fmt == 'WEBP':
+        image.save(buffer, fmt, quality=80, method=4)
+    else:
+        image.save(buffer, fmt, quality=85, optimize=True, progressive=True)
+    return ContentFile(buffer.getvalue())
+
+
+def generate_variants(case_id, name):
+    """
+    Write every variant of the image stored at `name` and record them on the case.
+    """
+    root, _ = os.path.splitext(name)
+    formats = [('jpg', 'JPEG')]
+    if features.check('webp'):
+        formats.append(('webp', 'WEBP'))
+
+    variants = {}
+    with default_storage.open(name, 'rb') as original:
+        with Image.open(original) as image:
+            image = ImageOps.exif_transpose(image).convert('RGB')
+            for variant, size in VARIANT_SIZES.items():
+                resized = image.copy()
+                resized.thumbnail((size, size), Image.LANCZOS)
+                for extension, fmt in formats:
+                    key = variant if fmt == 'JPEG' else f'{variant}_{extension}'
+                    variants[key] = default_storage.save(f'{root}_{variant}.{extension}', _encode(resized, fmt))
+
+    # Skip the write if the image was replaced while we were resizing.
+    with transaction.atomic():
+        updated = Case.objects.filter(pk=case_id, image=name).update(
+            image_variants=variants, updated_at=timezone.now(), sync_seq=sync.allocate(),
+        )
+    if not updated:
+        for path in variants.values():
+            default_storage.delete(path)
+        return None
+    detail_cache.bump(case_id)
+    return variants
@@ -0,0 +1,134 @@
+"""
+Live comment updates: a Server-Sent Events stream per case.
+
+Every comment and reply is published once its transaction commits (see
+vetplatform/pubsub.py) and pushed to the case's open streams as an SSE event
+whose id is the comment's change sequence number (`sync_seq`, cases/sync.py).
+Those numbers, unlike primary keys, are handed out in commit order, but the
+messages announcing them are not delivered in that order: each request
+publishes from its own thread, and messages from other workers are relayed
+later. So a stream treats a message only as a sign that something new has
+committed, and sends whatever the primary holds between the last id it sent
+and the message's id. The ids a client sees therefore always rise, and
+nothing below the last one can still turn up. A client that reconnects
+sends the last id it saw in Last-Event-ID (browsers' EventSource does this
+by itself) and first receives the comments it missed. When it missed more
+than SSE_REPLAY_LIMIT, it gets a `reset` event instead and should reload the
+thread with list_comments.
+
+Streams end after SSE_STREAM_TIMEOUT seconds, or as soon as the client falls
+PUBSUB_QUEUE_SIZE events behind, and the client resumes from where it was.
+"""
+import asyncio
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Max
+
+from vetplatform.db_routing import use_primary
+from vetplatform.pubsub import DROPPED, get_broker
+
+from .models import Comment
+from .serializers import CommentSerializer
+
+
+def channel(case_id):
+    return f'case-comments:{case_id}'
+
+
+def _message(comment):
+    data = CommentSerializer(comment, context={'children': {}}).data  # A new comment has no replies
+    return {'id': comment.sync_seq, 'data': json.dumps(data, cls=DjangoJSONEncoder)}
+
+
+def comment_created(comment):
+    """
+    Publish a new comment to its case's streams once the current transaction commits.
+    """
+    message = _message(comment)
+    transaction.on_commit(lambda: get_broker().publish(channel(comment.case_id), message))
+
+
+def event(message):
+    return f'id: {message["id"]}\nevent: comment\ndata: {message["data"]}\n\n'
+
+
+def parse_last_event_id(value):
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+async def missed_events(case_id, last_event_id, up_to=None):
+    """
+    SSE text for the comments after `last_event_id` (up to and including `up_to`), the id
+    to continue from, and whether there were too many to replay (the text is then a
+    `reset` event).
+    """
+    comments = Comment.objects.filter(case_id=case_id, sync_seq__gt=last_event_id).order_by('sync_seq')
+    if up_to is not None:
+        comments = comments.filter(sync_seq__lte=up_to)
+    with use_primary():  # A replica may not have the comment that was just announced
+        missed = [comment async for comment in comments[:settings.SSE_REPLAY_LIMIT + 1]]
+    if len(missed) > settings.SSE_REPLAY_LIMIT:
+        return 'event: reset\ndata: {}\n\n', last_event_id, True
+    text = ''.join(event(_message(comment)) for comment in missed)
+    return text, max([last_event_id] + [comment.sync_seq for comment in missed]), False
+
+
+async def latest_event_id(case_id):
+    with use_primary():
+        latest = await Comment.objects.filter(case_id=case_id).aaggregate(latest=Max('sync_seq'))
+    return latest['latest'] or 0
+
+
+class EventStream:
+    """
+    The SSE body sent to one client: the missed comments, then new ones as they are published.
+
+    Django calls close() when the response is finished with, including when the
+    client disconnects, which ends the subscription.
+    """
+
+    def __init__(self, subscription, case_id, last_event_id):
+        self.subscription = subscription
+        self.case_id = case_id
+        self.last_event_id = last_event_id
+
+    def __aiter__(self):
+        return self._events()
+
+    def close(self):
+        self.subscription.close()
+
+    async def _events(self):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.SSE_STREAM_TIMEOUT
+        last_event_id = self.last_event_id
+        try:
+            if last_event_id is None:
+                last_event_id = await latest_event_id(self.case_id)  # Only what commits from now on
+            yield f'retry: {settings.SSE_RETRY_MS}\n\n'
+            if self.last_event_id is not None:
+                text, last_event_id, reset = await missed_events(self.case_id, last_event_id)
+                if text:
+                    yield text
+                if reset:
+                    last_event_id = await latest_event_id(self.case_id)
+            while (remaining := deadline - loop.time()) > 0:
+                message = await self.subscription.get(timeout=min(settings.SSE_HEARTBEAT_SECONDS, remaining))
+                if message is DROPPED:
+                    return
+                if message is None:
+                    yield ': keep-alive\n\n'  # Keeps proxies from closing an idle stream
+                elif message['id'] > last_event_id:  # Otherwise already sent, announced late
+                    text, last_event_id, reset = await missed_events(self.case_id, last_event_id, message['id'])
+                    if reset:
+                        last_event_id = message['id']
+                    if text:
+                        yield text
+        finally:
+            self.close()
@@ -0,0 +1,77 @@
+import json
+import platform
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from cases.benchmarking import run_endpoints, scratch_database, seed, url_names
+
+COLUMNS = ('p50_ms', 'p95_ms', 'p99_ms', 'queries', 'rows_read', 'peak_memory_kb')
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a synthetic dataset and drive every cases/ and app_user/ endpoint through the test client, '
+        'reporting latency percentiles, queries, rows read and peak memory per endpoint. '
+        'Runs against a throwaway test database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--cases-per-user', type=int, default=10)
+        parser.add_argument('--reports-per-case', type=int, default=2)
+        parser.add_argument('--comments-per-case', type=int, default=5, help='Top-level comments per case.')
+        parser.add_argument('--comment-depth', type=int, default=3, help='Levels of replies under each top-level comment, itself included.')
+        parser.add_argument('--follows-per-user', type=int, default=5, help='Vets each vet follows.')
+        parser.add_argument('--requests', type=int, default=50, help='Timed requests per endpoint.')
+        parser.add_argument('--warmup', type=int, default=3, help='Untimed requests per endpoint before timing.')
+        parser.add_argument('--endpoint', action='append', dest='endpoints', choices=url_names(), help='Only run this URL name; repeatable.')
+        parser.add_argument('--output', help='Write the results to this JSON file.')
+        parser.add_argument('--compare', help='A previous --output file to show the change against.')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as f:
+                    baseline = json.load(f)['endpoints']
+            except (OSError, ValueError, KeyError) as exc:
+                raise CommandError(f'Cannot read {options["compare"]}: {exc}')
+
+        dataset = {
+            name: options[name]
+            for name in ('users', 'cases_per_user', 'reports_per_case', 'comments_per_case', 'comment_depth', 'follows_per_user')
+        }
+        with scratch_database():
+            tokens = seed(**dataset)
+            vendor = connection.vendor
+            endpoints = run_endpoints(tokens[0], options['requests'], options['warmup'], options['endpoints'])
+
+        self.stdout.write(f'{"endpoint":<36}{"method":<8}' + ''.join(f'{column:>16}' for column in COLUMNS))
+        for name, result in endpoints.items():
+            line = f'{name:<36}{result["method"]:<8}'
+            for column in COLUMNS:
+                cell = f'{result[column]:g}'
+                if baseline and name in baseline and baseline[name][column]:
+                    change = (result[column] - baseline[name][column]) / baseline[name][column] * 100
+                    cell += f' ({change:+.0f}%)'
+                line += f'{cell:>16}'
+            if result['failures']:
+                line += self.style.WARNING(f'  {result["failures"]} failed {result["statuses"]}')
+            self.stdout.write(line)
+
+        if options['output']:
+            report = {
+                'created_at': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': vendor,
+                'dataset': dataset,
+                'requests': options['requests'],
+                'endpoints': endpoints,
+            }
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Results written to {options["output"]}'))
@@ -0,0 +1,83 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client
+
+from cases.benchmarking import percentile, scratch_database, seed
+from cases.models import Case, Comment
+
+# (label, sync path, async path); {case} and {comment} are filled in after seeding.
+ENDPOINTS = [
+    ('cases/all', '/cases/cases/all/?page_size=50', '/cases/async/cases/all/?page_size=50'),
+    ('my-cases', '/cases/my-cases/', '/cases/async/my-cases/'),
+    ('case detail', '/cases/cases/{case}/', '/cases/async/cases/{case}/'),
+    ('list_comments', '/cases/cases/{case}/comments/', '/cases/async/cases/{case}/comments/'),
+    ('list_replies', '/cases/comments/{comment}/replies/', '/cases/async/comments/{comment}/replies/'),
+    ('app_user/all', '/app_user/all/', '/app_user/async/all/'),
+    ('get_user_detail', '/app_user/get-user-detail/{user}/', '/app_user/async/get-user-detail/{user}/'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the sync (WSGI) read endpoints with their async (ASGI) versions under concurrent load. '
+        'Runs against a throwaway test database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--cases-per-user', type=int, default=10)
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint and mode.')
+        parser.add_argument('--concurrency', type=int, default=20, help='Threads (WSGI) or in-flight coroutines (ASGI).')
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            tokens = seed(users=options['users'], cases_per_user=options['cases_per_user'])
+            headers = {'Authorization': f'Token {tokens[0]}'}
+            case = Case.objects.order_by('id').first()
+            comment = Comment.objects.filter(case=case).first()
+            values = {'case': case.pk, 'comment': comment.pk, 'user': case.app_user_id}
+
+            self.stdout.write(f'{"endpoint":<18}{"mode":<7}{"req/s":>10}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}')
+            for label, sync_path, async_path in ENDPOINTS:
+                for mode, run, path in (('wsgi', self.run_sync, sync_path), ('asgi', self.run_async, async_path)):
+                    elapsed, latencies = run(path.format(**values), headers, options['requests'], options['concurrency'])
+                    self.stdout.write(
+                        f'{label:<18}{mode:<7}{len(latencies) / elapsed:>10.1f}'
+                        f'{percentile(latencies, 50) * 1000:>10.2f}'
+                        f'{percentile(latencies, 95) * 1000:>10.2f}'
+                        f'{percentile(latencies, 99) * 1000:>10.2f}'
+                    )
+
+    def run_sync(self, path, headers, requests, concurrency):
+        def request(_):
+            client = Client(headers=headers)
+            started = time.perf_counter()
+            response = client.get(path)
+            assert response.status_code == 200, (path, response.status_code)
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(request, range(requests)))
+        return time.perf_counter() - started, latencies
+
+    def run_async(self, path, headers, requests, concurrency):
+        async def main():
+            client = AsyncClient()
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def request():
+                async with semaphore:
+                    started = time.perf_counter()
+                    response = await client.get(path, headers=headers)
+                    assert response.status_code == 200, (path, response.status_code)
+                    return time.perf_counter() - started
+
+            return await asyncio.gather(*(request() for _ in range(requests)))
+
+        started = time.perf_counter()
+        latencies = asyncio.run(main())
+        return time.perf_counter() - started, list(latencies)
@@ -0,0 +1,39 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from cases.benchmarking import measure_payloads, scratch_database, seed
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare render time and bytes on the wire of the case list and comment thread in each '
+        'response format and content coding. Runs against a throwaway test database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--cases-per-user', type=int, default=10)
+        parser.add_argument('--comments-per-case', type=int, default=5, help='Top-level comments per case.')
+        parser.add_argument('--comment-depth', type=int, default=3, help='Levels of replies under each top-level comment, itself included.')
+        parser.add_argument('--repeats', type=int, default=20, help='Timed renders per format; the median is reported.')
+        parser.add_argument('--output', help='Write the results to this JSON file.')
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            tokens = seed(
+                users=options['users'], cases_per_user=options['cases_per_user'],
+                comments_per_case=options['comments_per_case'], comment_depth=options['comment_depth'],
+            )
+            results = measure_payloads(tokens[0], options['repeats'])
+
+        for name, rows in results.items():
+            columns = [column for column in rows[0] if column != 'format']
+            self.stdout.write(f'{name:<20}{"format":<12}' + ''.join(f'{column:>14}' for column in columns))
+            for row in rows:
+                self.stdout.write(f'{"":<20}{row["format"]:<12}' + ''.join(f'{row[column]:>14g}' for column in columns))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Results written to {options["output"]}'))
@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.http import QueryDict
+
+from cases import export
+
+
+class Command(BaseCommand):
+    help = 'Stream cases with their laboratory reports as NDJSON or CSV to a file or stdout.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=list(export.FORMATS), default='ndjson')
+        parser.add_argument('--output', help='File to write to; defaults to stdout.')
+        parser.add_argument('--category', action='append', default=[])
+        parser.add_argument('--created-after', help='ISO 8601 date or datetime (inclusive).')
+        parser.add_argument('--created-before', help='ISO 8601 date or datetime (exclusive).')
+        parser.add_argument('--author', type=int, help='AppUser id.')
+        parser.add_argument('--chunk-size', type=int, default=settings.EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        params = QueryDict(mutable=True)
+        params.setlist('category', options['category'])
+        for name in ('created_after', 'created_before', 'author'):
+            if options[name] is not None:
+                params[name] = str(options[name])
+        try:
+            filters = export.parse_filters(params)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        rows = export.iter_export(options['format'], export.export_queryset(**filters), options['chunk_size'])
+        if not options['output']:
+            for line in rows:
+                self.stdout.write(line, ending='')
+            return
+        with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+            for line in rows:
+                output.write(line)
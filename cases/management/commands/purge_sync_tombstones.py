@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from cases.sync import purge_tombstones
+
+
+class Command(BaseCommand):
+    help = 'Delete delta sync tombstones older than SYNC_TOMBSTONE_DAYS.'
+
+    def handle(self, *args, **options):
+        deleted = purge_tombstones()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} tombstone(s).'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from cases.rollups import rebuild
+from vetplatform.db_routing import use_primary
+
+
+class Command(BaseCommand):
+    help = 'Recompute the case volume rollup behind the analytics endpoint from the cases table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rollup rows inserted per query.')
+
+    def handle(self, *args, **options):
+        with use_primary():
+            written = rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} case volume row(s).'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from cases.counters import recount
+from vetplatform.db_routing import use_primary
+
+
+class Command(BaseCommand):
+    help = 'Recompute the comment, reply and laboratory report counters on cases and comments.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows recounted per query.')
+
+    def handle(self, *args, **options):
+        with use_primary():
+            fixed = recount(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Fixed {fixed} drifted counter row(s).'))
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0007_comment_parent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='case',
+            index=models.Index(fields=['created_at', 'id'], name='case_created_id_idx'),
+        ),
+    ]
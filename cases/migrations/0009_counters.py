@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:26
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Case = apps.get_model('cases', 'Case')
+    Comment = apps.get_model('cases', 'Comment')
+    LaboratoryReport = apps.get_model('cases', 'LaboratoryReport')
+
+    def count(model, field):
+        counted = model.objects.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(total=Count('pk')).values('total')
+        return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
+    Case.objects.update(
+        comment_count=count(Comment, 'case'),
+        laboratory_report_count=count(LaboratoryReport, 'case'),
+    )
+    Comment.objects.update(reply_count=count(Comment, 'parent'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0008_case_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='case',
+            name='comment_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='case',
+            name='laboratory_report_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='reply_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
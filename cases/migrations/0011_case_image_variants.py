@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0010_case_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='case',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
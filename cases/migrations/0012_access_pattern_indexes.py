@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0011_case_image_variants'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Create the composite indexes before dropping the single-column FK indexes they replace.
+        migrations.AddIndex(
+            model_name='case',
+            index=models.Index(fields=['app_user', 'created_at', 'id'], name='case_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['case', 'created_at', 'id'], name='comment_case_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['parent', 'created_at'], name='comment_parent_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='laboratoryreport',
+            index=models.Index(fields=['case', 'created_at'], name='labreport_case_created_idx'),
+        ),
+        migrations.AlterField(
+            model_name='case',
+            name='app_user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='cases', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='comment',
+            name='case',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='cases.case'),
+        ),
+        migrations.AlterField(
+            model_name='comment',
+            name='parent',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='replies', to='cases.comment'),
+        ),
+        migrations.AlterField(
+            model_name='laboratoryreport',
+            name='case',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='laboratory_reports', to='cases.case'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0012_access_pattern_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CaseVolume',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('category', models.CharField(max_length=100)),
+                ('state', models.CharField(blank=True, default='', max_length=100)),
+                ('specialization_category', models.CharField(blank=True, default='', max_length=100)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'category', 'state', 'specialization_category'), name='case_volume_unique')],
+            },
+        ),
+    ]
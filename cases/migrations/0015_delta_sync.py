@@ -0,0 +1,110 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill(apps, schema_editor):
+    # Existing rows were last changed no later than they were created, as far as anyone knows.
+    for name in ('Comment', 'LaboratoryReport'):
+        apps.get_model('cases', name).objects.filter(sync_seq=0).update(updated_at=models.F('created_at'))
+
+    # Number every existing row in (created_at, id) order, cases before their reports and comments,
+    # so a first sync from 0 returns them.
+    rows = []
+    for order, name in enumerate(('Case', 'LaboratoryReport', 'Comment')):
+        model = apps.get_model('cases', name)
+        rows += [
+            (created_at, order, pk, model)
+            for pk, created_at in model.objects.filter(sync_seq=0).values_list('id', 'created_at')
+        ]
+    rows.sort(key=lambda row: row[:3])
+
+    sequence, _ = apps.get_model('cases', 'ChangeSequence').objects.get_or_create(pk=1)
+    numbered = {}
+    for offset, (_, _, pk, model) in enumerate(rows, start=sequence.value + 1):
+        numbered.setdefault(model, []).append(model(pk=pk, sync_seq=offset))
+    for model, objects in numbered.items():
+        model.objects.bulk_update(objects, ['sync_seq'], batch_size=500)
+    sequence.value += len(rows)
+    sequence.save(update_fields=['value'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0014_follows_and_feed'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.BigIntegerField(default=0)),
+                ('purged_through', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sync_seq', models.BigIntegerField(unique=True)),
+                ('kind', models.CharField(choices=[('case', 'Case'), ('laboratory_report', 'Laboratory report'), ('comment', 'Comment')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('case_owner_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='case',
+            name='sync_seq',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='sync_seq',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='laboratoryreport',
+            name='sync_seq',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='laboratoryreport',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='case',
+            index=models.Index(fields=['sync_seq'], name='case_sync_seq_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='case',
+            index=models.Index(fields=['app_user', 'sync_seq'], name='case_user_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['sync_seq'], name='comment_sync_seq_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='laboratoryreport',
+            index=models.Index(fields=['sync_seq'], name='labreport_sync_seq_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['case_owner_id', 'sync_seq'], name='tombstone_owner_seq_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['deleted_at'], name='tombstone_deleted_at_idx'),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
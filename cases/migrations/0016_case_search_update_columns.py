@@ -0,0 +1,25 @@
+from django.db import migrations
+
+
+def recreate_update_trigger(apps, schema_editor):
+    # CREATE TRIGGER IF NOT EXISTS in search.install would keep the old definition.
+    from cases import search
+
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    name = search.FTS_TABLE + '_au'
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+        cursor.execute(search.SQLITE_TRIGGERS[name])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0015_delta_sync'),
+    ]
+
+    operations = [
+        migrations.RunPython(recreate_update_trigger, migrations.RunPython.noop),
+    ]
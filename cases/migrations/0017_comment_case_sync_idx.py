@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0016_case_search_update_columns'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['case', 'sync_seq'], name='comment_case_sync_idx'),
+        ),
+    ]
@@ -8,10 +8,11 @@ class Case(models.Model):
         # Add other categories as needed
     ]
     
-    app_user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='cases')  # Link to AppUser
+    app_user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='cases', db_index=False)  # Link to AppUser; indexed by case_user_created_idx
     category = models.CharField(max_length=100, choices=CATEGORY_CHOICES)
     case_title = models.CharField(max_length=200)
     image = models.ImageField(upload_to='case_images/', blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True)  # Resized copies of image, filled in by cases/images.py
     signalment_and_history = models.TextField(blank=True, null=True)
     clinical_examination = models.TextField(blank=True, null=True)
     clinical_findings = models.TextField(blank=True, null=True)
@@ -21,29 +22,61 @@ class Case(models.Model):
     diagnostic_plan = models.TextField(blank=True, null=True)
     advice_to_clients = models.TextField(blank=True, null=True)
     assistants = models.TextField(blank=True, null=True)
+    comment_count = models.IntegerField(default=0)  # Comments and replies, maintained by cases/counters.py
+    laboratory_report_count = models.IntegerField(default=0)  # Maintained by cases/counters.py
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    sync_seq = models.BigIntegerField(default=0)  # Change sequence number, see cases/sync.py
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='case_created_id_idx'),  # Keyset pagination of cases/all/
+            models.Index(fields=['app_user', 'created_at', 'id'], name='case_user_created_idx'),  # my-cases/
+            models.Index(fields=['category', 'created_at', 'id'], name='case_category_created_idx'),  # Category feeds
+            models.Index(fields=['sync_seq'], name='case_sync_seq_idx'),  # Delta sync
+            models.Index(fields=['app_user', 'sync_seq'], name='case_user_sync_idx'),  # Delta sync of my cases
+        ]
 
     def __str__(self):
         return self.case_title
 
 
 class LaboratoryReport(models.Model):
-    case = models.ForeignKey(Case, related_name='laboratory_reports', on_delete=models.CASCADE)
+    case = models.ForeignKey(Case, related_name='laboratory_reports', on_delete=models.CASCADE, db_index=False)  # Indexed by labreport_case_created_idx
     report_title = models.CharField(max_length=200)
     report_details = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    sync_seq = models.BigIntegerField(default=0)  # Change sequence number, see cases/sync.py
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['case', 'created_at'], name='labreport_case_created_idx'),  # Report prefetch per case
+            models.Index(fields=['sync_seq'], name='labreport_sync_seq_idx'),  # Delta sync
+        ]
 
     def __str__(self):
         return self.report_title
 
 
 class Comment(models.Model):
-    case = models.ForeignKey(Case, related_name='comments', on_delete=models.CASCADE)
-    app_user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='comments')
+    case = models.ForeignKey(Case, related_name='comments', on_delete=models.CASCADE, db_index=False)  # Indexed by comment_case_created_idx
+    app_user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='comments', db_index=False)  # Indexed by comment_user_created_idx
     comment_text = models.TextField()
-    parent = models.ForeignKey('self', null=True, blank=True, related_name='replies', on_delete=models.CASCADE)  # Self-referencing FK for replies
+    parent = models.ForeignKey('self', null=True, blank=True, related_name='replies', on_delete=models.CASCADE, db_index=False)  # Self-referencing FK for replies; indexed by comment_parent_created_idx
+    reply_count = models.IntegerField(default=0)  # Direct replies, maintained by cases/counters.py
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    sync_seq = models.BigIntegerField(default=0)  # Change sequence number, see cases/sync.py
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['case', 'created_at', 'id'], name='comment_case_created_idx'),  # list_comments thread load
+            models.Index(fields=['parent', 'created_at'], name='comment_parent_created_idx'),  # list_replies subtree walk
+            models.Index(fields=['app_user', 'created_at', 'id'], name='comment_user_created_idx'),  # Author feeds
+            models.Index(fields=['sync_seq'], name='comment_sync_seq_idx'),  # Delta sync
+            models.Index(fields=['case', 'sync_seq'], name='comment_case_sync_idx'),  # Comment stream replay
+        ]
 
     def __str__(self):
         return f"Comment by {self.app_user} on {self.case}"
@@ -55,3 +88,121 @@ class Comment(models.Model):
 
 
 
+
+
+class CaseVolume(models.Model):
+    """
+    Cases created per day, category and author state / specialization.
+    Maintained incrementally by cases/rollups.py; rebuilt with `manage.py rebuild_case_volume`.
+    """
+    day = models.DateField()
+    category = models.CharField(max_length=100)
+    state = models.CharField(max_length=100, blank=True, default='')  # '' when the author has none
+    specialization_category = models.CharField(max_length=100, blank=True, default='')
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'category', 'state', 'specialization_category'], name='case_volume_unique',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.day} {self.category}: {self.count}'
+
+
+class Follow(models.Model):
+    """
+    A user following either another vet (`followed_user`) or a case category.
+    """
+    follower = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='follows', db_index=False)  # Indexed by follow_follower_idx
+    followed_user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='followers', null=True, blank=True, db_index=False)  # Indexed by follow_unique_user
+    category = models.CharField(max_length=100, choices=Case.CATEGORY_CHOICES, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(followed_user__isnull=False, category='') | models.Q(followed_user__isnull=True) & ~models.Q(category=''),
+                name='follow_user_or_category',
+            ),
+            # Followed user first: fan-out on write looks up an author's followers.
+            models.UniqueConstraint(
+                fields=['followed_user', 'follower'], condition=models.Q(followed_user__isnull=False), name='follow_unique_user',
+            ),
+            models.UniqueConstraint(
+                fields=['follower', 'category'], condition=~models.Q(category=''), name='follow_unique_category',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['follower', 'created_at', 'id'], name='follow_follower_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.follower_id} follows {self.followed_user_id or self.category}'
+
+
+class FeedItem(models.Model):
+    """
+    A new case or comment copied into a follower's feed by cases/feed.py.
+    """
+    CASE, COMMENT = 0, 1
+    KIND_CHOICES = [(CASE, 'case'), (COMMENT, 'comment')]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+', db_index=False)  # Indexed by feed_user_key_idx
+    author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+', db_index=False)  # Indexed by feed_user_author_idx
+    kind = models.PositiveSmallIntegerField(choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()  # Case or comment id, by kind
+    case = models.ForeignKey(Case, on_delete=models.CASCADE, related_name='+')  # Removes the item with the case
+    comment = models.ForeignKey(Comment, on_delete=models.CASCADE, related_name='+', null=True, blank=True)
+    created_at = models.DateTimeField()  # When the case or comment was created
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'kind', 'object_id'], name='feed_unique_item'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'kind', 'object_id'], name='feed_user_key_idx'),  # Feed pages, trimming
+            models.Index(fields=['user', 'author'], name='feed_user_author_idx'),  # Unfollow
+        ]
+
+
+class FeedPullAuthor(models.Model):
+    """
+    An author whose cases and comments since `since` are read from the source tables when a
+    follower's feed is built, instead of being fanned out to every follower on write.
+    """
+    author = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    since = models.DateTimeField()
+
+    def __str__(self):
+        return f'{self.author_id} since {self.since}'
+
+
+class ChangeSequence(models.Model):
+    """
+    The single row handing out change sequence numbers (cases/sync.py).
+    """
+    value = models.BigIntegerField(default=0)  # Last number handed out
+    purged_through = models.BigIntegerField(default=0)  # Tombstones up to this number have been purged
+
+
+class Tombstone(models.Model):
+    """
+    Marks a deleted case, laboratory report or comment for delta sync clients.
+    """
+    CASE, LABORATORY_REPORT, COMMENT = 'case', 'laboratory_report', 'comment'
+    KIND_CHOICES = [(CASE, 'Case'), (LABORATORY_REPORT, 'Laboratory report'), (COMMENT, 'Comment')]
+
+    sync_seq = models.BigIntegerField(unique=True)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    case_owner_id = models.BigIntegerField()  # Owner of the case the object belonged to, for my-cases sync
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['case_owner_id', 'sync_seq'], name='tombstone_owner_seq_idx'),
+            models.Index(fields=['deleted_at'], name='tombstone_deleted_at_idx'),  # Purging
+        ]
@@ -0,0 +1,163 @@
+"""
+Case volume rollup: cases per day, category, author state and specialization.
+
+The analytics endpoint reads only CaseVolume, so dashboards never group over
+cases_case. The case write paths keep it current with `+1` / `-1` updates
+inside their transactions. Changes that bypass them (the admin, the shell,
+an author moving state) are corrected by `manage.py rebuild_case_volume`.
+"""
+import datetime
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate, TruncMonth
+from django.utils import timezone
+
+from .models import Case, CaseVolume
+
+DIMENSIONS = ('category', 'state', 'specialization_category')
+
+PERIODS = {'day': None, 'month': TruncMonth}
+
+
+def _key(case, author):
+    return (
+        timezone.localdate(case.created_at),
+        case.category,
+        author.state or '',
+        author.specialization_category or '',
+    )
+
+
+def _apply(deltas):
+    """
+    Add each delta to its (day, category, state, specialization_category) row, creating rows as needed.
+    """
+    for (day, category, state, specialization), delta in sorted(deltas.items()):
+        if not delta:
+            continue
+        row = CaseVolume.objects.filter(
+            day=day, category=category, state=state, specialization_category=specialization,
+        )
+        if row.update(count=F('count') + delta):
+            continue
+        try:
+            with transaction.atomic():
+                CaseVolume.objects.create(
+                    day=day, category=category, state=state, specialization_category=specialization, count=delta,
+                )
+        except IntegrityError:
+            row.update(count=F('count') + delta)  # Another request created the row first
+
+
+def cases_created(cases, author):
+    _apply(Counter(_key(case, author) for case in cases))
+
+
+def case_created(case, author):
+    cases_created([case], author)
+
+
+def case_deleted(case, author):
+    _apply({_key(case, author): -1})
+
+
+def case_recategorized(case, old_category, author):
+    if case.category == old_category:
+        return
+    old = _key(case, author)
+    _apply({old[:1] + (old_category,) + old[2:]: -1, _key(case, author): 1})
+
+
+def author_deleted(author):
+    """
+    Remove an author's cases ahead of the cascade that deletes them.
+    """
+    deltas = Counter()
+    for case in Case.objects.filter(app_user=author).only('category', 'created_at'):
+        deltas[_key(case, author)] -= 1
+    _apply(deltas)
+
+
+def rebuild(batch_size=1000):
+    """
+    Recompute the whole rollup from cases_case. Returns the number of rows written.
+    """
+    rows = (
+        Case.objects.annotate(
+            day=TruncDate('created_at'),
+            author_state=Coalesce('app_user__state', Value('')),
+            author_specialization=Coalesce('app_user__specialization_category', Value('')),
+        )
+        .values('day', 'category', 'author_state', 'author_specialization')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    with transaction.atomic():
+        CaseVolume.objects.all().delete()
+        created = CaseVolume.objects.bulk_create(
+            [
+                CaseVolume(
+                    day=row['day'], category=row['category'], state=row['author_state'],
+                    specialization_category=row['author_specialization'], count=row['count'],
+                )
+                for row in rows.iterator(chunk_size=batch_size)
+            ],
+            batch_size=batch_size,
+        )
+    return len(created)
+
+
+def parse_query(params):
+    """
+    Validate the case volume query parameters of a QueryDict. Raises ValueError.
+    """
+    group_by = [name for value in params.getlist('group_by') for name in value.split(',') if name]
+    unknown = sorted(set(group_by) - set(DIMENSIONS))
+    if unknown:
+        raise ValueError(f'group_by must be among {", ".join(DIMENSIONS)}; got {", ".join(unknown)}')
+
+    period = params.get('period') or None
+    if period is not None and period not in PERIODS:
+        raise ValueError(f'period must be one of {", ".join(PERIODS)}')
+
+    dates = {}
+    for name in ('start', 'end'):
+        if params.get(name):
+            try:
+                dates[name] = datetime.date.fromisoformat(params[name])
+            except ValueError:
+                raise ValueError(f'{name} must be a date (YYYY-MM-DD)')
+
+    filters = {}
+    for field in DIMENSIONS:
+        values = sorted({value for value in params.getlist(field) if value})
+        if values:
+            filters[field] = values
+    return {'group_by': list(dict.fromkeys(group_by)), 'period': period, 'filters': filters, **dates}
+
+
+def case_volume(group_by=(), period=None, filters=None, start=None, end=None):
+    """
+    Case counts from the rollup, one row per period and combination of the `group_by` dimensions.
+    """
+    rows = CaseVolume.objects.all()
+    if start is not None:
+        rows = rows.filter(day__gte=start)
+    if end is not None:
+        rows = rows.filter(day__lte=end)
+    for field, values in (filters or {}).items():
+        rows = rows.filter(**{field + '__in': values})
+
+    columns = list(group_by)
+    if period is not None:
+        rows = rows.annotate(period=PERIODS[period]('day') if PERIODS[period] else F('day'))
+        columns.insert(0, 'period')
+    rows = rows.values(*columns).annotate(count=Sum('count')).filter(count__gt=0).order_by(*columns)
+
+    date_format = '%Y-%m' if period == 'month' else '%Y-%m-%d'
+    return [
+        {**row, 'period': row['period'].strftime(date_format)} if period is not None else row
+        for row in rows
+    ]
@@ -0,0 +1,165 @@
+"""
+Full-text search over the clinical narrative of cases.
+
+SQLite: an external-content FTS5 table `cases_case_fts` kept in sync with
+`cases_case` by triggers, ranked with bm25() and highlighted with snippet().
+
+PostgreSQL: a GIN index over to_tsvector() of the same columns, ranked with
+ts_rank_cd() and highlighted with ts_headline().
+
+Other backends fall back to icontains scans.
+
+SQLite drops triggers when Django rebuilds a table during a migration, so
+`install` is idempotent and runs again after every migrate (see apps.py).
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Case
+
+SEARCH_FIELDS = (
+    'case_title',
+    'signalment_and_history',
+    'clinical_findings',
+    'differential_diagnoses',
+    'tentative_diagnoses',
+    'management',
+)
+
+FTS_TABLE = 'cases_case_fts'
+GIN_INDEX = 'cases_case_search_gin'
+HIGHLIGHT_START = '<mark>'
+HIGHLIGHT_END = '</mark>'
+
+_columns = ', '.join(SEARCH_FIELDS)
+_new_values = ', '.join('new.' + field for field in SEARCH_FIELDS)
+_old_values = ', '.join('old.' + field for field in SEARCH_FIELDS)
+_pg_document = " || ' ' || ".join("coalesce(%s, '')" % field for field in SEARCH_FIELDS)
+
+# The update trigger only fires for the searched columns, not for counter bumps and other bookkeeping writes.
+SQLITE_TRIGGERS = {
+    FTS_TABLE + '_ai': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON cases_case BEGIN
+            INSERT INTO {FTS_TABLE} (rowid, {_columns}) VALUES (new.id, {_new_values});
+        END
+    """,
+    FTS_TABLE + '_ad': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON cases_case BEGIN
+            INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, {_columns}) VALUES ('delete', old.id, {_old_values});
+        END
+    """,
+    FTS_TABLE + '_au': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF {_columns} ON cases_case BEGIN
+            INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, {_columns}) VALUES ('delete', old.id, {_old_values});
+            INSERT INTO {FTS_TABLE} (rowid, {_columns}) VALUES (new.id, {_new_values});
+        END
+    """,
+}
+
+
+def install(using_connection=None):
+    """
+    Create the search index for the current backend if it is missing.
+    """
+    conn = using_connection or connection
+    with conn.cursor() as cursor:
+        if conn.vendor == 'sqlite':
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'cases_case'")
+            existing = {row[0] for row in cursor.fetchall()}
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                f"{_columns}, content='cases_case', content_rowid='id', tokenize='porter unicode61')"
+            )
+            for name, sql in SQLITE_TRIGGERS.items():
+                cursor.execute(sql)
+            if not existing.issuperset(SQLITE_TRIGGERS):
+                # Rows may have changed while the triggers were gone.
+                cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')")
+        elif conn.vendor == 'postgresql':
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {GIN_INDEX} ON cases_case "
+                f"USING GIN (to_tsvector('english', {_pg_document}))"
+            )
+
+
+def uninstall(using_connection=None):
+    conn = using_connection or connection
+    with conn.cursor() as cursor:
+        if conn.vendor == 'sqlite':
+            for name in SQLITE_TRIGGERS:
+                cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+            cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+        elif conn.vendor == 'postgresql':
+            cursor.execute(f'DROP INDEX IF EXISTS {GIN_INDEX}')
+
+
+def _fts5_query(text):
+    """
+    Turn free text into an FTS5 query: every word must match, the last one as a prefix.
+    """
+    words = re.findall(r'\w+', text)
+    if not words:
+        return None
+    terms = ['"%s"' % word for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def search_cases(text, categories=None, limit=20, offset=0):
+    """
+    Return [(case_id, rank, snippet)] best match first. Rank scales differ
+    between backends, so callers should only rely on the order.
+    """
+    categories = list(categories or [])
+    category_sql = ''
+    if categories:
+        category_sql = ' AND c.category IN (%s)' % ', '.join(['%s'] * len(categories))
+
+    if connection.vendor == 'sqlite':
+        query = _fts5_query(text)
+        if query is None:
+            return []
+        sql = (
+            f"SELECT f.rowid, bm25({FTS_TABLE}) AS rank, "
+            f"snippet({FTS_TABLE}, -1, %s, %s, '…', 16) "
+            f"FROM {FTS_TABLE} f JOIN cases_case c ON c.id = f.rowid "
+            f"WHERE {FTS_TABLE} MATCH %s{category_sql} "
+            f"ORDER BY rank LIMIT %s OFFSET %s"
+        )
+        params = [HIGHLIGHT_START, HIGHLIGHT_END, query, *categories, limit, offset]
+    elif connection.vendor == 'postgresql':
+        if not text.strip():
+            return []
+        sql = (
+            f"SELECT c.id, ts_rank_cd(to_tsvector('english', {_pg_document}), q) AS rank, "
+            f"ts_headline('english', {_pg_document}, q, %s) "
+            f"FROM cases_case c, websearch_to_tsquery('english', %s) q "
+            f"WHERE to_tsvector('english', {_pg_document}) @@ q{category_sql} "
+            f"ORDER BY rank DESC LIMIT %s OFFSET %s"
+        )
+        options = f'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}, MaxFragments=2'
+        params = [options, text, *categories, limit, offset]
+    else:
+        return _search_fallback(text, categories, limit, offset)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _search_fallback(text, categories, limit, offset):
+    words = re.findall(r'\w+', text)
+    if not words:
+        return []
+    cases = Case.objects.all()
+    for word in words:
+        matches = Q()
+        for field in SEARCH_FIELDS:
+            matches |= Q(**{field + '__icontains': word})
+        cases = cases.filter(matches)
+    if categories:
+        cases = cases.filter(category__in=categories)
+    ids = cases.order_by('-created_at', '-id').values_list('id', flat=True)[offset:offset + limit]
+    return [(case_id, 0, '') for case_id in ids]
@@ -1,13 +1,17 @@
+from django.conf import settings
+from django.core.files.storage import default_storage
 from rest_framework import serializers
-from .models import Case, LaboratoryReport, Comment
+from vetplatform.instrumentation import TimedSerializerMixin
+from .models import Case, LaboratoryReport, Comment, Follow
 
-class LaboratoryReportSerializer(serializers.ModelSerializer):
+class LaboratoryReportSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = LaboratoryReport
         fields = ['report_title', 'report_details', 'created_at']
 
-class CaseSerializer(serializers.ModelSerializer):
+class CaseSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     laboratory_reports = serializers.SerializerMethodField()  # Define a method to fetch lab reports
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Case
@@ -16,6 +20,7 @@ class CaseSerializer(serializers.ModelSerializer):
             'category', 
             'case_title', 
             'image', 
+            'image_variants',
             'signalment_and_history', 
             'clinical_examination', 
             'clinical_findings', 
@@ -25,24 +30,121 @@ class CaseSerializer(serializers.ModelSerializer):
             'diagnostic_plan', 
             'advice_to_clients', 
             'assistants',
+            'comment_count',
+            'laboratory_report_count',
             'laboratory_reports'  # Include lab reports in the case serializer
         ]
-    
+        read_only_fields = ['comment_count', 'laboratory_report_count']
+
+    def __init__(self, *args, fields=None, **kwargs):
+        # `fields` limits the output to a sparse fieldset (see cases/fieldsets.py)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    def get_image_variants(self, obj):
+        """
+        URLs of the resized copies of the image; empty until the background job has produced them.
+        """
+        request = self.context.get('request')
+        urls = {}
+        for variant, name in (obj.image_variants or {}).items():
+            url = default_storage.url(name)
+            urls[variant] = request.build_absolute_uri(url) if request is not None else url
+        return urls
+
     # Method to return laboratory reports
     def get_laboratory_reports(self, obj):
-        reports = LaboratoryReport.objects.filter(case=obj)  # Filter lab reports for this case
+        # Uses the prefetch cache when the queryset was built with prefetch_related('laboratory_reports')
+        reports = obj.laboratory_reports.all()
         return LaboratoryReportSerializer(reports, many=True).data
 
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class BulkLaboratoryReportSerializer(serializers.ModelSerializer):
+    case = serializers.IntegerField()  # Ownership is checked for the whole batch in one query
+
+    class Meta:
+        model = LaboratoryReport
+        fields = ['case', 'report_title', 'report_details']
+
+
+class BulkCaseSerializer(serializers.ModelSerializer):
+    """
+    One item of a bulk case upload: the case fields plus its laboratory reports.
+    Images are not accepted in bulk; upload them afterwards with update_case.
+    """
+    laboratory_reports = LaboratoryReportSerializer(many=True, required=False)
+
+    class Meta:
+        model = Case
+        fields = [
+            field for field in CaseSerializer.Meta.fields
+            if field not in ('id', 'image', 'image_variants', 'comment_count', 'laboratory_report_count')
+        ]
+
+
+class CaseSearchResultSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    rank = serializers.FloatField(read_only=True)
+    snippet = serializers.CharField(read_only=True)  # Matching text with hits wrapped in <mark></mark>
+
+    class Meta:
+        model = Case
+        fields = ['id', 'category', 'case_title', 'created_at', 'rank', 'snippet']
+
+
+class CommentSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     replies = serializers.SerializerMethodField()
 
     class Meta:
         model = Comment
-        fields = ['id', 'case', 'app_user', 'comment_text', 'parent', 'created_at', 'replies']
+        fields = ['id', 'case', 'app_user', 'comment_text', 'parent', 'reply_count', 'created_at', 'replies']
+        read_only_fields = ['reply_count']
 
     def get_replies(self, obj):
-        if obj.replies.exists():
-            return CommentSerializer(obj.replies.all(), many=True).data
-        return []
\ No newline at end of file
+        """
+        Nest replies from the `children` map in the context (see cases/threads.py),
+        stopping at COMMENT_THREAD_MAX_DEPTH. Without a map, falls back to querying.
+        """
+        children = self.context.get('children')
+        if children is None:
+            if obj.replies.exists():
+                return CommentSerializer(obj.replies.all(), many=True).data
+            return []
+
+        depth = self.context.get('depth', 0) + 1
+        if depth >= settings.COMMENT_THREAD_MAX_DEPTH:
+            return []
+        replies = children.get(obj.pk, [])
+        if not replies:
+            return []
+        return CommentSerializer(replies, many=True, context={**self.context, 'depth': depth}).data
+
+
+class FollowSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Follow
+        fields = ['id', 'followed_user', 'category', 'created_at']
+
+    def validate(self, data):
+        if bool(data.get('followed_user')) == bool(data.get('category')):
+            raise serializers.ValidationError('Follow either a user (followed_user) or a category')
+        return data
+
+
+class SyncCaseSerializer(CaseSerializer):
+    class Meta(CaseSerializer.Meta):
+        fields = CaseSerializer.Meta.fields + ['app_user', 'created_at', 'updated_at']
+
+
+class SyncLaboratoryReportSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = LaboratoryReport
+        fields = ['id', 'case', 'report_title', 'report_details', 'created_at', 'updated_at']
+
+
+class SyncCommentSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Comment
+        fields = ['id', 'case', 'app_user', 'comment_text', 'parent', 'created_at', 'updated_at']
@@ -0,0 +1,194 @@
+"""
+Delta sync for offline clients: the cases, laboratory reports and comments changed since a sequence number.
+
+Every write to one of those rows stamps it with the next number of a single
+change sequence (the `sync_seq` columns), and every delete leaves a
+Tombstone with a number of its own. A client keeps the `sequence` returned
+by its last sync and asks for what came after it, in sequence order and
+paged, so a resync moves only the rows that changed. `updated_since`
+further limits a first sync to rows changed after a point in time.
+
+Numbers are handed out by incrementing the ChangeSequence row inside the
+write's transaction. The row stays locked until that transaction commits,
+so writes commit in the order of their numbers and a sync can never read
+number n + 1 while n is still to come. Every write to these tables waits
+for that lock, so take the number as the last statement of the
+transaction: save the row, do the rest of the work, then number() it (or
+insert stamp()ed or bury()'d rows last).
+
+A case's tombstone also stands for its reports and comments, and a comment's
+for its replies. `manage.py purge_sync_tombstones` removes tombstones older
+than SYNC_TOMBSTONE_DAYS; clients that last synced before the purge are told
+to sync again from 0.
+"""
+import datetime
+import heapq
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Max
+from django.utils import timezone
+
+from .models import Case, ChangeSequence, Comment, LaboratoryReport, Tombstone
+from .serializers import SyncCaseSerializer, SyncCommentSerializer, SyncLaboratoryReportSerializer
+
+SCOPES = ('mine', 'all')
+
+# Case fields sent to sync clients. Reports and comments sync on their own, and
+# clients count them locally rather than receive every counter change.
+CASE_FIELDS = [
+    name for name in SyncCaseSerializer.Meta.fields
+    if name not in ('laboratory_reports', 'comment_count', 'laboratory_report_count')
+]
+
+# (kind, model, serializer class and its options, lookup of the case owner)
+SOURCES = [
+    (Tombstone.CASE, Case, SyncCaseSerializer, {'fields': CASE_FIELDS}, 'app_user'),
+    (Tombstone.LABORATORY_REPORT, LaboratoryReport, SyncLaboratoryReportSerializer, {}, 'case__app_user'),
+    (Tombstone.COMMENT, Comment, SyncCommentSerializer, {}, 'case__app_user'),
+]
+
+
+class SyncExpired(Exception):
+    """
+    The client's sequence is older than the purged tombstones.
+    """
+
+
+def allocate(count=1):
+    """
+    Reserve `count` consecutive sequence numbers and return the first. Call inside the write's transaction.
+    """
+    with transaction.atomic(savepoint=False):
+        if not ChangeSequence.objects.filter(pk=1).update(value=F('value') + count):
+            ChangeSequence.objects.get_or_create(pk=1)
+            ChangeSequence.objects.filter(pk=1).update(value=F('value') + count)
+        return ChangeSequence.objects.values_list('value', flat=True).get(pk=1) - count + 1
+
+
+def stamp(objects):
+    """
+    Number unsaved objects before they are bulk inserted, as the last statement of the transaction.
+    """
+    if objects:
+        first = allocate(len(objects))
+        for offset, obj in enumerate(objects):
+            obj.sync_seq = first + offset
+
+
+def number(obj):
+    """
+    Number a saved object. Call it last in the write's transaction.
+    """
+    obj.sync_seq = allocate()
+    type(obj).objects.filter(pk=obj.pk).update(sync_seq=obj.sync_seq)
+
+
+def bury(entries):
+    """
+    Leave tombstones for deleted objects; `entries` are (kind, object id, case owner id).
+    """
+    if not entries:
+        return
+    first = allocate(len(entries))
+    Tombstone.objects.bulk_create([
+        Tombstone(sync_seq=first + offset, kind=kind, object_id=object_id, case_owner_id=owner_id)
+        for offset, (kind, object_id, owner_id) in enumerate(entries)
+    ])
+
+
+def author_tombstones(author):
+    """
+    bury() entries for everything the cascade from deleting `author` removes from other people's view:
+    their cases, and their comments on other vets' cases. Read them before the delete, bury them after.
+    """
+    entries = [(Tombstone.CASE, pk, author.pk) for pk in Case.objects.filter(app_user=author).values_list('id', flat=True)]
+    entries += [
+        (Tombstone.COMMENT, pk, owner_id)
+        for pk, owner_id in Comment.objects.filter(app_user=author).exclude(case__app_user=author)
+        .values_list('id', 'case__app_user_id')
+    ]
+    return entries
+
+
+def purge_tombstones(now=None):
+    """
+    Delete tombstones older than SYNC_TOMBSTONE_DAYS. Returns the number deleted.
+    """
+    cutoff = (now or timezone.now()) - datetime.timedelta(days=settings.SYNC_TOMBSTONE_DAYS)
+    with transaction.atomic():
+        expired = Tombstone.objects.filter(deleted_at__lt=cutoff)
+        through = expired.aggregate(through=Max('sync_seq'))['through']
+        if through is None:
+            return 0
+        ChangeSequence.objects.filter(pk=1, purged_through__lt=through).update(purged_through=through)
+        deleted, _ = Tombstone.objects.filter(sync_seq__lte=through).delete()
+    return deleted
+
+
+def parse_query(params):
+    """
+    (since, updated_since, scope) from a QueryDict. Raises ValueError.
+    """
+    try:
+        since = int(params.get('since') or 0)
+    except ValueError:
+        raise ValueError('since must be a sequence number')
+    if since < 0:
+        raise ValueError('since must be a sequence number')
+
+    updated_since = None
+    if params.get('updated_since'):
+        try:
+            updated_since = datetime.datetime.fromisoformat(params['updated_since'])
+        except ValueError:
+            raise ValueError('updated_since must be an ISO 8601 date and time')
+        if timezone.is_naive(updated_since):
+            updated_since = timezone.make_aware(updated_since)
+
+    scope = params.get('scope') or 'mine'
+    if scope not in SCOPES:
+        raise ValueError(f'scope must be one of {", ".join(SCOPES)}')
+    return since, updated_since, scope
+
+
+def changes(user, since, updated_since, scope, limit):
+    """
+    Up to `limit` changes after `since` in sequence order, and whether more follow.
+    """
+    purged_through = ChangeSequence.objects.filter(pk=1).values_list('purged_through', flat=True).first() or 0
+    if 0 < since < purged_through:
+        raise SyncExpired()
+
+    sources = []
+    for kind, model, _, _, owner_lookup in SOURCES:
+        rows = model.objects.filter(sync_seq__gt=since)
+        if scope == 'mine':
+            rows = rows.filter(**{owner_lookup: user})
+        if updated_since is not None:
+            rows = rows.filter(updated_at__gte=updated_since)
+        sources.append([(row.sync_seq, kind, row) for row in rows.order_by('sync_seq')[:limit + 1]])
+
+    tombstones = Tombstone.objects.filter(sync_seq__gt=since)
+    if scope == 'mine':
+        tombstones = tombstones.filter(case_owner_id=user.pk)
+    if updated_since is not None:
+        tombstones = tombstones.filter(deleted_at__gte=updated_since)
+    sources.append([(tombstone.sync_seq, tombstone.kind, tombstone) for tombstone in tombstones.order_by('sync_seq')[:limit + 1]])
+
+    merged = list(heapq.merge(*sources, key=lambda change: change[0]))
+    page = merged[:limit]
+
+    # Serialize only the rows that made the page, one serializer call per kind.
+    data = {}
+    for kind, _, serializer_class, options, _ in SOURCES:
+        rows = [row for _, row_kind, row in page if row_kind == kind and not isinstance(row, Tombstone)]
+        data.update(((kind, row.pk), item) for row, item in zip(rows, serializer_class(rows, many=True, **options).data))
+
+    results = []
+    for seq, kind, row in page:
+        if isinstance(row, Tombstone):
+            results.append({'seq': seq, 'type': kind, 'id': row.object_id, 'deleted': True})
+        else:
+            results.append({'seq': seq, 'type': kind, 'id': row.pk, 'deleted': False, 'data': data[kind, row.pk]})
+    return results, len(merged) > limit
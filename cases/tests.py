@@ -1,3 +1,1246 @@
-from django.test import TestCase
+import asyncio
+import csv
+import datetime
+import decimal
+import gzip
+import importlib
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from importlib.util import find_spec
+from unittest import mock
+from pathlib import Path
+from io import BytesIO, StringIO
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.apps import apps as django_apps
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+
+from vetplatform import compression, instrumentation, metrics
+from vetplatform.pubsub import DROPPED, get_broker
+from vetplatform.db_routing import PrimaryReplicaRouter, ReplicaRoutingMiddleware, use_primary
+from vetplatform.renderers import ORJSONRenderer
+from vetplatform.testing import explain, full_scans, query_budget
+
+from . import benchmarking, images, live, views
+
+from .serializers import CommentSerializer
+from .models import Case, Comment, FeedItem, FeedPullAuthor, Follow, LaboratoryReport, Tombstone
+
+User = get_user_model()
+
+
+class CasePaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='vet', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for i in range(5):
+            Case.objects.create(app_user=self.user, category='Surgery', case_title=f'Case {i}')
+
+    def test_unpaginated_by_default(self):
+        response = self.client.get(reverse('list-all-cases'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 5)
+
+    def test_walks_forward_and_back_without_gaps(self):
+        response = self.client.get(reverse('list-all-cases'), {'page_size': 2})
+        titles = [case['case_title'] for case in response.data['results']]
+        self.assertIsNone(response.data['previous'])
+
+        pages = [titles]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            pages.append([case['case_title'] for case in response.data['results']])
+        self.assertEqual(sum(pages, []), [f'Case {i}' for i in reversed(range(5))])
+
+        response = self.client.get(response.data['previous'])
+        self.assertEqual([case['case_title'] for case in response.data['results']], pages[-2])
+
+    def test_page_size_is_capped(self):
+        with self.settings(PAGINATION_MAX_PAGE_SIZE=3):
+            response = self.client.get(reverse('my-cases'), {'page_size': 100})
+        self.assertEqual(len(response.data['results']), 3)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('list-all-cases'), {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 404)
+
+
+class CaseQueryBudgetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='vet', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for i in range(5):
+            case = Case.objects.create(app_user=self.user, category='Medicine', case_title=f'Case {i}')
+            for j in range(3):
+                LaboratoryReport.objects.create(case=case, report_title=f'Report {j}', report_details='CBC')
+        self.case = case
+
+    @query_budget(2)
+    def test_list_all_cases(self):
+        response = self.client.get(reverse('list-all-cases'))
+        self.assertEqual(len(response.data[0]['laboratory_reports']), 3)
+
+    @query_budget(2)
+    def test_list_all_cases_paginated(self):
+        self.client.get(reverse('list-all-cases'), {'page_size': 3})
+
+    @query_budget(2)
+    def test_my_cases(self):
+        self.client.get(reverse('my-cases'))
+
+    @query_budget(2)
+    def test_case_detail(self):
+        response = self.client.get(reverse('get-case-detail', args=[self.case.pk]))
+        self.assertEqual(len(response.data['laboratory_reports']), 3)
+
+    def test_budget_fails_when_exceeded(self):
+        with self.assertRaises(AssertionError):
+            with query_budget(1):
+                list(Case.objects.all())
+                list(LaboratoryReport.objects.all())
+
+
+class CommentThreadTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='vet', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.case = Case.objects.create(app_user=self.user, category='Surgery', case_title='Bloat')
+        self.root = Comment.objects.create(case=self.case, app_user=self.user, comment_text='root')
+        parent = self.root
+        for depth in range(1, 5):
+            parent = Comment.objects.create(case=self.case, app_user=self.user, comment_text=f'reply {depth}', parent=parent)
+        Comment.objects.create(case=self.case, app_user=self.user, comment_text='sibling', parent=self.root)
+
+    def test_list_comments_single_query(self):
+        with query_budget(2):
+            response = self.client.get(reverse('list_comments', args=[self.case.pk]))
+        self.assertEqual(len(response.data), 6)
+        root = response.data[0]
+        self.assertEqual(root['comment_text'], 'root')
+        self.assertEqual([reply['comment_text'] for reply in root['replies']], ['reply 1', 'sibling'])
+        self.assertEqual(root['replies'][0]['replies'][0]['replies'][0]['replies'][0]['comment_text'], 'reply 4')
+
+    def test_list_replies_single_query(self):
+        with query_budget(2):
+            response = self.client.get(reverse('list_replies', args=[self.root.pk]))
+        self.assertEqual([reply['comment_text'] for reply in response.data], ['reply 1', 'sibling'])
+        self.assertEqual(response.data[0]['replies'][0]['replies'][0]['comment_text'], 'reply 3')
+
+    def test_max_depth(self):
+        with self.settings(COMMENT_THREAD_MAX_DEPTH=2):
+            response = self.client.get(reverse('list_comments', args=[self.case.pk]))
+        self.assertEqual(response.data[0]['replies'][0]['replies'], [])
+
+
+class CounterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='vet', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.case = Case.objects.create(app_user=self.user, category='Surgery', case_title='Bloat')
+
+    def post_comment(self, url):
+        return self.client.post(url, {'case': self.case.pk, 'app_user': self.user.pk, 'comment_text': 'hi'})
+
+    def test_comment_and_reply_counters(self):
+        response = self.post_comment(reverse('add_comment', args=[self.case.pk]))
+        root = response.data['id']
+        reply = self.post_comment(reverse('reply_to_comment', args=[self.case.pk, root])).data['id']
+        self.post_comment(reverse('reply_to_comment', args=[self.case.pk, reply]))
+
+        self.case.refresh_from_db()
+        self.assertEqual(self.case.comment_count, 3)
+        self.assertEqual(Comment.objects.get(pk=root).reply_count, 1)
+
+        self.client.delete(reverse('delete_comment', args=[reply]))
+        self.case.refresh_from_db()
+        self.assertEqual(self.case.comment_count, 1)
+        self.assertEqual(Comment.objects.get(pk=root).reply_count, 0)
+
+    def test_laboratory_report_counter(self):
+        self.client.post(reverse('create_laboratory_report', args=[self.case.pk]), {'report_title': 'CBC', 'report_details': 'ok'})
+        report = LaboratoryReport.objects.get()
+        self.case.refresh_from_db()
+        self.assertEqual(self.case.laboratory_report_count, 1)
+
+        self.client.delete(reverse('delete_laboratory_report', args=[self.case.pk, report.pk]))
+        self.case.refresh_from_db()
+        self.assertEqual(self.case.laboratory_report_count, 0)
+
+    def test_racing_deletes_count_once(self):
+        root = self.post_comment(reverse('add_comment', args=[self.case.pk])).data['id']
+        reply = self.post_comment(reverse('reply_to_comment', args=[self.case.pk, root])).data['id']
+        self.client.post(reverse('create_laboratory_report', args=[self.case.pk]), {'report_title': 'CBC', 'report_details': 'ok'})
+        # Each row is looked up by both requests, then deleted by the first.
+        stale_reply, stale_report = Comment.objects.get(pk=reply), LaboratoryReport.objects.get()
+        self.client.delete(reverse('delete_comment', args=[reply]))
+        self.client.delete(reverse('delete_laboratory_report', args=[self.case.pk, stale_report.pk]))
+
+        with mock.patch.object(Comment.objects, 'get', return_value=stale_reply):
+            response = self.client.delete(reverse('delete_comment', args=[reply]))
+        self.assertEqual(response.status_code, 404)
+        with mock.patch.object(LaboratoryReport.objects, 'get', return_value=stale_report):
+            response = self.client.delete(reverse('delete_laboratory_report', args=[self.case.pk, stale_report.pk]))
+        self.assertEqual(response.status_code, 404)
+
+        self.case.refresh_from_db()
+        self.assertEqual((self.case.comment_count, self.case.laboratory_report_count), (1, 0))
+        self.assertEqual(Comment.objects.get(pk=root).reply_count, 0)
+
+    def test_recount_fixes_drift(self):
+        Comment.objects.create(case=self.case, app_user=self.user, comment_text='untracked')
+        Case.objects.filter(pk=self.case.pk).update(laboratory_report_count=7)
+        call_command('recount_case_counters', stdout=StringIO())
+        self.case.refresh_from_db()
+        self.assertEqual((self.case.comment_count, self.case.laboratory_report_count), (1, 0))
+
+
+class CaseSearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='vet', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.bloat = Case.objects.create(
+            app_user=self.user, category='Surgery', case_title='Gastric dilatation',
+            clinical_findings='Tympanic abdomen and unproductive retching',
+        )
+        self.parvo = Case.objects.create(
+            app_user=self.user, category='Medicine', case_title='Puppy with diarrhoea',
+            tentative_diagnoses='Canine parvovirus enteritis',
+        )
+
+    def search(self, **params):
+        response = self.client.get(reverse('search-cases'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_ranked_hits_with_snippets(self):
+        results = self.search(q='parvo')
+        self.assertEqual([result['id'] for result in results], [self.parvo.pk])
+        self.assertIn('<mark>', results[0]['snippet'])
+
+    def test_category_filter(self):
+        self.assertEqual(self.search(q='abdomen', category='Medicine'), [])
+        self.assertEqual(len(self.search(q='abdomen', category='Surgery')), 1)
+
+    def test_index_follows_updates_and_deletes(self):
+        self.parvo.management = 'Fluids and maropitant'
+        self.parvo.save()
+        self.assertEqual(len(self.search(q='maropitant')), 1)
+        self.parvo.delete()
+        self.assertEqual(self.search(q='maropitant'), [])
+
+    def test_query_syntax_is_escaped(self):
+        self.assertEqual(self.search(q='"AND ( NEAR'), [])
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', 'SQLite triggers')
+    def test_update_trigger_only_watches_searched_columns(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'cases_case_fts_au'")
+            sql = cursor.fetchone()[0]
+        self.assertIn('AFTER UPDATE OF case_title, signalment_and_history', sql)
+
+
+class CaseDetailCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='vet', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.case = Case.objects.create(app_user=self.user, category='Surgery', case_title='Bloat')
+        self.url = reverse('get-case-detail', args=[self.case.pk])
+
+    def test_cached_with_conditional_get(self):
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        with query_budget(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_lab_report_invalidates(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('create_laboratory_report', args=[self.case.pk]), {'report_title': 'CBC', 'report_details': 'ok'})
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['laboratory_reports']), 1)
+
+    def test_delete_invalidates(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse('delete-case', args=[self.case.pk]))
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_deleting_the_author_invalidates(self):
+        reader = APIClient()
+        reader.force_authenticate(User.objects.create_user(username='reader', password='secret'))
+        self.assertEqual(reader.get(self.url).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            reader.delete(reverse('app_user:delete_user', args=[self.user.pk]))
+        self.assertEqual(reader.get(self.url).status_code, 404)
+
+
+class ImageVariantTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.user = User.objects.create_user(username='vet', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self):
+        buffer = BytesIO()
+        Image.new('RGB', (1600, 1200), 'white').save(buffer, 'PNG')
+        return SimpleUploadedFile('xray.png', buffer.getvalue(), content_type='image/png')
+
+    def test_create_case_returns_before_resizing(self):
+        with override_settings(MEDIA_ROOT=self.media_root):
+            with self.captureOnCommitCallbacks() as callbacks:
+                response = self.client.post(reverse('create-case'), {'category': 'Surgery', 'case_title': 'Fracture', 'image': self.upload()})
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(response.data['image_variants'], {})
+            self.assertEqual(len(callbacks), 2)  # Resizing and the author's statistics wait for the commit
+
+    def test_generate_variants(self):
+        with override_settings(MEDIA_ROOT=self.media_root):
+            case = Case.objects.create(app_user=self.user, category='Surgery', case_title='Fracture', image=self.upload())
+            variants = images.generate_variants(case.pk, case.image.name)
+            self.assertIn('thumbnail', variants)
+            with Image.open(Path(self.media_root) / variants['medium']) as medium:
+                self.assertEqual(medium.size, (800, 600))
+
+            response = self.client.get(reverse('get-case-detail', args=[case.pk]))
+            self.assertTrue(response.data['image_variants']['thumbnail'].endswith('_thumbnail.jpg'))
+
+    def test_replaced_image_is_not_overwritten(self):
+        with override_settings(MEDIA_ROOT=self.media_root):
+            case = Case.objects.create(app_user=self.user, category='Surgery', case_title='Fracture', image=self.upload())
+            stale = case.image.name
+            Case.objects.filter(pk=case.pk).update(image='case_images/replacement.png')
+            self.assertIsNone(images.generate_variants(case.pk, stale))
+            case.refresh_from_db()
+            self.assertEqual(case.image_variants, {})
+
+    def test_old_variants_are_deleted_with_their_image(self):
+        with override_settings(MEDIA_ROOT=self.media_root):
+            case = Case.objects.create(app_user=self.user, category='Surgery', case_title='Fracture', image=self.upload())
+            replaced = images.generate_variants(case.pk, case.image.name)
+            # update_case has no route; call the view directly.
+            request = APIRequestFactory().put('/', {'category': 'Surgery', 'case_title': 'Fracture', 'image': self.upload()}, format='multipart')
+            force_authenticate(request, self.user)
+            with self.captureOnCommitCallbacks(execute=True), mock.patch.object(images, 'schedule_variants'):
+                self.assertEqual(views.update_case(request, case.pk).status_code, 200)
+            self.assertFalse(any((Path(self.media_root) / path).exists() for path in replaced.values()))
+
+            case.refresh_from_db()
+            current = images.generate_variants(case.pk, case.image.name)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.delete(reverse('delete-case', args=[case.pk]))
+            self.assertFalse(any((Path(self.media_root) / path).exists() for path in current.values()))
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='vet', password='secret')
+        self.headers = {'Authorization': f'Token {Token.objects.create(user=self.user).key}'}
+        self.case = Case.objects.create(app_user=self.user, category='Surgery', case_title='Bloat')
+        LaboratoryReport.objects.create(case=self.case, report_title='CBC', report_details='ok')
+        root = Comment.objects.create(case=self.case, app_user=self.user, comment_text='root')
+        Comment.objects.create(case=self.case, app_user=self.user, comment_text='reply', parent=root)
+        self.root = root
+
+    def assertSameResponse(self, sync_url, async_url):
+        sync_response = self.client.get(sync_url, headers=self.headers)
+        async_response = self.client.get(async_url, headers=self.headers)
+        self.assertEqual(async_response.status_code, 200)
+        self.assertEqual(async_response.json(), sync_response.json())
+
+    def test_matches_sync_endpoints(self):
+        self.assertSameResponse(reverse('list-all-cases'), reverse('async-list-all-cases'))
+        self.assertSameResponse(reverse('my-cases') + '?page_size=1', reverse('async-my-cases') + '?page_size=1')
+        self.assertSameResponse(reverse('get-case-detail', args=[self.case.pk]), reverse('async-get-case-detail', args=[self.case.pk]))
+        self.assertSameResponse(reverse('list_comments', args=[self.case.pk]), reverse('async-list-comments', args=[self.case.pk]))
+        self.assertSameResponse(reverse('list_replies', args=[self.root.pk]), reverse('async-list-replies', args=[self.root.pk]))
+
+    def test_requires_authentication(self):
+        response = self.client.get(reverse('async-list-all-cases'))
+        self.assertEqual(response.status_code, 401)
+
+    async def test_runs_natively_under_asgi(self):
+        response = await self.async_client.get(reverse('async-list-all-cases'), headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['laboratory_reports'][0]['report_title'], 'CBC')
+
+
+@override_settings(SSE_HEARTBEAT_SECONDS=0.05)
+class CommentStreamTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='vet', password='secret')
+        self.headers = {'Authorization': f'Token {Token.objects.create(user=self.user).key}'}
+        self.case = Case.objects.create(app_user=self.user, category='Surgery', case_title='Bloat')
+        self.url = reverse('comment_stream', args=[self.case.pk])
+
+    def add_comment(self, text, parent=None):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = reverse('reply_to_comment', args=[self.case.pk, parent.pk]) if parent else reverse('add_comment', args=[self.case.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            pk = client.post(url, {'case': self.case.pk, 'app_user': self.user.pk, 'comment_text': text}).data['id']
+        return Comment.objects.get(pk=pk)
+
+    async def next_event(self, events):
+        while True:
+            chunk = (await anext(events)).decode()
+            if chunk.startswith('id:'):
+                return chunk
+
+    def event_ids(self, text):
+        return [int(line[len('id: '):]) for line in text.splitlines() if line.startswith('id:')]
+
+    async def test_pushes_new_comments_and_replies(self):
+        response = await self.async_client.get(self.url, headers=self.headers)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = aiter(response.streaming_content)
+        self.assertTrue((await anext(events)).startswith(b'retry:'))
+
+        root = await sync_to_async(self.add_comment)('root')
+        reply = await sync_to_async(self.add_comment)('reply', parent=root)
+        first, second = await self.next_event(events), await self.next_event(events)
+        self.assertTrue(first.startswith(f'id: {root.sync_seq}\nevent: comment\n'))
+        self.assertEqual(json.loads(second.split('data: ', 1)[1])['parent'], root.pk)
+        self.assertEqual(self.event_ids(second), [reply.sync_seq])
+
+        # The server closes the response when the client goes away.
+        await events.aclose()
+        response.close()
+        self.assertEqual(get_broker().subscriber_count(), 0)
+
+    async def test_resumes_after_last_event_id(self):
+        comments = [await sync_to_async(self.add_comment)(f'comment {i}') for i in range(3)]
+        response = await self.async_client.get(self.url, headers={**self.headers, 'Last-Event-ID': str(comments[0].sync_seq)})
+        events = aiter(response.streaming_content)
+        replay = await self.next_event(events)  # Missed comments are sent in one chunk
+        self.assertEqual(self.event_ids(replay), [comments[1].sync_seq, comments[2].sync_seq])
+        await events.aclose()
+        response.close()
+
+    def test_catch_up_without_streaming(self):
+        comments = [self.add_comment(f'comment {i}') for i in range(3)]
+        response = self.client.get(self.url, {'once': '1', 'last_event_id': comments[0].sync_seq}, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.event_ids(response.content.decode()), [comments[1].sync_seq, comments[2].sync_seq])
+        # An open-ended stream needs the ASGI server.
+        self.assertEqual(self.client.get(self.url, headers=self.headers).status_code, 400)
+
+    def test_replay_follows_commit_order_not_ids(self):
+        first, second = self.add_comment('first'), self.add_comment('second')
+        # A lower id that committed later, as happens when concurrent inserts commit out of order.
+        Comment.objects.filter(pk=first.pk).update(sync_seq=second.sync_seq + 1)
+        response = self.client.get(self.url, {'once': '1', 'last_event_id': second.sync_seq}, headers=self.headers)
+        self.assertEqual(self.event_ids(response.content.decode()), [second.sync_seq + 1])
+
+    @override_settings(SSE_HEARTBEAT_SECONDS=0.1)
+    async def test_late_announcements_are_not_lost(self):
+        response = await self.async_client.get(self.url, headers=self.headers)
+        events = aiter(response.streaming_content)
+        await anext(events)
+        for seq in (101, 102):
+            await sync_to_async(Comment.objects.create)(case=self.case, app_user=self.user, comment_text='c', sync_seq=seq)
+        # Committed as 101 then 102, but announced the other way round.
+        get_broker().publish(live.channel(self.case.pk), {'id': 102, 'data': '{}'})
+        get_broker().publish(live.channel(self.case.pk), {'id': 101, 'data': '{}'})
+        self.assertEqual(self.event_ids(await self.next_event(events)), [101, 102])
+        self.assertEqual(await anext(events), b': keep-alive\n\n')  # 101 is not sent twice
+        await events.aclose()
+        response.close()
+
+    @override_settings(SSE_REPLAY_LIMIT=1)
+    def test_resets_when_too_far_behind(self):
+        comments = [self.add_comment(f'comment {i}') for i in range(3)]
+        response = self.client.get(self.url, {'once': '1', 'last_event_id': comments[0].sync_seq - 1}, headers=self.headers)
+        self.assertEqual(response.content.decode(), 'event: reset\ndata: {}\n\n')
+
+    @override_settings(PUBSUB_QUEUE_SIZE=2)
+    async def test_slow_subscribers_are_dropped(self):
+        broker = get_broker()
+        subscription = broker.subscribe('test-channel')
+        for i in range(3):
+            broker.publish('test-channel', {'id': i})
+        await asyncio.sleep(0)  # Let the deliveries run
+        self.assertIs(await subscription.get(timeout=1), DROPPED)
+        self.assertEqual(broker.subscriber_count(), 0)
+
+
+class BulkCreateTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='vet', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_bulk_create_cases_with_partial_errors(self):
+        items = [
+            {'category': 'Surgery', 'case_title': f'Case {i}', 'laboratory_reports': [{'report_title': 'CBC', 'report_details': 'ok'}] * i}
+            for i in range(50)
+        ]
+        items[3] = {'category': 'Astrology', 'case_title': 'Bad'}
+        # Inserts are batched (SQLite caps a batch at 999 parameters); the first case of a day creates its rollup row;
+        # reserving the batch's sync sequence numbers takes two.
+        with query_budget(19):
+            response = self.client.post(reverse('bulk-create-cases'), items, format='json')
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([error['index'] for error in response.data['errors']], [3])
+        self.assertEqual(len(response.data['created']), 49)
+        self.assertEqual(Case.objects.count(), 49)
+        case = Case.objects.get(case_title='Case 5')
+        self.assertEqual(case.laboratory_report_count, 5)
+        self.assertEqual(case.laboratory_reports.count(), 5)
+
+    def test_bulk_create_laboratory_reports(self):
+        mine = Case.objects.create(app_user=self.user, category='Surgery', case_title='Mine')
+        other = User.objects.create_user(username='other', password='secret')
+        theirs = Case.objects.create(app_user=other, category='Surgery', case_title='Theirs')
+        items = [
+            {'case': mine.pk, 'report_title': 'PCV', 'report_details': '35%'},
+            {'case': theirs.pk, 'report_title': 'PCV', 'report_details': '35%'},
+            {'case': mine.pk, 'report_title': 'TP', 'report_details': '6.5'},
+        ]
+        response = self.client.post(reverse('bulk_create_laboratory_reports'), items, format='json')
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.data['errors'][0]['index'], 1)
+        mine.refresh_from_db()
+        self.assertEqual(mine.laboratory_report_count, 2)
+        self.assertFalse(theirs.laboratory_reports.exists())
+
+    def test_rejects_oversized_batches(self):
+        with self.settings(BULK_CREATE_MAX_ITEMS=1):
+            response = self.client.post(reverse('bulk-create-cases'), [{}, {}], format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='vet', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for i in range(7):
+            case = Case.objects.create(app_user=self.user, category='Surgery' if i % 2 else 'Medicine', case_title=f'Case {i}')
+            LaboratoryReport.objects.create(case=case, report_title='CBC', report_details=f'run {i}')
+
+    def read(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_ndjson_stream(self):
+        with self.settings(EXPORT_CHUNK_SIZE=3), query_budget(6):  # Two queries per chunk
+            response = self.client.get(reverse('export-cases'), {'category': 'Surgery'})
+            lines = self.read(response).splitlines()
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual([row['case_title'] for row in rows], ['Case 1', 'Case 3', 'Case 5'])
+        self.assertEqual(rows[0]['laboratory_reports'][0]['report_details'], 'run 1')
+
+    def test_csv_stream(self):
+        response = self.client.get(reverse('export-cases'), {'export_format': 'csv', 'author': self.user.pk})
+        rows = list(csv.DictReader(self.read(response).splitlines()))
+        self.assertEqual(len(rows), 7)
+        self.assertEqual(json.loads(rows[0]['laboratory_reports'])[0]['report_title'], 'CBC')
+
+    def test_date_filter(self):
+        response = self.client.get(reverse('export-cases'), {'created_before': '2000-01-01'})
+        self.assertEqual(self.read(response), '')
+        response = self.client.get(reverse('export-cases'), {'created_after': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_management_command(self):
+        out = StringIO()
+        call_command('export_cases', '--category', 'Medicine', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 4)
+
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='vet', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.case = Case.objects.create(app_user=self.user, category='Surgery', case_title='Bloat', management='Decompress')
+        LaboratoryReport.objects.create(case=self.case, report_title='CBC', report_details='ok')
+
+    def test_fields_limit_columns_and_skip_reports(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('list-all-cases'), {'fields': 'id,case_title', 'page_size': 10})
+        self.assertEqual(response.data['results'], [{'id': self.case.pk, 'case_title': 'Bloat'}])
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('management', queries[0]['sql'])
+
+    def test_exclude(self):
+        response = self.client.get(reverse('my-cases'), {'exclude': 'laboratory_reports,management'})
+        self.assertNotIn('management', response.data[0])
+        self.assertNotIn('laboratory_reports', response.data[0])
+        self.assertIn('case_title', response.data[0])
+
+    def test_detail_projection_has_its_own_etag(self):
+        url = reverse('get-case-detail', args=[self.case.pk])
+        full = self.client.get(url)
+        sparse = self.client.get(url, {'fields': 'case_title'})
+        self.assertEqual(sparse.data, {'case_title': 'Bloat'})
+        self.assertNotEqual(full['ETag'], sparse['ETag'])
+        self.assertEqual(self.client.get(url, {'fields': 'case_title'}, HTTP_IF_NONE_MATCH=sparse['ETag']).status_code, 304)
+
+    def test_unknown_field(self):
+        self.assertEqual(self.client.get(reverse('list-all-cases'), {'fields': 'password'}).status_code, 400)
+
+
+class QueryPlanTests(TestCase):
+    """
+    Every SELECT behind these endpoints must be answered from an index, without a sort step.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='vet', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.case = Case.objects.create(app_user=self.user, category='Surgery', case_title='Bloat')
+        LaboratoryReport.objects.create(case=self.case, report_title='CBC', report_details='ok')
+        self.comment = Comment.objects.create(case=self.case, app_user=self.user, comment_text='root')
+        Comment.objects.create(case=self.case, app_user=self.user, comment_text='reply', parent=self.comment)
+
+    def assertIndexed(self, url, params=None, indexes=(), ctes=()):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url, params).status_code, 200)
+        plans = [explain(query['sql']) for query in queries if query['sql'].lstrip().upper().startswith(('SELECT', 'WITH'))]
+        self.assertTrue(plans)
+        for plan in plans:
+            self.assertEqual(full_scans(plan, connection.vendor, ctes), [], plan)
+        combined = '\n'.join(plans)
+        for index in indexes:
+            self.assertIn(index, combined)
+
+    def test_list_all_cases_paginated(self):
+        self.assertIndexed(reverse('list-all-cases'), {'page_size': 10}, ['case_created_id_idx', 'labreport_case_created_idx'])
+
+    def test_my_cases(self):
+        self.assertIndexed(reverse('my-cases'), {'page_size': 10}, ['case_user_created_idx'])
+
+    def test_case_detail(self):
+        self.assertIndexed(reverse('get-case-detail', args=[self.case.pk]), indexes=['labreport_case_created_idx'])
+
+    def test_list_comments(self):
+        self.assertIndexed(reverse('list_comments', args=[self.case.pk]), indexes=['comment_case_created_idx'])
+
+    def test_list_replies(self):
+        self.assertIndexed(reverse('list_replies', args=[self.comment.pk]), indexes=['comment_parent_created_idx'], ctes=['subtree', 's'])
+
+    def test_feed(self):
+        author = User.objects.create_user(username='author', password='secret')
+        prolific = User.objects.create_user(username='prolific', password='secret')
+        FeedPullAuthor.objects.create(author=prolific, since=self.case.created_at)
+        Follow.objects.bulk_create([
+            Follow(follower=self.user, followed_user=author), Follow(follower=self.user, followed_user=prolific),
+            Follow(follower=self.user, category='Surgery'),
+        ])
+        self.assertIndexed(
+            reverse('feed'), {'page_size': 10},
+            ['follow_follower_idx', 'feed_user_key_idx', 'case_category_created_idx', 'comment_user_created_idx'],
+        )
+
+
+@override_settings(DATABASE_REPLICAS={'replica_a': 1, 'replica_b': 1, 'offline': 0}, READ_YOUR_WRITES_WINDOW=5)
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.router = PrimaryReplicaRouter()
+        self.factory = RequestFactory()
+
+    def route(self, request, write=False):
+        """
+        Run `request` through the middleware and return where a read inside the view would go.
+        """
+        seen = []
+
+        def view(request):
+            if write:
+                self.router.db_for_write(Case)
+            seen.append(self.router.db_for_read(Case))
+            return HttpResponse()
+
+        ReplicaRoutingMiddleware(view)(request)
+        return seen[0]
+
+    def test_reads_round_robin_over_weighted_replicas(self):
+        reads = [self.route(self.factory.get('/cases/all/')) for _ in range(4)]
+        self.assertEqual(sorted(reads), ['replica_a', 'replica_a', 'replica_b', 'replica_b'])
+
+    @override_settings(DATABASE_REPLICA_SELECTION='weighted')
+    def test_weighted_choice_skips_zero_weight(self):
+        reads = {self.route(self.factory.get('/cases/all/')) for _ in range(20)}
+        self.assertLessEqual(reads, {'replica_a', 'replica_b'})
+
+    def test_writes_and_unsafe_requests_use_primary(self):
+        self.assertEqual(self.router.db_for_write(Case), 'default')
+        self.assertEqual(self.route(self.factory.post('/cases/create-case/')), 'default')
+        self.assertEqual(self.route(self.factory.get('/cases/all/'), write=True), 'default')
+        with use_primary():
+            self.assertEqual(self.router.db_for_read(Case), 'default')
+
+    def test_reads_stick_to_primary_after_own_write(self):
+        auth = {'HTTP_AUTHORIZATION': 'Token abc'}
+        self.route(self.factory.post('/cases/create-case/', **auth))
+        self.assertEqual(self.route(self.factory.get('/cases/my-cases/', **auth)), 'default')
+        # Other clients keep reading from the replicas.
+        other = self.route(self.factory.get('/cases/my-cases/', HTTP_AUTHORIZATION='Token xyz'))
+        self.assertIn(other, ('replica_a', 'replica_b'))
+
+        cache.clear()  # The window has passed
+        self.assertIn(self.route(self.factory.get('/cases/my-cases/', **auth)), ('replica_a', 'replica_b'))
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate('replica_a', 'cases'))
+        self.assertIsNone(self.router.allow_migrate('default', 'cases'))
+
+
+@override_settings(SLOW_REQUEST_THRESHOLD_MS=60 * 1000)  # Password hashing makes sign-in "slow"
+class BenchmarkTests(TestCase):
+    def test_every_url_is_driven_without_errors(self):
+        cache.clear()
+        tokens = benchmarking.seed(users=2, cases_per_user=2, reports_per_case=1, comments_per_case=1, comment_depth=3)
+        self.assertEqual(Comment.objects.exclude(parent=None).count(), 2 * 2 * 2)
+
+        results = benchmarking.run_endpoints(tokens[0], requests=2, warmup=0)
+
+        self.assertEqual(list(results), benchmarking.url_names())
+        for name, result in results.items():
+            self.assertEqual(result['failures'], 0, (name, result['statuses']))
+        self.assertGreater(results['list_comments']['rows_read'], 0)
+        self.assertGreater(results['list-all-cases']['peak_memory_kb'], 0)
+
+    def test_payload_formats_are_measured(self):
+        tokens = benchmarking.seed(users=2, cases_per_user=2, reports_per_case=1, comments_per_case=2)
+        results = benchmarking.measure_payloads(tokens[0], repeats=2)
+        self.assertEqual(list(results), list(benchmarking.PAYLOAD_ENDPOINTS))
+        for rows in results.values():
+            sizes = {row['format']: row['bytes'] for row in rows}
+            self.assertEqual(sizes['orjson'], sizes['drf-json'])  # Same JSON, rendered faster
+            self.assertLess(rows[0]['gzip_bytes'], rows[0]['bytes'])
+
+
+@override_settings(SERVER_TIMING_HEADER=True)
+class RequestTimingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='vet', password='secret')
+        self.case = Case.objects.create(app_user=self.user, category='Surgery', case_title='Bloat')
+        Comment.objects.create(case=self.case, app_user=self.user, comment_text='root')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('list_comments', args=[self.case.pk]))
+        metrics = dict(metric.split(';', 1) for metric in response['Server-Timing'].split(', '))
+        self.assertEqual(set(metrics), {'db', 'serialize', 'view', 'total'})
+        self.assertIn('desc="2 queries"', metrics['db'])  # Case lookup and the thread
+
+    @override_settings(SERVER_TIMING_HEADER=False)
+    def test_server_timing_header_can_be_turned_off(self):
+        response = self.client.get(reverse('list_comments', args=[self.case.pk]))
+        self.assertNotIn('Server-Timing', response)
+
+    def test_serializer_time_is_recorded_without_patching_drf(self):
+        self.assertFalse(hasattr(serializers.Serializer.data.fget, 'timed'))
+        timer = instrumentation.RequestTimer()
+        token = instrumentation._timer.set(timer)
+        try:
+            CommentSerializer(Comment.objects.all(), many=True).data
+        finally:
+            instrumentation._timer.reset(token)
+        self.assertGreater(timer.serialize, 0)
+
+    def test_async_view_queries_are_counted(self):
+        token = Token.objects.create(user=self.user)
+        response = self.client.get(
+            reverse('async-list-comments', args=[self.case.pk]), HTTP_AUTHORIZATION=f'Token {token.key}',
+        )
+        self.assertRegex(response['Server-Timing'], r'desc="[1-9]\d* queries"')
+
+    @override_settings(SLOW_REQUEST_THRESHOLD_MS=0, SLOW_REQUEST_LOGGED_QUERIES=1)
+    def test_slow_request_log(self):
+        with self.assertLogs('vetplatform.slow_requests', 'WARNING') as logs:
+            self.client.get(reverse('list_comments', args=[self.case.pk]))
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual(entry['url_name'], 'list_comments')
+        self.assertEqual(entry['user_id'], self.user.pk)
+        self.assertEqual(entry['queries'], 2)
+        self.assertEqual(len(entry['slowest_sql']), 1)
+        self.assertIn('cases_c', entry['slowest_sql'][0]['sql'])
+
+    def test_fast_requests_are_not_logged(self):
+        with self.assertNoLogs('vetplatform.slow_requests'):
+            self.client.get(reverse('list_comments', args=[self.case.pk]))
+
+
+@override_settings(DEBUG=True)  # Served without a token
+class MetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.registry.clear()
+        self.user = User.objects.create_user(username='vet', password='secret')
+        self.case = Case.objects.create(app_user=self.user, category='Surgery', case_title='Bloat')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_requests_are_labelled_by_url_name(self):
+        self.client.get(reverse('list_comments', args=[self.case.pk]))
+        self.client.get(reverse('get-case-detail', args=[self.case.pk]))
+        self.client.get(reverse('get-case-detail', args=[0]))
+        self.client.get('/no-such-page/')
+
+        body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('http_requests_total{url_name="get-case-detail",method="GET",status="200"} 1', body)
+        self.assertIn('http_requests_total{url_name="get-case-detail",method="GET",status="404"} 1', body)
+        self.assertIn('http_requests_total{url_name="<unmatched>",method="GET",status="404"} 1', body)
+        self.assertIn('http_request_duration_seconds_count{url_name="list_comments",method="GET"} 1', body)
+        self.assertIn('http_request_db_queries_bucket{url_name="list_comments",method="GET",le="2"} 1', body)
+        self.assertIn('http_request_db_queries_bucket{url_name="list_comments",method="GET",le="1"} 0', body)
+
+    def test_processes_are_summed(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with self.settings(METRICS_DIR=directory):
+            other_worker = metrics.Registry()
+            other_worker.inc('http_requests_total', ('list_comments', 'GET', '200'), 2)
+            other_worker.observe('http_request_duration_seconds', ('list_comments', 'GET'), 0.2)
+            other_worker.flush()
+
+            self.client.get(reverse('list_comments', args=[self.case.pk]))
+            body = self.client.get(reverse('metrics')).content.decode()
+
+        self.assertIn('http_requests_total{url_name="list_comments",method="GET",status="200"} 3', body)
+        self.assertIn('http_request_duration_seconds_count{url_name="list_comments",method="GET"} 2', body)
+        self.assertIn('http_request_duration_seconds_bucket{url_name="list_comments",method="GET",le="+Inf"} 2', body)
+
+    def test_requests_do_not_write_snapshots(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with self.settings(METRICS_DIR=directory, METRICS_FLUSH_INTERVAL=3600), \
+                mock.patch.object(metrics.registry, 'flush') as flush:
+            self.client.get(reverse('list_comments', args=[self.case.pk]))
+        flush.assert_not_called()
+        self.assertEqual(list(Path(directory).iterdir()), [])
+
+    def test_snapshots_of_exited_processes_are_pruned(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        exited = subprocess.Popen([sys.executable, '-c', ''])
+        exited.wait()
+        stale = Path(directory) / f'{exited.pid}-deadbeef.json'
+        stale.write_text(json.dumps({'http_requests_total': [[['list_comments', 'GET', '200'], 5]]}))
+
+        with self.settings(METRICS_DIR=directory):
+            self.client.get(reverse('list_comments', args=[self.case.pk]))
+            body = self.client.get(reverse('metrics')).content.decode()
+
+        self.assertIn('http_requests_total{url_name="list_comments",method="GET",status="200"} 1', body)
+        self.assertFalse(stale.exists())
+
+    @override_settings(DEBUG=False)
+    def test_not_served_without_a_token_outside_debug(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+
+    @override_settings(METRICS_TOKEN='scraper')
+    def test_token_required_when_configured(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scraper')
+        self.assertEqual(response.status_code, 200)
+
+
+class CaseVolumeTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='vet', password='secret', state='Lagos', specialization_category='Small animal')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def volume(self, **params):
+        response = self.client.get(reverse('case-volume'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def test_rollup_follows_case_writes(self):
+        url = reverse('create-case')
+        first = self.client.post(url, {'category': 'Surgery', 'case_title': 'Bloat'}).data['id']
+        self.client.post(url, {'category': 'Surgery', 'case_title': 'Spay'})
+        self.client.post(reverse('bulk-create-cases'), [{'category': 'Medicine', 'case_title': 'Itch'}] * 3, format='json')
+        # update_case has no route; call the view directly.
+        request = APIRequestFactory().put('/', {'category': 'Medicine', 'case_title': 'Bloat'})
+        force_authenticate(request, self.user)
+        self.assertEqual(views.update_case(request, first).status_code, 200)
+        self.client.delete(reverse('delete-case', args=[first]))
+
+        with query_budget(3):  # Session, user, rollup
+            rows = self.volume(group_by='category,state')
+        self.assertEqual(rows, [
+            {'category': 'Medicine', 'state': 'Lagos', 'count': 3},
+            {'category': 'Surgery', 'state': 'Lagos', 'count': 1},
+        ])
+        today = timezone.localdate()
+        self.assertEqual(self.volume(period='month', category='Medicine'), [{'period': today.strftime('%Y-%m'), 'count': 3}])
+        self.assertEqual(self.volume(start=(today + datetime.timedelta(days=1)).isoformat()), [])
+
+    def test_racing_case_deletes_count_once(self):
+        first = self.client.post(reverse('create-case'), {'category': 'Surgery', 'case_title': 'Bloat'}).data['id']
+        self.client.post(reverse('create-case'), {'category': 'Surgery', 'case_title': 'Spay'})
+        stale = Case.objects.get(pk=first)  # Looked up by both requests, deleted by the first
+        self.client.delete(reverse('delete-case', args=[first]))
+        with mock.patch.object(Case.objects, 'get', return_value=stale):
+            response = self.client.delete(reverse('delete-case', args=[first]))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.volume(group_by='category'), [{'category': 'Surgery', 'count': 1}])
+
+    def test_rebuild_matches_incremental_counts(self):
+        self.client.post(reverse('create-case'), {'category': 'Surgery', 'case_title': 'Bloat'})
+        Case.objects.create(app_user=self.user, category='Surgery', case_title='Untracked')
+        before = self.volume(group_by='category')
+        call_command('rebuild_case_volume', stdout=StringIO())
+        self.assertEqual(before, [{'category': 'Surgery', 'count': 1}])
+        self.assertEqual(self.volume(group_by='category'), [{'category': 'Surgery', 'count': 2}])
+
+    def test_deleting_the_author_removes_their_cases(self):
+        other = User.objects.create_user(username='other', password='secret')
+        client = APIClient()
+        client.force_authenticate(other)
+        client.post(reverse('create-case'), {'category': 'Surgery', 'case_title': 'Bloat'})
+        self.assertEqual(self.volume(group_by='state'), [{'state': '', 'count': 1}])
+        self.client.delete(reverse('app_user:delete_user', args=[other.pk]))
+        self.assertEqual(self.volume(), [])
+
+    def test_rejects_unknown_parameters(self):
+        for params in ({'group_by': 'breed'}, {'period': 'week'}, {'start': 'yesterday'}):
+            response = self.client.get(reverse('case-volume'), params)
+            self.assertEqual(response.status_code, 400)
+
+
+class FeedTests(TestCase):
+    def setUp(self):
+        self.reader = User.objects.create_user(username='reader', password='secret')
+        self.author = User.objects.create_user(username='author', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+        self.author_client = APIClient()
+        self.author_client.force_authenticate(self.author)
+
+    def follow(self, **target):
+        response = self.client.post(reverse('follow'), target)
+        self.assertIn(response.status_code, (200, 201))
+        return response.data['id']
+
+    def post_case(self, title, category='Medicine'):
+        return self.author_client.post(reverse('create-case'), {'category': category, 'case_title': title}).data['id']
+
+    def read_feed(self, page_size=50):
+        entries, url, params = [], reverse('feed'), {'page_size': page_size}
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            entries += response.data['results']
+            url, params = response.data['next'], None
+        return [(entry['kind'], entry.get('comment', entry['case'])['id']) for entry in entries]
+
+    def test_followed_author_is_fanned_out_on_write(self):
+        self.follow(followed_user=self.author.pk)
+        cases = [self.post_case(f'Case {i}') for i in range(3)]
+        comment = self.author_client.post(
+            reverse('add_comment', args=[cases[0]]), {'case': cases[0], 'app_user': self.author.pk, 'comment_text': 'Update'},
+        ).data['id']
+
+        self.assertEqual(FeedItem.objects.filter(user=self.reader).count(), 4)
+        expected = [('comment', comment)] + [('case', pk) for pk in reversed(cases)]
+        with query_budget(6):  # Session, user, follows, stored feed, cases, comments
+            self.client.get(reverse('feed'))
+        self.assertEqual(self.read_feed(), expected)
+        self.assertEqual(self.read_feed(page_size=1), expected)
+
+    def test_categories_are_read_at_request_time(self):
+        self.follow(category='Surgery')
+        self.follow(followed_user=self.author.pk)
+        surgery = self.post_case('Bloat', category='Surgery')
+        medicine = self.post_case('Itch')
+        other = User.objects.create_user(username='other', password='secret')
+        unfollowed = Case.objects.create(app_user=other, category='Surgery', case_title='Spay')
+
+        self.assertFalse(FeedItem.objects.filter(object_id=unfollowed.pk).exists())
+        self.assertEqual(self.read_feed(), [('case', unfollowed.pk), ('case', medicine), ('case', surgery)])
+
+    def test_prolific_author_is_read_at_request_time(self):
+        self.follow(followed_user=self.author.pk)
+        with self.settings(FEED_FANOUT_MAX_DAILY_POSTS=2, FEED_PULL_CHECK_EVERY=1):
+            cases = [self.post_case(f'Case {i}') for i in range(4)]
+        self.assertTrue(FeedPullAuthor.objects.filter(author=self.author).exists())
+        self.assertEqual(FeedItem.objects.filter(user=self.reader).count(), 2)
+        self.assertEqual(self.read_feed(page_size=3), [('case', pk) for pk in reversed(cases)])
+
+    def test_posting_rate_is_not_counted_on_every_write(self):
+        self.follow(followed_user=self.author.pk)
+        with self.settings(FEED_PULL_CHECK_EVERY=10 ** 9), CaptureQueriesContext(connection) as queries:
+            self.post_case('Bloat')
+        self.assertFalse([query for query in queries if 'COUNT(' in query['sql']])
+        self.assertEqual(FeedItem.objects.filter(user=self.reader).count(), 1)
+
+    def test_posting_rate_check_is_drawn_at_random(self):
+        self.follow(followed_user=self.author.pk)
+        with self.settings(FEED_FANOUT_MAX_DAILY_POSTS=0, FEED_PULL_CHECK_EVERY=10 ** 9), \
+                mock.patch('cases.feed.random.randrange', return_value=0):
+            self.post_case('Bloat')  # Its id is no multiple of FEED_PULL_CHECK_EVERY
+        self.assertTrue(FeedPullAuthor.objects.filter(author=self.author).exists())
+
+    def test_concurrent_follow_returns_the_existing_row(self):
+        existing = Follow.objects.create(follower=self.reader, followed_user=self.author)
+        # The other request committed between this one's lookup and its insert.
+        with mock.patch('django.db.models.QuerySet.first', return_value=None):
+            response = self.client.post(reverse('follow'), {'followed_user': self.author.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['id'], existing.pk)
+
+    def test_follow_backfills_and_unfollow_removes(self):
+        cases = [self.post_case(f'Case {i}') for i in range(3)]
+        follow_id = self.follow(followed_user=self.author.pk)
+        self.assertEqual(self.follow(followed_user=self.author.pk), follow_id)  # Following twice is a no-op
+        self.assertEqual(self.read_feed(), [('case', pk) for pk in reversed(cases)])
+
+        response = self.client.delete(reverse('unfollow', args=[follow_id]))
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.read_feed(), [])
+
+    @override_settings(FEED_MAX_ITEMS=3, FEED_TRIM_EVERY=1)
+    def test_stored_feed_is_bounded(self):
+        self.follow(followed_user=self.author.pk)
+        cases = [self.post_case(f'Case {i}') for i in range(6)]
+        self.assertEqual(
+            list(FeedItem.objects.filter(user=self.reader).order_by('-object_id').values_list('object_id', flat=True)),
+            list(reversed(cases))[:3],
+        )
+
+    def test_rejects_invalid_requests(self):
+        self.assertEqual(self.client.post(reverse('follow'), {'followed_user': self.reader.pk}).status_code, 400)
+        self.assertEqual(self.client.post(reverse('follow'), {}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('feed'), {'cursor': 'garbage'}).status_code, 404)
+
+
+class SyncTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='vet', password='secret')
+        self.other = User.objects.create_user(username='other', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.other_client = APIClient()
+        self.other_client.force_authenticate(self.other)
+
+    def post_case(self, client, title):
+        return client.post(reverse('create-case'), {'category': 'Surgery', 'case_title': title}).data['id']
+
+    def post_comment(self, client, case_id, text='hi'):
+        url = reverse('add_comment', args=[case_id])
+        return client.post(url, {'case': case_id, 'app_user': self.user.pk, 'comment_text': text}).data['id']
+
+    def sync(self, client=None, **params):
+        response = (client or self.client).get(reverse('sync'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def changes(self, data):
+        return [(change['type'], change['id'], change['deleted']) for change in data['results']]
+
+    def test_sequence_row_is_locked_last(self):
+        Follow.objects.create(follower=self.other, followed_user=self.user)
+        case = self.post_case(self.client, 'Bloat')
+        for write in (
+            lambda: self.post_case(self.client, 'Colic'),
+            lambda: self.post_comment(self.other_client, case),
+            lambda: self.client.delete(reverse('delete-case', args=[case])),
+        ):
+            with CaptureQueriesContext(connection) as queries:
+                write()
+            writes = [query['sql'] for query in queries if query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))]
+            locked = next(i for i, sql in enumerate(writes) if 'cases_changesequence' in sql)
+            # Only the numbered row (or the tombstone) is written while the sequence row is locked.
+            self.assertEqual(len(writes) - locked, 2, writes[locked:])
+
+    def test_changes_come_in_sequence_order(self):
+        case = self.post_case(self.client, 'Bloat')
+        self.client.post(reverse('create_laboratory_report', args=[case]), {'report_title': 'CBC', 'report_details': 'ok'})
+        report = LaboratoryReport.objects.get(case=case).pk
+        comment = self.post_comment(self.other_client, case)
+        first = self.sync()
+        self.assertEqual(self.changes(first), [('case', case, False), ('laboratory_report', report, False), ('comment', comment, False)])
+        self.assertEqual([change['seq'] for change in first['results']], sorted(change['seq'] for change in first['results']))
+        self.assertEqual(first['results'][0]['data']['case_title'], 'Bloat')
+        self.assertNotIn('comment_count', first['results'][0]['data'])
+
+        # A resync returns only what changed since, with deletions as tombstones.
+        request = APIRequestFactory().put('/', {'category': 'Surgery', 'case_title': 'Bloat, resolved'})
+        force_authenticate(request, self.user)
+        self.assertEqual(views.update_case(request, case).status_code, 200)
+        self.client.delete(reverse('delete_laboratory_report', args=[case, report]))
+        self.post_case(self.other_client, 'Not mine')
+        second = self.sync(since=first['sequence'])
+        self.assertEqual(self.changes(second), [('case', case, False), ('laboratory_report', report, True)])
+        self.assertEqual(second['results'][0]['data']['case_title'], 'Bloat, resolved')
+        self.assertEqual(self.sync(since=second['sequence'])['results'], [])
+        self.assertEqual(len(self.sync(scope='all', since=second['sequence'])['results']), 1)
+
+    def test_pages_follow_next(self):
+        self.client.post(reverse('bulk-create-cases'), [{'category': 'Surgery', 'case_title': f'Case {i}'} for i in range(5)], format='json')
+        data = self.sync(page_size=2)
+        ids = [change['id'] for change in data['results']]
+        while data['has_more']:
+            response = self.client.get(data['next'])
+            data = response.data
+            ids += [change['id'] for change in data['results']]
+        self.assertEqual(ids, list(Case.objects.order_by('sync_seq').values_list('id', flat=True)))
+
+    def test_deleted_author_leaves_tombstones(self):
+        mine = self.post_case(self.client, 'Bloat')
+        comment = self.post_comment(self.other_client, mine)
+        theirs = self.post_case(self.other_client, 'Spay')
+        since = self.sync(scope='all')['sequence']
+        self.client.delete(reverse('app_user:delete_user', args=[self.other.pk]))
+        self.assertEqual(self.changes(self.sync(since=since)), [('comment', comment, True)])
+        self.assertEqual(self.changes(self.sync(scope='all', since=since)), [('case', theirs, True), ('comment', comment, True)])
+
+    def test_updated_since_limits_a_first_sync(self):
+        old = self.post_case(self.client, 'Old')
+        Case.objects.filter(pk=old).update(updated_at=timezone.now() - datetime.timedelta(days=30))
+        new = self.post_case(self.client, 'New')
+        cutoff = (timezone.now() - datetime.timedelta(days=1)).isoformat()
+        self.assertEqual(self.changes(self.sync(updated_since=cutoff)), [('case', new, False)])
+
+    def test_purged_tombstones_expire_old_sequences(self):
+        case = self.post_case(self.client, 'Bloat')
+        since = self.sync()['sequence']
+        self.client.delete(reverse('delete-case', args=[case]))
+        Tombstone.objects.update(deleted_at=timezone.now() - datetime.timedelta(days=365))
+        call_command('purge_sync_tombstones', stdout=StringIO())
+        self.assertFalse(Tombstone.objects.exists())
+        self.assertEqual(self.client.get(reverse('sync'), {'since': since}).status_code, 410)
+        self.assertEqual(self.sync(since=0)['results'], [])
+
+    def test_rows_written_without_a_number_are_backfilled(self):
+        stamped = self.post_case(self.client, 'Stamped')
+        unstamped = Case.objects.create(app_user=self.user, category='Surgery', case_title='Before sync existed').pk
+        self.assertEqual(Case.objects.get(pk=unstamped).sync_seq, 0)
+        self.assertEqual(self.changes(self.sync()), [('case', stamped, False)])
+
+        importlib.import_module('cases.migrations.0015_delta_sync').backfill(django_apps, None)
+        self.assertEqual(self.changes(self.sync()), [('case', stamped, False), ('case', unstamped, False)])
+        later = self.post_case(self.client, 'After')
+        self.assertEqual(Case.objects.get(pk=later).sync_seq, Case.objects.get(pk=unstamped).sync_seq + 1)
+
+    def test_seeded_data_is_numbered(self):
+        benchmarking.seed(users=2, cases_per_user=1, reports_per_case=1, comments_per_case=1)
+        self.assertEqual(len(self.sync(scope='all')['results']), 2 * 3)
+
+    def test_rejects_invalid_parameters(self):
+        for params in ({'since': 'yesterday'}, {'since': -1}, {'updated_since': 'soon'}, {'scope': 'everyone'}):
+            self.assertEqual(self.client.get(reverse('sync'), params).status_code, 400)
+
+
+class RendererTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='vet', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_matches_drf_json(self):
+        data = {
+            'created_at': datetime.datetime(2024, 5, 1, 8, 30, 0, 123456, tzinfo=datetime.timezone.utc),
+            'day': datetime.date(2024, 5, 1),
+            'dose': decimal.Decimal('2.5'),
+            'note': 'Pyrexia 40.1 \u00b0C',
+            'counts': {1: 2},
+            'empty': None,
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+
+    def test_parses_json_and_rejects_malformed_bodies(self):
+        url = reverse('create-case')
+        response = self.client.post(url, '{"category": "Surgery", "case_title": "Bloat"}', content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['case_title'], 'Bloat')
+        response = self.client.post(url, '{"category": ', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    @unittest.skipUnless(find_spec('msgpack'), 'msgpack is not installed')
+    def test_msgpack_negotiation(self):
+        import msgpack
+
+        body = msgpack.packb({'category': 'Surgery', 'case_title': 'Bloat'})
+        response = self.client.post(
+            reverse('create-case'), body, content_type='application/msgpack', HTTP_ACCEPT='application/msgpack',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content)['case_title'], 'Bloat')
+
+
+class CompressionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='vet', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for i in range(20):
+            Case.objects.create(app_user=self.user, category='Surgery', case_title=f'Case {i}', management='Decompress ' * 20)
+        self.url = reverse('list-all-cases')
+
+    def test_negotiates_the_coding(self):
+        self.assertEqual(compression.choose_encoding('gzip, deflate'), 'gzip')
+        self.assertEqual(compression.choose_encoding('gzip;q=0, identity'), None)
+        self.assertEqual(compression.choose_encoding('*'), compression.encodings()[0])
+        self.assertEqual(compression.choose_encoding('deflate'), None)
+
+    def test_compresses_large_responses(self):
+        plain = self.client.get(self.url)
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertIn('Accept-Encoding', plain['Vary'])
+
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertLess(len(response.content), len(plain.content))
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+    def test_small_responses_are_sent_as_they_are(self):
+        with self.settings(COMPRESSION_MIN_SIZE=10 ** 6):
+            response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertNotIn('Accept-Encoding', response['Vary'])
+
+    def test_streams_are_compressed_as_they_stream(self):
+        plain = b''.join(self.client.get(reverse('export-cases')).streaming_content)
+        response = self.client.get(reverse('export-cases'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), plain)
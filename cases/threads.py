@@ -0,0 +1,65 @@
+"""
+Comment thread loading.
+
+A thread is fetched with a single query and handed to CommentSerializer as a
+parent id -> replies map, so nesting costs no extra queries at any depth.
+"""
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .models import Comment
+
+SUBTREE_SQL = """
+WITH RECURSIVE subtree (id, depth) AS (
+    SELECT id, 1 FROM cases_comment WHERE parent_id = %s
+    UNION ALL
+    SELECT c.id, s.depth + 1
+    FROM cases_comment c
+    JOIN subtree s ON c.parent_id = s.id
+    WHERE s.depth < %s
+)
+SELECT * FROM cases_comment WHERE id IN (SELECT id FROM subtree)
+"""
+
+
+def build_children(comments):
+    """
+    Group comments by parent id, oldest first.
+    """
+    children = defaultdict(list)
+    for comment in sorted(comments, key=lambda c: (c.created_at, c.pk)):
+        children[comment.parent_id].append(comment)
+    return children
+
+
+def load_case_thread(case):
+    """
+    Return (comments, children) for every comment on `case`.
+    """
+    comments = list(Comment.objects.filter(case=case).order_by('created_at', 'id'))
+    return comments, build_children(comments)
+
+
+def load_replies(comment):
+    """
+    Return (direct replies, children) for the subtree under `comment`, down to the maximum depth.
+    """
+    max_depth = settings.COMMENT_THREAD_MAX_DEPTH
+    comments = list(Comment.objects.raw(SUBTREE_SQL, [comment.pk, max_depth]))
+    children = build_children(comments)
+    return children.get(comment.pk, []), children
+
+
+async def aload_case_thread(case_id):
+    comments = [comment async for comment in Comment.objects.filter(case_id=case_id).order_by('created_at', 'id')]
+    return comments, build_children(comments)
+
+
+async def aload_replies(comment):
+    max_depth = settings.COMMENT_THREAD_MAX_DEPTH
+    # Raw querysets have no async iterator.
+    comments = await sync_to_async(list)(Comment.objects.raw(SUBTREE_SQL, [comment.pk, max_depth]))
+    children = build_children(comments)
+    return children.get(comment.pk, []), children
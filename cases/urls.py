@@ -1,16 +1,35 @@
 from django.urls import path
-from . import views
+from . import async_views, views
 
 urlpatterns = [
     path('cases/all/', views.list_all_cases, name='list-all-cases'),
+    path('cases/export/', views.export_cases, name='export-cases'),
+    path('analytics/case-volume/', views.case_volume, name='case-volume'),
+    path('cases/search/', views.search, name='search-cases'),
     path('create-case/', views.create_case, name='create-case'),
+    path('create-case/bulk/', views.bulk_create_cases, name='bulk-create-cases'),
+    path('laboratory-reports/bulk/', views.bulk_create_laboratory_reports, name='bulk_create_laboratory_reports'),
     path('my-cases/', views.list_user_cases, name='my-cases'),
+    path('sync/', views.sync_changes, name='sync'),
     path('cases/<int:case_id>/laboratory-report/', views.create_laboratory_report, name='create_laboratory_report'),
+    path('cases/<int:case_id>/laboratory-report/<int:report_id>/delete/', views.delete_laboratory_report, name='delete_laboratory_report'),
     path('cases/<int:case_id>/delete/', views.delete_case, name='delete-case'),  # Delete case endpoint
     path('cases/<int:case_id>/', views.get_case_detail, name='get-case-detail'),  # View case by ID
     path('cases/<int:case_id>/comments/', views.list_comments, name='list_comments'),
     path('cases/<int:case_id>/comments/add/', views.add_comment, name='add_comment'),
     path('cases/<int:case_id>/comments/<int:parent_comment_id>/reply/', views.add_comment, name='reply_to_comment'),
     path('comments/<int:comment_id>/replies/', views.list_replies, name='list_replies'),
+    path('comments/<int:comment_id>/delete/', views.delete_comment, name='delete_comment'),
+    path('feed/', views.home_feed, name='feed'),
+    path('follows/', views.list_follows, name='list_follows'),
+    path('follows/add/', views.follow, name='follow'),
+    path('follows/<int:follow_id>/delete/', views.unfollow, name='unfollow'),
 
+    # Async read endpoints (serve under ASGI)
+    path('async/cases/all/', async_views.list_all_cases, name='async-list-all-cases'),
+    path('async/my-cases/', async_views.list_user_cases, name='async-my-cases'),
+    path('async/cases/<int:case_id>/', async_views.get_case_detail, name='async-get-case-detail'),
+    path('async/cases/<int:case_id>/comments/', async_views.list_comments, name='async-list-comments'),
+    path('async/cases/<int:case_id>/comments/stream/', async_views.comment_stream, name='comment_stream'),
+    path('async/comments/<int:comment_id>/replies/', async_views.list_replies, name='async-list-replies'),
 ]
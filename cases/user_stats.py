@@ -0,0 +1,81 @@
+"""
+Per-user case and comment statistics for profile pages.
+
+Everything is computed with aggregate queries (most of them over the
+comment_count / laboratory_report_count counters) and cached per user under
+a version token. Every write that changes a user's cases, their reports, or
+comments by or to the user calls `invalidate` for the users involved. Other
+people's replies removed along with a deleted case or comment show up in
+their own statistics once USER_STATS_CACHE_TIMEOUT has passed.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+from django.db.models.functions import TruncMonth
+
+from vetplatform.caching import bump_version, get_or_build, get_version
+from vetplatform.db_routing import use_primary
+
+from .models import Case, Comment
+
+
+def _version_key(user_id):
+    return f'user-stats:{user_id}:version'
+
+
+def build_user_stats(user_id):
+    cases = Case.objects.filter(app_user_id=user_id)
+    totals = cases.aggregate(
+        total=Count('id'),
+        laboratory_reports=Sum('laboratory_report_count', default=0),
+        comments_received=Sum('comment_count', default=0),
+        last_case_at=Max('created_at'),
+    )
+    by_category = cases.values('category').annotate(count=Count('id')).order_by('category')
+    by_month = (
+        cases.annotate(month=TruncMonth('created_at')).values('month')
+        .annotate(count=Count('id')).order_by('-month')[:settings.USER_STATS_MONTHS]
+    )
+    latest = cases.order_by('-created_at', '-id').values('id', 'category', 'case_title', 'created_at')[
+        :settings.USER_STATS_LATEST_CASES
+    ]
+    written = Comment.objects.filter(app_user_id=user_id).aggregate(count=Count('id'), last_at=Max('created_at'))
+
+    return {
+        'cases': {
+            'total': totals['total'],
+            'last_created_at': totals['last_case_at'],
+            'by_category': {row['category']: row['count'] for row in by_category},
+            'by_month': [{'month': row['month'].strftime('%Y-%m'), 'count': row['count']} for row in by_month],
+            'latest': list(latest),
+        },
+        'laboratory_reports': totals['laboratory_reports'],
+        'comments': {
+            'written': written['count'],
+            'last_written_at': written['last_at'],
+            'received': totals['comments_received'],
+        },
+    }
+
+
+def get_user_stats(user_id):
+    version = get_version(_version_key(user_id))
+
+    def build():
+        # From the primary, so a lagging replica cannot cache figures from before the write.
+        with use_primary():
+            return build_user_stats(user_id)
+
+    return get_or_build(f'user-stats:{user_id}:{version}', build, settings.USER_STATS_CACHE_TIMEOUT)
+
+
+def bump(user_id):
+    bump_version(_version_key(user_id))
+
+
+def invalidate(*user_ids):
+    """
+    Drop the cached statistics of these users after the current transaction commits.
+    """
+    for user_id in set(user_ids):
+        transaction.on_commit(lambda user_id=user_id: bump(user_id))
@@ -2,20 +2,96 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework import status
-from .models import Case
-from .serializers import CaseSerializer, LaboratoryReportSerializer, CommentSerializer
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import StreamingHttpResponse
+from . import bulk, counters, detail_cache, export, feed, images, live, rollups, sync, user_stats
+from .models import Case, Comment, Follow, LaboratoryReport, Tombstone
+from .fieldsets import apply_fieldset, parse_fieldset
+from .pagination import KeysetPagination
+from .search import search_cases
+from .serializers import (
+    BulkCaseSerializer, BulkLaboratoryReportSerializer, CaseSerializer, CaseSearchResultSerializer,
+    LaboratoryReportSerializer, CommentSerializer, FollowSerializer,
+)
+from .threads import load_case_thread, load_replies
+from rest_framework.utils.urls import replace_query_param
+from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from django.views.decorators.csrf import csrf_exempt
 
-@swagger_auto_schema(method='get', responses={200: CaseSerializer(many=True)})
+FIELDSET_PARAMETERS = [
+    openapi.Parameter('fields', openapi.IN_QUERY, type=openapi.TYPE_STRING, description='Comma-separated fields to return'),
+    openapi.Parameter('exclude', openapi.IN_QUERY, type=openapi.TYPE_STRING, description='Comma-separated fields to leave out'),
+]
+
+
+def _case_list_response(request, cases):
+    """
+    Serialize a case queryset honouring ?fields= / ?exclude= and opt-in keyset pagination.
+    """
+    try:
+        selected = parse_fieldset(request.query_params)
+    except ValueError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    cases = apply_fieldset(cases, selected)
+    paginator = KeysetPagination()
+    if paginator.is_requested(request):
+        page = paginator.paginate_queryset(cases, request)
+        serializer = CaseSerializer(page, many=True, fields=selected)
+        return paginator.get_paginated_response(serializer.data)
+    serializer = CaseSerializer(cases, many=True, fields=selected)
+    return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+@swagger_auto_schema(method='get', manual_parameters=FIELDSET_PARAMETERS, responses={200: CaseSerializer(many=True)})
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])  # Ensure only authenticated users can view all cases
 def list_all_cases(request):
     """
     Retrieve all cases in the system.
+
+    Pass `page_size` and/or `cursor` to page through the cases newest first,
+    and `fields` or `exclude` to choose which fields are returned.
+    """
+    return _case_list_response(request, Case.objects.all())
+
+@swagger_auto_schema(
+    method='get',
+    manual_parameters=[
+        openapi.Parameter('q', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=True),
+        openapi.Parameter('category', openapi.IN_QUERY, type=openapi.TYPE_ARRAY, items=openapi.Items(type=openapi.TYPE_STRING)),
+        openapi.Parameter('limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+        openapi.Parameter('offset', openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+    ],
+    responses={200: CaseSearchResultSerializer(many=True)},
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def search(request):
     """
-    cases = Case.objects.all()  # Fetch all cases from the database
-    serializer = CaseSerializer(cases, many=True)
+    Full-text search over case titles and clinical narratives, best match first.
+    """
+    text = request.query_params.get('q', '')
+    categories = request.query_params.getlist('category')
+    try:
+        limit = min(int(request.query_params.get('limit', 20)), settings.PAGINATION_MAX_PAGE_SIZE)
+        offset = int(request.query_params.get('offset', 0))
+    except ValueError:
+        return Response({'error': 'limit and offset must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+    if limit < 1 or offset < 0:
+        return Response({'error': 'limit and offset must be positive'}, status=status.HTTP_400_BAD_REQUEST)
+
+    hits = search_cases(text, categories=categories, limit=limit, offset=offset)
+    cases = Case.objects.only('id', 'category', 'case_title', 'created_at').in_bulk([case_id for case_id, _, _ in hits])
+    results = []
+    for case_id, rank, snippet in hits:
+        case = cases.get(case_id)
+        if case is not None:
+            case.rank, case.snippet = rank, snippet
+            results.append(case)
+    serializer = CaseSearchResultSerializer(results, many=True)
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 # Create Case Endpoint
@@ -31,23 +107,173 @@ def create_case(request):
     serializer = CaseSerializer(data=request.data)
     
     if serializer.is_valid():
-        serializer.save(app_user=user)  # assuming app_user is a foreign key to the user model
+        with transaction.atomic():
+            case = serializer.save(app_user=user)  # assuming app_user is a foreign key to the user model
+            rollups.case_created(case, user)
+            feed.publish(user, cases=[case])
+            sync.number(case)
+        images.schedule_variants(case)  # Resized copies are generated in the background
+        user_stats.invalidate(user.pk)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+def _bulk_response(items, create, user):
+    if not isinstance(items, list):
+        return Response({'error': 'Expected a list of items'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(items) > settings.BULK_CREATE_MAX_ITEMS:
+        return Response(
+            {'error': f'At most {settings.BULK_CREATE_MAX_ITEMS} items per request'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    created, errors = create(user, items)
+    if not created and errors:
+        response_status = status.HTTP_400_BAD_REQUEST
+    elif errors:
+        response_status = status.HTTP_207_MULTI_STATUS  # Some items were rejected
+    else:
+        response_status = status.HTTP_201_CREATED
+    return Response({'created': created, 'errors': errors}, status=response_status)
+
+
+# Bulk Create Cases Endpoint
+@swagger_auto_schema(method='post', request_body=BulkCaseSerializer(many=True))
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def bulk_create_cases(request):
+    """
+    Create many cases for the authenticated user, each with optional nested laboratory reports.
+
+    Invalid items are reported by index in `errors`; all valid items are created in one transaction.
+    """
+    return _bulk_response(request.data, bulk.create_cases, request.user)
+
+
+@swagger_auto_schema(method='post', request_body=BulkLaboratoryReportSerializer(many=True))
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def bulk_create_laboratory_reports(request):
+    """
+    Add laboratory reports to many of the authenticated user's cases at once.
+
+    Invalid items are reported by index in `errors`; all valid items are created in one transaction.
+    """
+    return _bulk_response(request.data, bulk.create_laboratory_reports, request.user)
+
+
+@swagger_auto_schema(
+    method='get',
+    manual_parameters=[
+        openapi.Parameter('export_format', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=list(export.FORMATS)),
+        openapi.Parameter('category', openapi.IN_QUERY, type=openapi.TYPE_ARRAY, items=openapi.Items(type=openapi.TYPE_STRING)),
+        openapi.Parameter('created_after', openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME),
+        openapi.Parameter('created_before', openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME),
+        openapi.Parameter('author', openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+    ],
+    responses={200: 'NDJSON or CSV stream'},
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_cases(request):
+    """
+    Stream every matching case with its laboratory reports as NDJSON (default) or CSV.
+    """
+    # Not `format`: DRF reserves that query parameter for renderer selection.
+    export_format = request.query_params.get('export_format', 'ndjson')
+    if export_format not in export.FORMATS:
+        return Response({'error': f'export_format must be one of {", ".join(export.FORMATS)}'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        filters = export.parse_filters(request.query_params)
+    except ValueError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    rows = export.iter_export(export_format, export.export_queryset(**filters), settings.EXPORT_CHUNK_SIZE)
+    response = StreamingHttpResponse(rows, content_type=export.FORMATS[export_format])
+    response['Content-Disposition'] = f'attachment; filename="cases.{export_format}"'
+    return response
+
+
+@swagger_auto_schema(
+    method='get',
+    manual_parameters=[
+        openapi.Parameter('group_by', openapi.IN_QUERY, type=openapi.TYPE_ARRAY, items=openapi.Items(type=openapi.TYPE_STRING, enum=list(rollups.DIMENSIONS))),
+        openapi.Parameter('period', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=list(rollups.PERIODS)),
+        openapi.Parameter('start', openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
+        openapi.Parameter('end', openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
+    ] + [
+        openapi.Parameter(field, openapi.IN_QUERY, type=openapi.TYPE_ARRAY, items=openapi.Items(type=openapi.TYPE_STRING))
+        for field in rollups.DIMENSIONS
+    ],
+    responses={200: 'Case counts per period and group'},
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def case_volume(request):
+    """
+    Case counts grouped by any of category, state and specialization_category (author's),
+    per `day` or `month` when `period` is given, between the inclusive `start` and `end` dates.
+    """
+    try:
+        query = rollups.parse_query(request.query_params)
+    except ValueError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'results': rollups.case_volume(**query)}, status=status.HTTP_200_OK)
+
+
+@swagger_auto_schema(
+    method='get',
+    manual_parameters=[
+        openapi.Parameter('since', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, description='`sequence` of the previous sync; 0 for everything'),
+        openapi.Parameter('updated_since', openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME),
+        openapi.Parameter('scope', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=list(sync.SCOPES)),
+        openapi.Parameter('page_size', openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+    ],
+    responses={200: 'Changed and deleted cases, laboratory reports and comments in sequence order', 410: 'Sync again from 0'},
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sync_changes(request):
+    """
+    Cases, laboratory reports and comments changed or deleted after sequence number `since`,
+    on the user's own cases (`scope=mine`, default) or on every case (`scope=all`).
+
+    Store the returned `sequence` and pass it as `since` next time; follow `next` while
+    `has_more` is true. Deleted rows come back with `deleted: true` and no data.
+    """
+    try:
+        since, updated_since, scope = sync.parse_query(request.query_params)
+    except ValueError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    page_size = KeysetPagination().get_page_size(request)
+    try:
+        results, has_more = sync.changes(request.user, since, updated_since, scope, page_size)
+    except sync.SyncExpired:
+        return Response({'error': 'Changes this old are no longer kept; sync again with since=0'}, status=status.HTTP_410_GONE)
+
+    sequence = results[-1]['seq'] if results else since
+    next_link = None
+    if has_more:
+        next_link = replace_query_param(request.build_absolute_uri(), 'page_size', page_size)
+        next_link = replace_query_param(next_link, 'since', sequence)
+    return Response(
+        {'sequence': sequence, 'has_more': has_more, 'next': next_link, 'results': results}, status=status.HTTP_200_OK,
+    )
+
+
 # List User's Cases Endpoint
-@swagger_auto_schema(method='get', responses={200: CaseSerializer(many=True)})
+@swagger_auto_schema(method='get', manual_parameters=FIELDSET_PARAMETERS, responses={200: CaseSerializer(many=True)})
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def list_user_cases(request):
     """
     Retrieve all cases associated with the authenticated user.
+
+    Pass `page_size` and/or `cursor` to page through the cases newest first,
+    and `fields` or `exclude` to choose which fields are returned.
     """
-    user = request.user
-    cases = Case.objects.filter(app_user=user)
-    serializer = CaseSerializer(cases, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    return _case_list_response(request, Case.objects.filter(app_user=request.user))
 
 
 # Update Case Endpoint
@@ -65,7 +291,18 @@ def update_case(request, case_id):
 
     serializer = CaseSerializer(case, data=request.data)
     if serializer.is_valid():
-        serializer.save()
+        new_image = 'image' in serializer.validated_data
+        old_category, old_variants = case.category, case.image_variants
+        with transaction.atomic():
+            case = serializer.save(**({'image_variants': {}} if new_image else {}))
+            rollups.case_recategorized(case, old_category, request.user)
+            if new_image:
+                images.discard_variants(old_variants)
+            sync.number(case)
+        if new_image:
+            images.schedule_variants(case)
+        detail_cache.invalidate(case.pk)
+        user_stats.invalidate(request.user.pk)
         return Response(serializer.data, status=status.HTTP_200_OK)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -83,7 +320,15 @@ def delete_case(request, case_id):
     except Case.DoesNotExist:
         return Response({'error': 'Case not found'}, status=status.HTTP_404_NOT_FOUND)
 
-    case.delete()
+    with transaction.atomic():
+        _, deleted = case.delete()
+        if not deleted.get(Case._meta.label):  # A concurrent request deleted it first
+            return Response({'error': 'Case not found'}, status=status.HTTP_404_NOT_FOUND)
+        rollups.case_deleted(case, request.user)
+        images.discard_variants(case.image_variants)
+        sync.bury([(Tombstone.CASE, case_id, request.user.pk)])
+    detail_cache.invalidate(case_id)
+    user_stats.invalidate(request.user.pk)
     return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -96,7 +341,7 @@ def get_case_detail(request, case_id):
     Retrieve details of a specific case by its ID.
     """
     try:
-        case = Case.objects.get(pk=case_id, app_user=request.user)
+        case = Case.objects.prefetch_related('laboratory_reports').get(pk=case_id, app_user=request.user)
     except Case.DoesNotExist:
         return Response({'error': 'Case not found'}, status=status.HTTP_404_NOT_FOUND)
 
@@ -117,26 +362,61 @@ def create_laboratory_report(request, case_id):
 
     serializer = LaboratoryReportSerializer(data=request.data)
     if serializer.is_valid():
-        serializer.save(case=case)
+        with transaction.atomic():
+            report = serializer.save(case=case)
+            counters.laboratory_report_created(report)
+            detail_cache.invalidate(case.pk)
+            user_stats.invalidate(request.user.pk)
+            sync.number(report)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-@swagger_auto_schema(method='get', responses={200: CaseSerializer()})
+@swagger_auto_schema(method='delete', responses={204: 'No Content'})
+@api_view(['DELETE'])
+@permission_classes([IsAuthenticated])
+def delete_laboratory_report(request, case_id, report_id):
+    """
+    Delete a laboratory report from one of the authenticated user's cases.
+    """
+    try:
+        report = LaboratoryReport.objects.get(pk=report_id, case_id=case_id, case__app_user=request.user)
+    except LaboratoryReport.DoesNotExist:
+        return Response({'error': 'Laboratory report not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    with transaction.atomic():
+        deleted, _ = report.delete()
+        if not deleted:  # A concurrent request deleted it first
+            return Response({'error': 'Laboratory report not found'}, status=status.HTTP_404_NOT_FOUND)
+        counters.laboratory_report_deleted(report)
+        detail_cache.invalidate(report.case_id)
+        user_stats.invalidate(request.user.pk)
+        sync.bury([(Tombstone.LABORATORY_REPORT, report_id, request.user.pk)])
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+@swagger_auto_schema(method='get', manual_parameters=FIELDSET_PARAMETERS, responses={200: CaseSerializer()})
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_case_detail(request, case_id):
     """
-    Retrieve details of a specific case by its ID.
+    Retrieve details of a specific case by its ID; `fields` / `exclude` select the fields returned.
+
+    Served from cache with a strong ETag; a matching If-None-Match gets 304 Not Modified.
     """
     try:
-        # Temporarily remove filtering by `app_user=request.user` to check if the case exists.
-        case = Case.objects.get(pk=case_id)
-    except Case.DoesNotExist:
+        selected = parse_fieldset(request.query_params)
+    except ValueError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    cached = detail_cache.get_case_detail(case_id)
+    if cached is None:
         return Response({'error': 'Case not found'}, status=status.HTTP_404_NOT_FOUND)
 
-    serializer = CaseSerializer(case)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    data, etag = detail_cache.project(*cached, selected)
+    if detail_cache.etag_matches(request, etag):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+    return Response(data, status=status.HTTP_200_OK, headers={'ETag': etag})
 
 
 # Create Case Endpoint
@@ -144,18 +424,33 @@ def get_case_detail(request, case_id):
 @csrf_exempt
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
-def add_comment(request, case_id):
+def add_comment(request, case_id, parent_comment_id=None):
     """
-    Add a comment to a specific case.
+    Add a comment to a specific case, or a reply to one of its comments.
     """
     try:
         case = Case.objects.get(pk=case_id)
     except Case.DoesNotExist:
         return Response({'error': 'Case not found'}, status=status.HTTP_404_NOT_FOUND)
-    
+
+    extra = {}
+    if parent_comment_id is not None:
+        try:
+            extra['parent'] = Comment.objects.get(pk=parent_comment_id, case=case)
+        except Comment.DoesNotExist:
+            return Response({'error': 'Comment not found'}, status=status.HTTP_404_NOT_FOUND)
+
     serializer = CommentSerializer(data=request.data)
     if serializer.is_valid():
-        serializer.save(app_user=request.user, case=case)
+        with transaction.atomic():
+            comment = serializer.save(app_user=request.user, case=case, **extra)
+            counters.comment_created(comment)
+            feed.publish(request.user, comments=[comment])
+            detail_cache.invalidate(case.pk)  # comment_count is part of the detail
+            user_stats.invalidate(request.user.pk, case.app_user_id)  # Comments written and received
+            sync.number(comment)
+            live.comment_created(comment)  # Announced under its sequence number
+        serializer.context['children'] = {}  # A new comment has no replies yet
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -171,8 +466,8 @@ def list_comments(request, case_id):
     except Case.DoesNotExist:
         return Response({'error': 'Case not found'}, status=status.HTTP_404_NOT_FOUND)
 
-    comments = Comment.objects.filter(case=case)
-    serializer = CommentSerializer(comments, many=True)
+    comments, children = load_case_thread(case)  # Whole thread in one query, nested in memory
+    serializer = CommentSerializer(comments, many=True, context={'children': children})
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 
@@ -187,6 +482,113 @@ def list_replies(request, comment_id):
     except Comment.DoesNotExist:
         return Response({'error': 'Comment not found'}, status=status.HTTP_404_NOT_FOUND)
 
-    replies = Comment.objects.filter(parent=comment)
-    serializer = CommentSerializer(replies, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
\ No newline at end of file
+    replies, children = load_replies(comment)  # Whole subtree in one query, nested in memory
+    serializer = CommentSerializer(replies, many=True, context={'children': children})
+    return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+@swagger_auto_schema(method='delete', responses={204: 'No Content'})
+@api_view(['DELETE'])
+@permission_classes([IsAuthenticated])
+def delete_comment(request, comment_id):
+    """
+    Delete one of the authenticated user's comments together with its replies.
+    """
+    try:
+        comment = Comment.objects.get(pk=comment_id, app_user=request.user)
+    except Comment.DoesNotExist:
+        return Response({'error': 'Comment not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    with transaction.atomic():
+        _, deleted = comment.delete()
+        removed = deleted.get(Comment._meta.label, 0)
+        if not removed:  # A concurrent request deleted it first
+            return Response({'error': 'Comment not found'}, status=status.HTTP_404_NOT_FOUND)
+        counters.comments_deleted(comment, removed)
+        detail_cache.invalidate(comment.case_id)
+        user_stats.invalidate(request.user.pk, comment.case.app_user_id)
+        sync.bury([(Tombstone.COMMENT, comment_id, comment.case.app_user_id)])
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+@swagger_auto_schema(method='post', request_body=FollowSerializer, responses={201: FollowSerializer()})
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def follow(request):
+    """
+    Follow a vet (`followed_user`) or a case category (`category`) to see their new cases and comments in the feed.
+    """
+    serializer = FollowSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    target = {name: value for name, value in serializer.validated_data.items() if value}
+    if target.get('followed_user') == request.user:
+        return Response({'error': 'You cannot follow yourself'}, status=status.HTTP_400_BAD_REQUEST)
+
+    existing = Follow.objects.filter(follower=request.user, **target).first()
+    if existing is None:
+        try:
+            with transaction.atomic():
+                created = Follow.objects.create(follower=request.user, **target)
+                feed.followed(created)
+            return Response(FollowSerializer(created).data, status=status.HTTP_201_CREATED)
+        except IntegrityError:
+            existing = Follow.objects.get(follower=request.user, **target)  # A concurrent request followed first
+    return Response(FollowSerializer(existing).data, status=status.HTTP_200_OK)
+
+
+@swagger_auto_schema(method='get', responses={200: FollowSerializer(many=True)})
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def list_follows(request):
+    """
+    The vets and categories the authenticated user follows, newest first, paged with `cursor` / `page_size`.
+    """
+    paginator = KeysetPagination()
+    page = paginator.paginate_queryset(Follow.objects.filter(follower=request.user), request)
+    return paginator.get_paginated_response(FollowSerializer(page, many=True).data)
+
+
+@swagger_auto_schema(method='delete', responses={204: 'No Content'})
+@api_view(['DELETE'])
+@permission_classes([IsAuthenticated])
+def unfollow(request, follow_id):
+    """
+    Stop following a vet or category; a vet's items are removed from the feed.
+    """
+    try:
+        existing = Follow.objects.get(pk=follow_id, follower=request.user)
+    except Follow.DoesNotExist:
+        return Response({'error': 'Follow not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    with transaction.atomic():
+        feed.unfollowed(existing)
+        existing.delete()
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+@swagger_auto_schema(
+    method='get',
+    manual_parameters=[
+        openapi.Parameter('page_size', openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+        openapi.Parameter('cursor', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+    ],
+    responses={200: 'New cases and comments from followed vets and categories'},
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def home_feed(request):
+    """
+    New cases and comments by the vets the user follows and new cases in followed categories,
+    newest first. Follow `next` for older entries.
+    """
+    encoded = request.query_params.get('cursor')
+    cursor = feed.decode_cursor(encoded) if encoded else None
+    page_size = KeysetPagination().get_page_size(request)
+    entries, last = feed.feed_page(request.user, cursor, page_size)
+
+    next_link = None
+    if last is not None:
+        next_link = replace_query_param(request.build_absolute_uri(), 'page_size', page_size)
+        next_link = replace_query_param(next_link, 'cursor', feed.encode_cursor(last))
+    return Response({'next': next_link, 'results': entries}, status=status.HTTP_200_OK)
@@ -3,6 +3,16 @@ ASGI config for vetplatform project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The async read endpoints (cases/async_views.py, app_user/async_views.py) run
+natively on the event loop when served from here, e.g.:
+
+    uvicorn vetplatform.asgi:application --workers 2
+
+It is also the only way to serve the live comment streams (cases/live.py):
+each open stream is a coroutine waiting for new comments, where WSGI would
+tie up a worker thread per connected client. With more than one worker, set
+PUBSUB_BACKEND so comments posted to one process reach streams on the others.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
@@ -0,0 +1,42 @@
+"""
+Minimal plumbing for native async API views.
+
+DRF's @api_view only runs sync views, so the async read endpoints are plain
+Django coroutines wrapped with `async_api_view`, which applies token
+authentication, the method check and DRF-style error bodies.
+"""
+import functools
+
+from django.contrib.auth.models import AnonymousUser
+from django.http import JsonResponse
+from rest_framework import exceptions
+
+from app_user.authentication import CachedTokenAuthentication
+
+
+def async_api_view(methods=('GET',), authenticated=True):
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            authenticator = CachedTokenAuthentication()
+            try:
+                if request.method not in methods:
+                    raise exceptions.MethodNotAllowed(request.method)
+                result = await authenticator.aauthenticate(request)
+                if result is not None:
+                    request.user, request.auth = result
+                else:
+                    request.user, request.auth = AnonymousUser(), None
+                if authenticated and not request.user.is_authenticated:
+                    raise exceptions.NotAuthenticated()
+                return await view(request, *args, **kwargs)
+            except exceptions.APIException as exc:
+                response = JsonResponse({'detail': exc.detail}, status=exc.status_code)
+                if exc.status_code == 401:
+                    response['WWW-Authenticate'] = authenticator.authenticate_header(request)
+                return response
+
+        wrapper.csrf_exempt = True
+        return wrapper
+
+    return decorator
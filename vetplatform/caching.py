@@ -0,0 +1,66 @@
+"""
+Cache helpers shared by the apps.
+"""
+import threading
+import time
+import uuid
+
+from django.core.cache import cache
+
+# Striped locks so that concurrent misses on one key in this process wait for a single rebuild.
+_local_locks = [threading.Lock() for _ in range(64)]
+
+
+def get_or_build(key, build, timeout, lock_timeout=10, poll_interval=0.05):
+    """
+    Return the cached value for `key`, calling `build()` on a miss.
+
+    Concurrent misses are coalesced: threads in this process queue on a local
+    lock, and other processes wait on a short-lived `<key>:lock` entry in the
+    shared cache while one of them rebuilds. A `build()` returning None is not
+    cached.
+    """
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    with _local_locks[hash(key) % len(_local_locks)]:
+        value = cache.get(key)
+        if value is not None:
+            return value
+
+        lock_key = key + ':lock'
+        deadline = time.monotonic() + lock_timeout
+        while not cache.add(lock_key, 1, lock_timeout):
+            time.sleep(poll_interval)
+            value = cache.get(key)
+            if value is not None:
+                return value
+            if time.monotonic() >= deadline:
+                break  # The other builder is stuck or gone; build it ourselves.
+
+        try:
+            value = build()
+            if value is not None:
+                cache.set(key, value, timeout)
+        finally:
+            cache.delete(lock_key)
+        return value
+
+
+def get_version(key):
+    """
+    Current version token stored under `key`, created on first use.
+
+    Tokens are random rather than counters, so a version that was evicted
+    from the cache can never be reissued and match stale entries.
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    cache.set(key, uuid.uuid4().hex, None)
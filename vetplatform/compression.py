@@ -0,0 +1,162 @@
+"""
+Response compression, negotiated per request from Accept-Encoding.
+
+Brotli is used when the client accepts it and the `brotli` package is
+installed, gzip otherwise. Responses smaller than COMPRESSION_MIN_SIZE bytes,
+and those whose content type is not in COMPRESSIBLE_TYPES (images are already
+compressed), are sent as they are. Streaming responses such as CSV exports and
+comment streams are compressed as they stream, each chunk flushed so the client
+receives it straight away.
+
+This does what Django's GZipMiddleware does, so do not install both.
+"""
+import zlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    'text/', 'application/json', 'application/x-ndjson', 'application/msgpack', 'application/javascript',
+    'application/xml', 'image/svg+xml',
+)
+
+
+def encodings():
+    """
+    Content codings this process can produce, most preferred first.
+    """
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def choose_encoding(accept_encoding):
+    """
+    The coding to compress a response in for this Accept-Encoding header, or None.
+    """
+    weights = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.strip().partition(';')
+        weight = 1.0
+        name, _, value = params.strip().partition('=')
+        if name.strip() == 'q':
+            try:
+                weight = float(value)
+            except ValueError:
+                weight = 0.0
+        if coding:
+            weights[coding.strip().lower()] = weight
+
+    best, best_weight = None, 0.0
+    for coding in encodings():
+        weight = weights.get(coding, weights.get('*', 0.0))
+        if weight > best_weight:  # Ties go to the earlier, preferred coding
+            best, best_weight = coding, weight
+    return best
+
+
+class Compressor:
+    """
+    Incremental compression of a stream; every chunk is flushed so it can be sent on its own.
+    """
+
+    def __init__(self, coding):
+        self.coding = coding
+        if coding == 'br':
+            self._compressor = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+        else:
+            self._compressor = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)  # 31: gzip framing
+
+    def compress(self, chunk):
+        if self.coding == 'br':
+            return self._compressor.process(chunk) + self._compressor.flush()
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.finish() if self.coding == 'br' else self._compressor.flush()
+
+
+def compress(content, coding):
+    """
+    `content` compressed whole in `coding`.
+    """
+    if coding == 'br':
+        return brotli.compress(content, quality=settings.COMPRESSION_BROTLI_QUALITY)
+    compressor = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress(content) + compressor.flush()
+
+
+def _compress_stream(chunks, coding):
+    compressor = Compressor(coding)
+    for chunk in chunks:
+        yield compressor.compress(chunk)
+    yield compressor.finish()
+
+
+async def _acompress_stream(chunks, coding):
+    compressor = Compressor(coding)
+    async for chunk in chunks:
+        yield compressor.compress(chunk)
+    yield compressor.finish()
+
+
+def _compressible(response):
+    if response.has_header('Content-Encoding'):
+        return False
+    content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+    if not content_type.startswith(COMPRESSIBLE_TYPES):
+        return False
+    return response.streaming or len(response.content) >= settings.COMPRESSION_MIN_SIZE
+
+
+def compress_response(request, response):
+    if not _compressible(response):
+        return response
+    patch_vary_headers(response, ('Accept-Encoding',))
+    coding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    if coding is None:
+        return response
+
+    if response.streaming:
+        if response.is_async:
+            response.streaming_content = _acompress_stream(response.streaming_content, coding)
+        else:
+            response.streaming_content = _compress_stream(response.streaming_content, coding)
+        del response.headers['Content-Length']  # Unknown until the stream ends
+    else:
+        compressed = compress(response.content, coding)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+
+    # The compressed body is no longer byte-for-byte what a strong ETag promises.
+    etag = response.get('ETag')
+    if etag and etag.startswith('"'):
+        response.headers['ETag'] = 'W/' + etag
+    response.headers['Content-Encoding'] = coding
+    return response
+
+
+def CompressionMiddleware(get_response):
+    """
+    Compress responses in the best coding the client accepts.
+    """
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            return compress_response(request, await get_response(request))
+    else:
+        def middleware(request):
+            return compress_response(request, get_response(request))
+
+    if iscoroutinefunction(get_response):
+        markcoroutinefunction(middleware)
+    return middleware
+
+
+CompressionMiddleware.sync_capable = True
+CompressionMiddleware.async_capable = True
@@ -0,0 +1,151 @@
+"""
+Primary / replica database routing.
+
+Writes always go to `default`. Reads go to the aliases listed in
+DATABASE_REPLICAS, except when the primary has to be used:
+
+- inside a transaction on the primary, or after a write in the same request;
+- for the whole of an unsafe (POST, PUT, PATCH, DELETE) request;
+- for READ_YOUR_WRITES_WINDOW seconds after a client's own write, so a user
+  sees what they just wrote even if the replicas lag behind;
+- inside `use_primary()`, for code that reads what it is about to write.
+
+Clients are told apart by their Authorization header or session cookie,
+which is known before DRF authenticates the request.
+"""
+import contextvars
+import hashlib
+import itertools
+import random
+import threading
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class _State:
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+_state = contextvars.ContextVar('db_routing_state', default=None)
+
+_round_robin = {}
+_round_robin_lock = threading.Lock()
+
+
+def _replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', {})
+
+
+def _choose(replicas):
+    aliases = list(replicas)
+    if getattr(settings, 'DATABASE_REPLICA_SELECTION', 'round_robin') == 'weighted':
+        return random.choices(aliases, weights=[replicas[alias] for alias in aliases])[0]
+    key = tuple(aliases)
+    with _round_robin_lock:
+        if key not in _round_robin:
+            _round_robin[key] = itertools.cycle(aliases)
+        return next(_round_robin[key])
+
+
+def primary_required():
+    state = _state.get()
+    if state is not None and (state.pinned or state.wrote):
+        return True
+    return connections[DEFAULT_DB_ALIAS].in_atomic_block
+
+
+@contextmanager
+def use_primary():
+    """
+    Send every read in the block to the primary.
+    """
+    token = _state.set(_State(pinned=True))
+    try:
+        yield
+    finally:
+        _state.reset(token)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = {alias: weight for alias, weight in _replicas().items() if weight > 0}
+        if not replicas or primary_required():
+            return DEFAULT_DB_ALIAS
+        return _choose(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        databases = {DEFAULT_DB_ALIAS, *_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive their schema through replication.
+        if db in _replicas():
+            return False
+        return None
+
+
+def _client_key(request):
+    credential = request.headers.get('Authorization') or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not credential:
+        return None
+    return 'db-pin:' + hashlib.sha256(credential.encode('utf-8')).hexdigest()
+
+
+def _must_pin(request, state):
+    # Unsafe requests pin the client even when they failed part way: they may have committed something.
+    return state.wrote or request.method not in SAFE_METHODS
+
+
+def ReplicaRoutingMiddleware(get_response):
+    """
+    Scope routing decisions to the request and remember each client's writes.
+    """
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            key = _client_key(request)
+            recent_write = key is not None and await cache.aget(key) is not None
+            state = _State(pinned=recent_write or request.method not in SAFE_METHODS)
+            token = _state.set(state)
+            try:
+                return await get_response(request)
+            finally:
+                _state.reset(token)
+                if key is not None and _must_pin(request, state):
+                    await cache.aset(key, 1, settings.READ_YOUR_WRITES_WINDOW)
+
+        return markcoroutinefunction(middleware)
+
+    def middleware(request):
+        key = _client_key(request)
+        recent_write = key is not None and cache.get(key) is not None
+        state = _State(pinned=recent_write or request.method not in SAFE_METHODS)
+        token = _state.set(state)
+        try:
+            return get_response(request)
+        finally:
+            _state.reset(token)
+            if key is not None and _must_pin(request, state):
+                cache.set(key, 1, settings.READ_YOUR_WRITES_WINDOW)
+
+    return middleware
+
+
+ReplicaRoutingMiddleware.sync_capable = True
+ReplicaRoutingMiddleware.async_capable = True
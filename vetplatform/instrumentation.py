@@ -0,0 +1,205 @@
+"""
+Per-request timing: SQL query count and time, serializer time and view time.
+
+The numbers are recorded in the Prometheus metrics (vetplatform/metrics.py),
+sent back in a Server-Timing header when SERVER_TIMING_HEADER is on (it
+defaults to DEBUG, as the header tells any client how much database work a
+request took), and requests slower than
+SLOW_REQUEST_THRESHOLD_MS are logged as one JSON object to the
+`vetplatform.slow_requests` logger together with their slowest SQL.
+
+Queries are timed by an execute wrapper installed on every database
+connection, which only reads a context variable when no request is being
+timed; serializer time is measured around `.data` of serializers that use
+TimedSerializerMixin, and of the lists DRF builds from them for many=True.
+Both work for sync views, async views, and sync code run from async views
+through sync_to_async.
+"""
+import contextvars
+import heapq
+import itertools
+import json
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework import serializers
+
+from . import metrics
+
+logger = logging.getLogger('vetplatform.slow_requests')
+
+
+class RequestTimer:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view_started = None
+        self.queries = 0
+        self.db = 0.0
+        self.serialize = 0.0
+        self.serializing = False
+        self.slowest = []  # Min-heap of (duration, order, sql) holding the slowest queries
+        self._order = itertools.count()
+
+    def record_query(self, sql, duration):
+        self.queries += 1
+        self.db += duration
+        entry = (duration, next(self._order), sql)
+        if len(self.slowest) < settings.SLOW_REQUEST_LOGGED_QUERIES:
+            heapq.heappush(self.slowest, entry)
+        elif self.slowest and entry > self.slowest[0]:
+            heapq.heapreplace(self.slowest, entry)
+
+
+_timer = contextvars.ContextVar('request_timer', default=None)
+
+
+def _time_query(execute, sql, params, many, context):
+    timer = _timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timer.record_query(sql, time.perf_counter() - started)
+
+
+def _install_query_timer(connection, **kwargs):
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+def _timed(read):
+    timer = _timer.get()
+    if timer is None or timer.serializing:  # Count nested .data calls once
+        return read()
+    timer.serializing = True
+    started = time.perf_counter()
+    try:
+        return read()
+    finally:
+        timer.serialize += time.perf_counter() - started
+        timer.serializing = False
+
+
+class TimedListSerializer(serializers.ListSerializer):
+    @property
+    def data(self):
+        return _timed(lambda: serializers.ListSerializer.data.fget(self))
+
+
+class TimedSerializerMixin:
+    """
+    Count the time spent in `.data` as serializer time in the request's timings.
+
+    For serializers that build response bodies; input-only ones leave it out.
+    """
+
+    @property
+    def data(self):
+        return _timed(lambda: super(TimedSerializerMixin, self).data)
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        serializer = super().many_init(*args, **kwargs)
+        if type(serializer) is serializers.ListSerializer:  # Leave a Meta.list_serializer_class alone
+            serializer.__class__ = TimedListSerializer
+        return serializer
+
+
+def install():
+    """
+    Hook query timing into every database connection; safe to call more than once.
+    """
+    connection_created.connect(_install_query_timer, dispatch_uid='vetplatform.instrumentation')
+    for connection in connections.all(initialized_only=True):
+        _install_query_timer(connection)
+
+
+def server_timing(timer, total, view):
+    parts = [
+        f'db;dur={timer.db * 1000:.1f};desc="{timer.queries} queries"',
+        f'serialize;dur={timer.serialize * 1000:.1f}',
+    ]
+    if view is not None:
+        parts.append(f'view;dur={view * 1000:.1f}')
+    parts.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(parts)
+
+
+def _finish(request, response, timer):
+    finished = time.perf_counter()
+    total = finished - timer.started
+    view = finished - timer.view_started if timer.view_started is not None else None
+    if settings.SERVER_TIMING_HEADER:
+        response['Server-Timing'] = server_timing(timer, total, view)
+    metrics.observe_request(request, response, total, timer.queries)
+
+    if total * 1000 >= settings.SLOW_REQUEST_THRESHOLD_MS:
+        match = getattr(request, 'resolver_match', None)
+        user = getattr(request, 'user', None)
+        logger.warning(json.dumps({
+            'event': 'slow_request',
+            'method': request.method,
+            'path': request.path,
+            'url_name': match.view_name if match else None,
+            'status': response.status_code,
+            'user_id': user.pk if user is not None and user.is_authenticated else None,
+            'total_ms': round(total * 1000, 1),
+            'view_ms': round(view * 1000, 1) if view is not None else None,
+            'db_ms': round(timer.db * 1000, 1),
+            'serialize_ms': round(timer.serialize * 1000, 1),
+            'queries': timer.queries,
+            # Statements without their parameters, which may hold personal data.
+            'slowest_sql': [
+                {'ms': round(duration * 1000, 2), 'sql': sql}
+                for duration, _, sql in sorted(timer.slowest, reverse=True)
+            ],
+        }))
+    return response
+
+
+def RequestTimingMiddleware(get_response):
+    """
+    Time each request and report it in the metrics, in Server-Timing when enabled and, when slow,
+    in the slow-request log.
+    """
+    install()
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            timer = RequestTimer()
+            request._timer = timer
+            token = _timer.set(timer)
+            try:
+                response = await get_response(request)
+            finally:
+                _timer.reset(token)
+            return _finish(request, response, timer)
+    else:
+        def middleware(request):
+            timer = RequestTimer()
+            request._timer = timer
+            token = _timer.set(timer)
+            try:
+                response = get_response(request)
+            finally:
+                _timer.reset(token)
+            return _finish(request, response, timer)
+
+    def process_view(request, view_func, view_args, view_kwargs):
+        # Everything from here on (view, serialization, rendering) counts as view time.
+        request._timer.view_started = time.perf_counter()
+
+    middleware.process_view = process_view
+    if iscoroutinefunction(get_response):
+        markcoroutinefunction(middleware)
+    return middleware
+
+
+RequestTimingMiddleware.sync_capable = True
+RequestTimingMiddleware.async_capable = True
@@ -0,0 +1,227 @@
+"""
+Request metrics in Prometheus text format.
+
+RequestTimingMiddleware (vetplatform/instrumentation.py) records every
+request into the process-wide `registry`: a request counter by status code,
+and latency and SQL query count histograms, all labelled by URL name.
+
+With several worker processes, set METRICS_DIR to a directory shared by the
+workers of one host. Each process then writes a snapshot of its metrics there
+every METRICS_FLUSH_INTERVAL seconds from a background thread (and on exit),
+never from a request, and /metrics sums its own live numbers with the
+snapshots of every other process, so whichever worker answers the scrape
+reports the totals. Snapshots left by processes that no longer exist are
+deleted at scrape time; Prometheus reads the drop in the sums as a counter
+reset.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# name -> (type, help, label names, histogram buckets)
+METRICS = {
+    'http_requests_total': (
+        'counter', 'Requests handled, by route, method and status code.', ('url_name', 'method', 'status'), None,
+    ),
+    'http_request_duration_seconds': (
+        'histogram', 'Time to produce the response.', ('url_name', 'method'), DURATION_BUCKETS,
+    ),
+    'http_request_db_queries': (
+        'histogram', 'SQL queries run per request.', ('url_name', 'method'), QUERY_BUCKETS,
+    ),
+}
+
+UNMATCHED = '<unmatched>'  # One label for every path that did not resolve, to bound the label set
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._file_id = f'{self._pid}-{uuid.uuid4().hex[:8]}'
+        self._values = {name: {} for name in METRICS}
+        self._flusher = None  # Threads do not survive a fork, so a forked worker starts its own
+
+    def _check_fork(self):
+        # A forked worker must not report the parent's numbers a second time.
+        if os.getpid() != self._pid:
+            self._reset()
+
+    def _start_flusher(self):
+        if self._flusher is None and settings.METRICS_DIR:
+            self._flusher = threading.Thread(target=self._flush_periodically, name='metrics-flush', daemon=True)
+            self._flusher.start()
+
+    def _flush_periodically(self):
+        while self._flusher is threading.current_thread():  # Replaced by clear()
+            time.sleep(settings.METRICS_FLUSH_INTERVAL)
+            self.flush()
+
+    def inc(self, name, labels, amount=1):
+        with self._lock:
+            self._check_fork()
+            self._start_flusher()
+            series = self._values[name]
+            series[labels] = series.get(labels, 0) + amount
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][3]
+        with self._lock:
+            self._check_fork()
+            self._start_flusher()
+            series = self._values[name]
+            # Per-bucket counts (the last one is +Inf), then sum and count.
+            state = series.setdefault(labels, [0] * (len(buckets) + 1) + [0, 0])
+            index = next((i for i, bound in enumerate(buckets) if value <= bound), len(buckets))
+            state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def snapshot(self):
+        with self._lock:
+            self._check_fork()
+            return {
+                name: [
+                    [list(labels), list(value) if isinstance(value, list) else value]  # Copied out of the lock
+                    for labels, value in series.items()
+                ]
+                for name, series in self._values.items()
+            }
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+    def flush(self):
+        """
+        Write this process's snapshot to METRICS_DIR.
+        """
+        directory = settings.METRICS_DIR
+        if not directory:
+            return
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        snapshot = json.dumps(self.snapshot())
+        path = directory / f'{self._file_id}.json'
+        temporary = path.with_suffix(f'.{threading.get_ident()}.tmp')  # The timer and atexit may overlap
+        temporary.write_text(snapshot)
+        os.replace(temporary, path)  # Readers never see a half-written file
+
+    def collect(self):
+        """
+        Totals across every live process writing to METRICS_DIR, or this process's own without one.
+        """
+        own = self.snapshot()
+        if not settings.METRICS_DIR:
+            return own
+        snapshots = [own]
+        for path in Path(settings.METRICS_DIR).glob('*.json'):
+            if path.stem == self._file_id:
+                continue  # Counted from memory, which is fresher than the file
+            if _exited(path.stem):
+                path.unlink(missing_ok=True)
+                continue
+            try:
+                snapshots.append(json.loads(path.read_text()))
+            except (OSError, ValueError):
+                continue  # Removed or replaced while we were listing
+        totals = {name: {} for name in METRICS}
+        for snapshot in snapshots:
+            for name, series in snapshot.items():
+                if name not in totals:
+                    continue  # Written by a release with other metrics
+                for labels, value in series:
+                    labels = tuple(labels)
+                    current = totals[name].get(labels)
+                    if current is None:
+                        totals[name][labels] = value
+                    elif isinstance(value, list):
+                        if len(value) == len(current):  # Skip snapshots taken with other buckets
+                            totals[name][labels] = [a + b for a, b in zip(current, value)]
+                    else:
+                        totals[name][labels] = current + value
+        return {name: [[list(labels), value] for labels, value in series.items()] for name, series in totals.items()}
+
+
+def _exited(file_id):
+    """
+    Whether the process that wrote the snapshot `file_id` (`<pid>-<random>`) has gone.
+    """
+    pid = file_id.split('-', 1)[0]
+    if not pid.isdigit():
+        return False  # Not a snapshot name this module writes
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass  # Exists, owned by another user
+    return False
+
+
+registry = Registry()
+atexit.register(registry.flush)
+
+
+def observe_request(request, response, duration, queries):
+    match = getattr(request, 'resolver_match', None)
+    url_name = (match.view_name if match else None) or UNMATCHED
+    registry.inc('http_requests_total', (url_name, request.method, str(response.status_code)))
+    registry.observe('http_request_duration_seconds', (url_name, request.method), duration)
+    registry.observe('http_request_db_queries', (url_name, request.method), queries)
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in [*zip(names, values), *extra]]
+    return '{' + ','.join(pairs) + '}'
+
+
+def render(snapshot):
+    lines = []
+    for name, (kind, help_text, label_names, buckets) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in sorted(snapshot.get(name, []), key=lambda item: item[0]):
+            if kind == 'counter':
+                lines.append(f'{name}{_labels(label_names, labels)} {value}')
+                continue
+            cumulative = 0
+            for bound, count in zip([*buckets, '+Inf'], value[:-2]):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(label_names, labels, [("le", str(bound))])} {cumulative}')
+            lines.append(f'{name}_sum{_labels(label_names, labels)} {value[-2]}')
+            lines.append(f'{name}_count{_labels(label_names, labels)} {value[-1]}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint. Requires `Authorization: Bearer <METRICS_TOKEN>` when that is set,
+    and without a token is only served with DEBUG on.
+    """
+    if settings.METRICS_TOKEN:
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not constant_time_compare(supplied, settings.METRICS_TOKEN):
+            return HttpResponse(status=401, headers={'WWW-Authenticate': 'Bearer'})
+    elif not settings.DEBUG:
+        return HttpResponse(status=404)  # Not public by accident
+    return HttpResponse(render(registry.collect()), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,189 @@
+"""
+Publish / subscribe for live updates, such as the comment streams in cases/live.py.
+
+Subscribers are coroutines in this process, each with a queue of at most
+PUBSUB_QUEUE_SIZE messages. A subscriber that falls that far behind (a slow
+client that is not reading its stream) is dropped instead of being buffered
+without limit: its stream ends and the client reconnects, catching up from
+the database with Last-Event-ID.
+
+`publish` may be called from any thread. It delivers to this process's
+subscribers and hands the message to PUBSUB_BACKEND, which relays it to the
+other worker processes. The default LocalBackend relays nothing, which is
+right when a single process serves the streams; RedisBackend relays through
+Redis PUBLISH / SUBSCRIBE.
+"""
+import asyncio
+import json
+import logging
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+DROPPED = object()  # Returned by Subscription.get once the subscriber has been dropped
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+class Subscription:
+    def __init__(self, broker, channel, loop):
+        self.broker = broker
+        self.channel = channel
+        self.loop = loop
+        self.queue = asyncio.Queue(settings.PUBSUB_QUEUE_SIZE)
+        self.dropped = False
+
+    def _put(self, message):
+        # Runs on the subscriber's event loop.
+        if self.dropped:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.dropped = True
+            self.broker.unsubscribe(self)
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(DROPPED)
+
+    async def get(self, timeout=None):
+        """
+        The next message, DROPPED if the subscriber fell too far behind, or None after `timeout` seconds.
+        """
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalBackend:
+    """
+    No relay: only subscribers in the publishing process receive messages.
+    """
+
+    def __init__(self, broker):
+        self.broker = broker
+
+    def publish(self, channel, message):
+        pass
+
+    def start(self):
+        pass
+
+
+class RedisBackend:
+    """
+    Relay messages between processes through Redis. Needs the `redis` package and PUBSUB_REDIS_URL.
+    """
+    prefix = 'vetplatform:pubsub:'
+
+    def __init__(self, broker):
+        try:
+            import redis
+        except ImportError as exc:
+            raise ImproperlyConfigured('RedisBackend requires the redis package') from exc
+        self.broker = broker
+        self.client = redis.Redis.from_url(settings.PUBSUB_REDIS_URL)
+        self._listener = None
+        self._lock = threading.Lock()
+
+    def publish(self, channel, message):
+        payload = json.dumps({'origin': self.broker.origin, 'message': message})
+        self.client.publish(self.prefix + channel, payload)
+
+    def start(self):
+        # Only processes that have subscribers listen.
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name='pubsub-redis', daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.psubscribe(self.prefix + '*')
+        for item in pubsub.listen():
+            payload = json.loads(item['data'])
+            if payload['origin'] == self.broker.origin:
+                continue  # Already delivered locally
+            channel = item['channel'].decode('utf-8')[len(self.prefix):]
+            self.broker.deliver(channel, payload['message'])
+
+
+class Broker:
+    def __init__(self, backend=None):
+        self.origin = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._channels = {}
+        self._count = 0
+        self.backend = import_string(backend or settings.PUBSUB_BACKEND)(self)
+
+    def subscribe(self, channel):
+        """
+        Subscribe the running event loop to `channel`. Raises TooManySubscribers at PUBSUB_MAX_SUBSCRIBERS.
+        """
+        subscription = Subscription(self, channel, asyncio.get_running_loop())
+        with self._lock:
+            if self._count >= settings.PUBSUB_MAX_SUBSCRIBERS:
+                raise TooManySubscribers()
+            self._channels.setdefault(channel, set()).add(subscription)
+            self._count += 1
+        self.backend.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._channels.get(subscription.channel)
+            if subscribers is None or subscription not in subscribers:
+                return
+            subscribers.discard(subscription)
+            self._count -= 1
+            if not subscribers:
+                del self._channels[subscription.channel]
+
+    def subscriber_count(self):
+        return self._count
+
+    def deliver(self, channel, message):
+        """
+        Pass `message` to this process's subscribers of `channel`.
+        """
+        with self._lock:
+            subscribers = list(self._channels.get(channel, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._put, message)
+            except RuntimeError:
+                self.unsubscribe(subscription)  # Its event loop has closed
+
+    def publish(self, channel, message):
+        """
+        Send a JSON-serializable `message` to every subscriber of `channel`, in any process.
+        """
+        self.deliver(channel, message)
+        try:
+            self.backend.publish(channel, message)
+        except Exception:
+            # Remote subscribers miss it live and pick it up when they reconnect.
+            logger.exception('Could not relay a message on %s', channel)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = Broker()
+        return _broker
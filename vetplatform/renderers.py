@@ -0,0 +1,73 @@
+"""
+Renderers and parsers for the API: JSON through orjson, and MessagePack.
+
+ORJSONRenderer and ORJSONParser replace DRF's JSONRenderer and JSONParser and
+produce the same JSON: compact UTF-8, UTC datetimes ending in Z, and
+everything else orjson does not know (Decimals, lazy strings, querysets)
+converted by DRF's own encoder. Only U+2028 and U+2029 differ, sent as they
+are rather than escaped; JSON allows both.
+
+Clients that send `Accept: application/msgpack` get MessagePack, and may post
+it with `Content-Type: application/msgpack`. It needs the `msgpack` package;
+settings.py only offers it when that is installed.
+"""
+import orjson
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import renderers
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+from rest_framework.utils.encoders import JSONEncoder
+
+_encoder = JSONEncoder()
+
+ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+def _msgpack():
+    try:
+        import msgpack
+    except ImportError as exc:
+        raise ImproperlyConfigured('MessagePack support requires the msgpack package') from exc
+    return msgpack
+
+
+class ORJSONRenderer(renderers.JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        options = ORJSON_OPTIONS
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            options |= orjson.OPT_INDENT_2  # orjson only indents by two spaces
+        return orjson.dumps(data, default=_encoder.default, option=options)
+
+
+class ORJSONParser(JSONParser):
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        # Datetimes go through the JSON encoder too, so both formats carry the same strings.
+        return _msgpack().packb(data, default=_encoder.default)
+
+
+class MessagePackParser(BaseParser):
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        msgpack = _msgpack()
+        try:
+            return msgpack.unpackb(stream.read())
+        except (ValueError, msgpack.UnpackException) as exc:
+            raise ParseError(f'MessagePack parse error - {exc}')
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+from importlib.util import find_spec
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -46,8 +47,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'vetplatform.instrumentation.RequestTimingMiddleware',
+    'vetplatform.compression.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'vetplatform.db_routing.ReplicaRoutingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -89,6 +93,31 @@ DATABASES = {
     }
 }
 
+# Read replicas (vetplatform/db_routing.py)
+# Map each replica alias in DATABASES to a weight; reads are spread across them
+# round robin, or at random in proportion to the weights with 'weighted'.
+# Writes, and a client's reads for READ_YOUR_WRITES_WINDOW seconds after a write,
+# go to 'default'. To try it locally with two SQLite files:
+#
+#     cp db.sqlite3 db-replica.sqlite3
+#
+#     DATABASES['replica'] = {
+#         'ENGINE': 'django.db.backends.sqlite3',
+#         'NAME': BASE_DIR / 'db-replica.sqlite3',
+#         'TEST': {'MIRROR': 'default'},
+#     }
+#     DATABASE_REPLICAS = {'replica': 1}
+#
+# TEST MIRROR makes the test runner read the replica through the default test database.
+
+DATABASE_ROUTERS = ['vetplatform.db_routing.PrimaryReplicaRouter']
+
+DATABASE_REPLICAS = {}
+
+DATABASE_REPLICA_SELECTION = 'round_robin'
+
+READ_YOUR_WRITES_WINDOW = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -134,3 +163,222 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Pagination
+# Opt-in keyset pagination used by the case list endpoints (cases/pagination.py).
+
+PAGINATION_PAGE_SIZE = 50
+
+PAGINATION_MAX_PAGE_SIZE = 200
+
+
+# Comments
+# Replies nested deeper than this are left out of list_comments / list_replies.
+
+COMMENT_THREAD_MAX_DEPTH = 10
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Use a shared backend (e.g. Redis) when running more than one worker process.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+CASE_DETAIL_CACHE_TIMEOUT = 60 * 60
+
+
+# REST framework
+# https://www.django-rest-framework.org/api-guide/settings/
+
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'app_user.authentication.CachedTokenAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+        # No BasicAuthentication: it would hash a password on any request, outside the sign-in throttles.
+    ],
+    # JSON through orjson (vetplatform/renderers.py); MessagePack when the msgpack package is installed.
+    'DEFAULT_RENDERER_CLASSES': [
+        'vetplatform.renderers.ORJSONRenderer',
+        *(['vetplatform.renderers.MessagePackRenderer'] if find_spec('msgpack') else []),
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'vetplatform.renderers.ORJSONParser',
+        *(['vetplatform.renderers.MessagePackParser'] if find_spec('msgpack') else []),
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
+# Tokens expire this many seconds after they are issued; sign-in issues a fresh one.
+# Run `manage.py clear_expired_tokens` periodically to delete expired rows.
+TOKEN_TTL = 60 * 60 * 24 * 30
+
+# Cache alias and lifetime (seconds) of token -> user lookups.
+TOKEN_AUTH_CACHE = 'default'
+
+TOKEN_AUTH_CACHE_TIMEOUT = 60 * 5
+
+
+# Profile statistics (cases/user_stats.py): cache lifetime in seconds, and how many
+# recent cases and months of case counts a profile shows.
+USER_STATS_CACHE_TIMEOUT = 60 * 60
+
+USER_STATS_LATEST_CASES = 5
+
+USER_STATS_MONTHS = 12
+
+# Seconds the veterinarian directory's facet counts are cached (app_user/directory.py).
+DIRECTORY_FACETS_CACHE_TIMEOUT = 60 * 5
+
+# Home feed (cases/feed.py). Authors with more followers, or more cases and comments in a day,
+# than these are read at request time instead of fanned out to their followers on write.
+FEED_FANOUT_MAX_FOLLOWERS = 1000
+
+FEED_FANOUT_MAX_DAILY_POSTS = 50
+
+# The daily posting rate is counted on a random 1 in FEED_PULL_CHECK_EVERY posts rather than on each one.
+FEED_PULL_CHECK_EVERY = 10
+
+# Stored feed rows kept per user, trimmed after a random 1 in FEED_TRIM_EVERY inserts, and the
+# number of an author's recent items copied into the feed when they are followed.
+FEED_MAX_ITEMS = 500
+
+FEED_TRIM_EVERY = 50
+
+FEED_BACKFILL_ITEMS = 20
+
+
+# Sign-in / sign-up protection (app_user/throttling.py, app_user/hashing.py)
+# Token buckets per client IP and per username: `capacity` requests at once,
+# refilled at `refill_per_minute`. Use a shared cache alias to limit across processes.
+AUTH_THROTTLE_CACHE = 'default'
+
+AUTH_THROTTLE_RATES = {
+    'ip': {'capacity': 20, 'refill_per_minute': 10},
+    'username': {'capacity': 5, 'refill_per_minute': 2},
+}
+
+# Threads in each process's password hashing pool, hashes allowed to queue for it (more
+# get 503 straight away), and how long (seconds) a request waits for its hash, which is
+# kept well below the server's request timeout.
+PASSWORD_HASH_CONCURRENCY = 2
+
+PASSWORD_HASH_QUEUE = 8
+
+PASSWORD_HASH_TIMEOUT = 2
+
+
+# Uploaded files
+# https://docs.djangoproject.com/en/5.1/topics/http/file-uploads/
+# Uploads above FILE_UPLOAD_MAX_MEMORY_SIZE are streamed to a temporary file in chunks
+# instead of being held in memory, then copied chunk by chunk into MEDIA_ROOT.
+
+MEDIA_URL = 'media/'
+
+MEDIA_ROOT = BASE_DIR / 'media'
+
+FILE_UPLOAD_MAX_MEMORY_SIZE = 512 * 1024
+
+# Threads generating thumbnail / medium / WebP copies of case images (cases/images.py).
+IMAGE_VARIANT_WORKERS = 2
+
+
+# Bulk endpoints (cases/bulk.py)
+
+BULK_CREATE_MAX_ITEMS = 5000
+
+BULK_CREATE_BATCH_SIZE = 500
+
+# Bulk uploads of a few thousand cases exceed Django's default 2.5 MB request body limit.
+DATA_UPLOAD_MAX_MEMORY_SIZE = 50 * 1024 * 1024
+
+# Cases read (and lab reports prefetched) per query when streaming an export (cases/export.py).
+EXPORT_CHUNK_SIZE = 500
+
+
+# Delta sync (cases/sync.py): days tombstones of deleted rows are kept. Clients that have
+# not synced for longer must download everything again.
+SYNC_TOMBSTONE_DAYS = 90
+
+
+# Live updates (vetplatform/pubsub.py, cases/live.py)
+# PUBSUB_BACKEND relays published messages to the other worker processes: LocalBackend
+# for a single process, 'vetplatform.pubsub.RedisBackend' (with PUBSUB_REDIS_URL) for several.
+PUBSUB_BACKEND = 'vetplatform.pubsub.LocalBackend'
+
+PUBSUB_REDIS_URL = 'redis://localhost:6379/0'
+
+# Open streams per process, and messages a stream may fall behind before it is closed.
+PUBSUB_MAX_SUBSCRIBERS = 1000
+
+PUBSUB_QUEUE_SIZE = 100
+
+# Seconds between keep-alives on an idle stream, and before a stream is closed for the
+# client to reconnect (EventSource waits SSE_RETRY_MS). Missed comments replayed on resume.
+SSE_HEARTBEAT_SECONDS = 15
+
+SSE_STREAM_TIMEOUT = 60 * 5
+
+SSE_RETRY_MS = 3000
+
+SSE_REPLAY_LIMIT = 500
+
+
+# Request timing (vetplatform/instrumentation.py)
+# With SERVER_TIMING_HEADER on, each response carries a Server-Timing header with query count,
+# DB, serializer and view time. It is off unless DEBUG is, since it shows any client how much
+# database work a request took.
+# Requests slower than SLOW_REQUEST_THRESHOLD_MS are logged to `vetplatform.slow_requests`
+# as JSON, with their SLOW_REQUEST_LOGGED_QUERIES slowest SQL statements.
+
+SERVER_TIMING_HEADER = DEBUG
+
+SLOW_REQUEST_THRESHOLD_MS = 500
+
+SLOW_REQUEST_LOGGED_QUERIES = 10
+
+# Prometheus metrics served at /metrics/ (vetplatform/metrics.py)
+# With several worker processes, point METRICS_DIR at a directory the workers of a host
+# share; each writes its snapshot there every METRICS_FLUSH_INTERVAL seconds from a
+# background thread, and the scrape sums those of live processes. Set METRICS_TOKEN to
+# require `Authorization: Bearer <token>`; without one the endpoint is 404 unless DEBUG is on.
+
+METRICS_DIR = None
+
+METRICS_FLUSH_INTERVAL = 5
+
+METRICS_TOKEN = None
+
+
+# Response compression (vetplatform/compression.py)
+# gzip, or Brotli when the `brotli` package is installed and the client accepts it.
+# Responses under COMPRESSION_MIN_SIZE bytes are sent uncompressed.
+
+COMPRESSION_MIN_SIZE = 1024
+
+COMPRESSION_GZIP_LEVEL = 6
+
+COMPRESSION_BROTLI_QUALITY = 5
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'vetplatform.slow_requests': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
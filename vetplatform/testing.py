@@ -0,0 +1,78 @@
+"""
+Test helpers shared by the app test suites.
+"""
+from contextlib import ContextDecorator
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+class query_budget(ContextDecorator):
+    """
+    Fail when the wrapped block runs more than `max_queries` SQL queries.
+
+    Works as a context manager or as a decorator on a test method:
+
+        @query_budget(2)
+        def test_list_all_cases(self):
+            ...
+    """
+
+    def __init__(self, max_queries, using=DEFAULT_DB_ALIAS):
+        self.max_queries = max_queries
+        self.using = using
+
+    def __enter__(self):
+        self.context = CaptureQueriesContext(connections[self.using])
+        self.context.__enter__()
+        return self.context
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.context.__exit__(exc_type, exc_value, traceback)
+        if exc_type is not None:
+            return False
+        executed = len(self.context)
+        if executed > self.max_queries:
+            queries = '\n'.join(
+                '%d. %s' % (i, query['sql'])
+                for i, query in enumerate(self.context.captured_queries, start=1)
+            )
+            raise AssertionError(
+                '%d queries executed, budget is %d\nCaptured queries were:\n%s'
+                % (executed, self.max_queries, queries)
+            )
+        return False
+
+
+def explain(sql, using=DEFAULT_DB_ALIAS):
+    """
+    Query plan of `sql` as text: EXPLAIN QUERY PLAN on SQLite, EXPLAIN elsewhere.
+    """
+    connection = connections[using]
+    prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # Tiny test tables make a sequential scan look cheapest; ask whether an index *can* serve the query.
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        cursor.execute(prefix + sql)
+        return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+
+
+def full_scans(plan, vendor, ctes=()):
+    """
+    Lines of `plan` that read a whole table or sort the result instead of walking an index.
+
+    Scans of the names in `ctes` (common table expressions and their aliases) are
+    expected, since a recursive CTE always walks its own working set.
+    """
+    problems = []
+    for line in plan.splitlines():
+        if vendor == 'sqlite':
+            words = line.split()
+            scanned = words[words.index('SCAN') + 1] if 'SCAN' in words[:-1] else None
+            if 'USE TEMP B-TREE' in line or (scanned and scanned not in ctes and 'USING' not in words):
+                problems.append(line.strip())
+        elif 'Seq Scan' in line or line.strip().startswith('Sort'):
+            if not any(f' on {name}' in line for name in ctes) and 'CTE Scan' not in line:
+                problems.append(line.strip())
+    return problems
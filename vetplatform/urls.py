@@ -13,6 +13,8 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include 
 
@@ -21,6 +23,7 @@ from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 
+from vetplatform.metrics import metrics_view
 
 from rest_framework import permissions
 from drf_yasg.views import get_schema_view
@@ -44,6 +47,7 @@ urlpatterns = [
     
     path('app_user/', include('app_user.urls')),
     path('cases/', include('cases.urls')), 
+    path('metrics/', metrics_view, name='metrics'),  # Prometheus scrape endpoint
     
 
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
@@ -53,4 +57,4 @@ urlpatterns = [
 
 ]
 
-
+urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)  # Only serves files when DEBUG is on